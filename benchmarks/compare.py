@@ -0,0 +1,44 @@
+"""Compare two benchmark result files and flag slowdowns.
+
+    python -m benchmarks.compare benchmarks/results/old.json benchmarks/results/new.json
+"""
+import argparse
+import json
+import sys
+
+
+def load(path):
+    with open(path) as f:
+        report = json.load(f)
+    return {(row["stage"], row["size"]): row for row in report["results"]}, report.get("environment", {})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.compare", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=1.2,
+                        help="time ratio above which a case counts as a regression (default: 1.2)")
+    args = parser.parse_args(argv)
+
+    old, old_env = load(args.baseline)
+    new, new_env = load(args.candidate)
+    print(f"baseline {old_env.get('commit', '?')} vs candidate {new_env.get('commit', '?')}")
+    print(f"{'stage':>16} {'size':>10} {'old ms':>10} {'new ms':>10} {'ratio':>7} {'old MB':>8} {'new MB':>8}")
+
+    regressions = 0
+    for key in sorted(set(old) & set(new)):
+        before, after = old[key], new[key]
+        ratio = after["seconds"] / before["seconds"] if before["seconds"] else float("inf")
+        flag = "  <-- slower" if ratio > args.threshold else ""
+        regressions += bool(flag)
+        print(f"{key[0]:>16} {key[1]:>10,d} {before['seconds'] * 1000:10.2f} {after['seconds'] * 1000:10.2f} "
+              f"{ratio:7.2f} {before['peak_mb']:8.1f} {after['peak_mb']:8.1f}{flag}")
+
+    print(f"{regressions} regression(s) above {args.threshold:.2f}x")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""Import-time profile of the apps' start-up imports.
+
+    python -m benchmarks.imports                  # every app script
+    python -m benchmarks.imports grid.py --top 15
+
+Each script's top-level imports (not the rest of the script) are run in a
+fresh interpreter under ``python -X importtime``; the report shows the
+total start-up cost and the slowest top-level packages behind it.
+"""
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APPS = ["main.py", "upgrade.py", "grid.py", "grid1.py", "web.py"]
+
+
+def top_level_imports(path):
+    """The module-level ``import``/``from ... import`` statements of a script, as source."""
+    with open(path) as f:
+        tree = ast.parse(f.read(), path)
+    return [ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+
+
+def profile(statements, cwd=ROOT):
+    """Run ``statements`` under ``-X importtime``; return (total µs, {package: cumulative µs})."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "\n".join(statements) or "pass"],
+                            cwd=cwd, capture_output=True, text=True)
+    if result.returncode:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    packages, total = {}, 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Top-level entries have no indentation; their cumulative time includes all children
+        if not name.startswith("  "):
+            package = name.strip().split(".")[0]
+            packages[package] = packages.get(package, 0) + int(cumulative)
+            total += int(cumulative)
+    return total, packages
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.imports", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("scripts", nargs="*", default=APPS, help="app scripts (default: all apps)")
+    parser.add_argument("--top", type=int, default=8, help="packages listed per script")
+    parser.add_argument("--json", default=None, help="also write the report to this JSON file")
+    args = parser.parse_args(argv)
+
+    report = {}
+    for script in args.scripts:
+        total, packages = profile(top_level_imports(os.path.join(ROOT, script)))
+        report[script] = {"total_ms": total / 1000, "packages": {k: v / 1000 for k, v in packages.items()}}
+        print(f"{script}: {total / 1000:8.1f} ms of imports")
+        for name, micros in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"    {name:<24} {micros / 1000:8.1f} ms")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,329 @@
+"""Time each pipeline stage on synthetic data, outside Streamlit.
+
+    python -m benchmarks.run                      # every stage at 1e3..1e5
+    python -m benchmarks.run --sizes 1e3 1e6 1e7 --stages fft welch
+    python -m benchmarks.compare old.json new.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from benchmarks import synthetic
+
+
+def _excel_load(n):
+    path = os.path.join(tempfile.mkdtemp(prefix="spectral-bench-"), "spectrum.xlsx")
+    synthetic.spectrum_frame(n).to_excel(path, index=False)
+    return lambda: pd.read_excel(path)
+
+
+def _cached_load(n):
+    from spectral.cache import read_excel_cached
+
+    folder = tempfile.mkdtemp(prefix="spectral-bench-")
+    path = os.path.join(folder, "spectrum.xlsx")
+    synthetic.spectrum_frame(n).to_excel(path, index=False)
+    cache_dir = os.path.join(folder, "cache")
+    read_excel_cached(path, cache_dir=cache_dir)
+    return lambda: read_excel_cached(path, cache_dir=cache_dir)
+
+
+def _clean_legacy(n):
+    df = synthetic.spectrum_frame(n)
+
+    # The original site-script path: convert, drop, convert again, filter
+    def run():
+        x = pd.to_numeric(df.iloc[:, 0], errors='coerce')
+        y = pd.to_numeric(df.iloc[:, 1], errors='coerce')
+        valid_data = df.dropna(subset=[df.columns[0], df.columns[1]])
+        x = pd.to_numeric(valid_data.iloc[:, 0], errors='coerce')
+        y = pd.to_numeric(valid_data.iloc[:, 1], errors='coerce')
+        return valid_data[(x.notna()) & (y.notna())]
+    return run
+
+
+def _clean(n):
+    from spectral.core import clean_spectrum
+
+    df = synthetic.spectrum_frame(n)
+    return lambda: clean_spectrum(df)
+
+
+def _fft(n):
+    from spectral.core import fft_spectrum
+
+    y = synthetic.profile(n)
+    return lambda: fft_spectrum(y)
+
+
+def _welch(n):
+    from spectral.spectrum import welch
+
+    y = synthetic.profile(n)
+    return lambda: welch(y, segment_length=min(n, 1024))
+
+
+def _resample_many(n):
+    from spectral.resample import resample_many
+
+    # n samples spread over 100 irregular profiles
+    rng = np.random.default_rng(0)
+    series = [(np.sort(rng.uniform(0, 1000, max(n // 100, 2))), None) for _ in range(100)]
+    series = [(x, np.sin(x / 50)) for x, _ in series]
+    return lambda: resample_many(series, interval=1000 / max(n // 100, 2), extent="union")
+
+
+def _regression(n):
+    from sklearn.linear_model import LinearRegression
+
+    from spectral.core import clean_spectrum
+
+    data = clean_spectrum(synthetic.spectrum_frame(n))
+    x = data.iloc[:, 0].to_numpy().reshape(-1, 1)
+    y = data.iloc[:, 1].to_numpy()
+    return lambda: LinearRegression().fit(x, y)
+
+
+def _site_fits(n):
+    from spectral.compare import SpectrumStack
+
+    # n points spread over 100 sites, fitted together from one stacked array
+    rng = np.random.default_rng(0)
+    x = np.tile(np.linspace(0, 5, max(n // 100, 2)), 100)
+    stack = SpectrumStack([f"site{i}" for i in range(100)], x, -4 * x + rng.normal(0, 0.1, len(x)),
+                          np.arange(101) * max(n // 100, 2))
+    return stack.fits
+
+
+def _site_intervals(n):
+    from spectral.compare import SpectrumStack
+
+    # 2000 bootstrap refits of each of 100 sites sharing n points, as closed-form sums
+    rng = np.random.default_rng(0)
+    x = np.tile(np.linspace(0, 5, max(n // 100, 3)), 100)
+    stack = SpectrumStack([f"site{i}" for i in range(100)], x, -4 * x + rng.normal(0, 0.1, len(x)),
+                          np.arange(101) * max(n // 100, 3))
+    return lambda: stack.fit_intervals("bootstrap", 2000)
+
+
+def _segments(n):
+    from spectral.core import clean_spectrum
+    from spectral.depth import fit_segments
+
+    data = clean_spectrum(synthetic.spectrum_frame(n))
+    return lambda: fit_segments(data.iloc[:, 0], data.iloc[:, 1], 3)
+
+
+def _pivot(n):
+    Z = synthetic.grid(n)
+    yy, xx = np.indices(Z.shape)
+    df = pd.DataFrame({"X": xx.ravel(), "Y": yy.ravel(), "Z": Z.ravel()}).dropna()
+    return lambda: df.pivot_table(index="Y", columns="X", values="Z")
+
+
+def _grid_channel(n):
+    from spectral.gridding import GridIndex
+
+    # Re-gridding one more channel on coordinates already indexed (the pivot stage's job)
+    Z = synthetic.grid(n)
+    yy, xx = np.indices(Z.shape)
+    index = GridIndex(xx.ravel(), yy.ravel(), 1.0, "mean")
+    return lambda: index.grid(Z.ravel())
+
+
+def _profile_sample(n):
+    from spectral.gridfile import Grid
+    from spectral.spatial import bilinear
+
+    # n bilinear samples along a diagonal of a 1000 x 1000 grid (a long profile or many hover lookups)
+    grid = Grid(synthetic.grid(10**6), 0.0, 0.0, 1.0, 1.0)
+    t = np.linspace(0.0, 1.0, n)
+    x, y = t * (grid.shape[1] - 1), t * (grid.shape[0] - 1)
+    return lambda: bilinear(grid, x, y)
+
+
+def _derived_channels(n):
+    from spectral.channels import STANDARD, derive
+
+    rng = np.random.default_rng(0)
+    data = {"K": rng.gamma(2.0, 0.5, n), "eTh": rng.gamma(4.0, 2.0, n), "eU": rng.gamma(2.0, 1.0, n),
+            "TC": rng.gamma(9.0, 100.0, n)}
+    return lambda: derive(data, STANDARD)
+
+
+def _gridding(n):
+    from spectral.gridding import grid_points
+
+    x, y, z = synthetic.flight_lines(n)
+    cell = 10_000.0 / np.sqrt(n)
+    return lambda: grid_points(x, y, z, cell_size=cell, method="idw")
+
+
+def _stream_grid(n):
+    from spectral.ingest import bin_chunks, read_chunks
+
+    path = os.path.join(tempfile.mkdtemp(prefix="spectral-bench-"), "survey.csv")
+    x, y, z = synthetic.flight_lines(n)
+    pd.DataFrame({"X": x, "Y": y, "Z": z}).to_csv(path, index=False)
+    cell = 10_000.0 / np.sqrt(n)
+    return lambda: bin_chunks(read_chunks(path, chunk_rows=100_000), "X", "Y", "Z", cell, (0, 10_000, 0, 10_000))
+
+
+def _grid_file(n):
+    from spectral.gridfile import Grid, open_grid, save_grid
+
+    path = os.path.join(tempfile.mkdtemp(prefix="spectral-bench-"), "grid.sgrd")
+    Z = synthetic.grid(n)
+    save_grid(path, Grid(Z, 0.0, 0.0, 1.0))
+    side = Z.shape[0]
+    # Open and read one quarter-size window, the viewer's zoomed-in case
+    return lambda: np.asarray(open_grid(path).window((0, side / 2), (0, side / 2)))
+
+
+def _radial_spectrum(n):
+    from spectral.spectrum import radial_spectrum
+
+    Z = synthetic.grid(n)
+    return lambda: radial_spectrum(Z)
+
+
+def _grid_filter(n):
+    from spectral.filters import filter_grid
+    from spectral.gridfile import Grid
+
+    # Continuation, band-pass and derivative chained into one transform pair
+    grid = Grid(synthetic.grid(n), 0.0, 0.0, 1.0)
+    return lambda: filter_grid(grid, ["upward:5", "bandpass:4", "dz"])
+
+
+def _grid_depths(n):
+    from spectral.gridfile import Grid
+    from spectral.windowed import grid_depths
+
+    Z = synthetic.grid(n)
+    tile = min(64, Z.shape[0])
+    return lambda: grid_depths(Grid(Z, 0.0, 0.0, 1.0), tile_size=tile, band=(0.05, 0.25))
+
+
+def _anomaly(n):
+    from spectral.anomaly import detect_anomalies
+
+    Z = synthetic.grid(n)
+    return lambda: detect_anomalies(Z)
+
+
+def _tile_pyramid(n):
+    from spectral.tiles import TilePyramid
+
+    Z = synthetic.grid(n)
+    return lambda: TilePyramid(Z, np.arange(Z.shape[1]), np.arange(Z.shape[0]))
+
+
+# name -> (setup returning the timed callable, largest size worth running)
+STAGES = {
+    "excel_load": (_excel_load, 10**5),
+    "cached_load": (_cached_load, 10**5),
+    "clean_legacy": (_clean_legacy, 10**7),
+    "clean": (_clean, 10**7),
+    "fft": (_fft, 10**7),
+    "welch": (_welch, 10**7),
+    "resample_many": (_resample_many, 10**7),
+    "regression": (_regression, 10**7),
+    "site_fits": (_site_fits, 10**7),
+    "site_intervals": (_site_intervals, 10**5),
+    "segments": (_segments, 2 * 10**4),
+    "pivot": (_pivot, 10**7),
+    "grid_channel": (_grid_channel, 10**7),
+    "profile_sample": (_profile_sample, 10**7),
+    "derived_channels": (_derived_channels, 10**7),
+    "gridding": (_gridding, 10**7),
+    "stream_grid": (_stream_grid, 10**7),
+    "grid_file": (_grid_file, 10**7),
+    "radial_spectrum": (_radial_spectrum, 10**7),
+    "grid_filter": (_grid_filter, 10**7),
+    "grid_depths": (_grid_depths, 10**7),
+    "anomaly": (_anomaly, 10**7),
+    "tile_pyramid": (_tile_pyramid, 10**7),
+}
+
+
+def measure(run, repeat):
+    """Best wall time over ``repeat`` calls, then one traced call for peak memory."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(times), peak
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def run_benchmarks(stages, sizes, repeat=3, progress=print):
+    results = []
+    for name in stages:
+        setup, max_size = STAGES[name]
+        for size in sizes:
+            if size > max_size:
+                continue
+            run = setup(size)
+            seconds, peak = measure(run, repeat if size < 10**6 else 1)
+            results.append({"stage": name, "size": size, "seconds": seconds, "peak_mb": peak / 2**20})
+            progress(f"{name:>16} n={size:<9,d} {seconds * 1000:10.2f} ms {peak / 2**20:9.1f} MB")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", type=float, default=[1e3, 1e4, 1e5],
+                        help="numbers of points/cells to generate (default: 1e3 1e4 1e5)")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES))
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per case below 1e6 points")
+    parser.add_argument("--out", default=None, help="JSON results file (default: benchmarks/results/<time>.json)")
+    args = parser.parse_args(argv)
+
+    sizes = sorted(int(size) for size in args.sizes)
+    report = {"environment": environment(), "results": run_benchmarks(args.stages, sizes, args.repeat)}
+
+    out = args.out or os.path.join(os.path.dirname(os.path.abspath(__file__)), "results",
+                                   datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+from spectral.core import X_LABEL, Y_LABEL
+
+
+def spectrum_frame(n, seed=0):
+    """A site-style ln(P) vs cycles/unit table with three slope segments and a few junk cells."""
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0.0, 5.0, n)
+    y = np.where(x < 0.3, 10 - 25 * x, np.where(x < 3.5, 4.0 - 4.0 * x, -10.5 - 0.4 * (x - 3.5)))
+    y = y + rng.normal(0, 0.2, n)
+
+    # Mimic the text and blank cells the cleaning step has to drop
+    x = x.astype(object)
+    bad = rng.choice(n, max(n // 100, 1), replace=False)
+    x[bad[::2]] = "n/a"
+    x[bad[1::2]] = np.nan
+    return pd.DataFrame({X_LABEL: x, Y_LABEL: y})
+
+
+def profile(n, seed=0):
+    """A long uniformly sampled profile with two sinusoids and noise."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(n, dtype=float)
+    return np.sin(2 * np.pi * t / 50) + 0.5 * np.sin(2 * np.pi * t / 7) + rng.normal(0, 0.3, n)
+
+
+def flight_lines(n, seed=0, line_spacing=100.0, extent=10_000.0):
+    """Radiometric-style samples along east-west flight lines, as ``(x, y, z)``."""
+    rng = np.random.default_rng(seed)
+    n_lines = max(int(extent / line_spacing), 1)
+    y = np.repeat(np.arange(n_lines) * line_spacing, -(-n // n_lines))[:n] + rng.normal(0, 3, n)
+    x = rng.random(n) * extent
+    z = np.sin(x / 700) + np.cos(y / 900) + rng.normal(0, 0.05, n)
+    return x, y, z
+
+
+def grid(n, seed=0):
+    """A square-ish grid of about ``n`` cells with a buried anomaly and a few gaps."""
+    rng = np.random.default_rng(seed)
+    side = max(int(np.sqrt(n)), 4)
+    Z = rng.normal(size=(side, side))
+    Z[side // 3:side // 3 + max(side // 20, 1), side // 2:side // 2 + max(side // 20, 1)] += 6
+    Z[rng.random(Z.shape) < 0.02] = np.nan
+    return Z
@@ -1,85 +1,304 @@
+import os
+from functools import partial
 import streamlit as st
-import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import folium
-from streamlit_folium import st_folium
-from sklearn.ensemble import IsolationForest
-from matplotlib.colors import Normalize
+from spectral.cache import content_hash
+from spectral.gridfile import GRID_FORMATS, cached_grid, detect_grid_format, grid_bytes, grid_cache_key
+from spectral.instrument import cached, performance_panel, record, stage, start_run
+
+
+# Cached stages keyed by the upload hash and column choice, so the colormap,
+# plot type and hover sliders reuse the grid. Each stage imports its own
+# modules, so the start page loads neither scipy nor sklearn.
+@cached(st.cache_data(show_spinner=False))
+def load_workbook(file_hash, _upload):
+    from spectral.ingest import read_table
+
+    return read_table(_upload)
+
+
+@cached(st.cache_data(show_spinner=False))
+def default_cell_size(file_hash, x_col, y_col, _df):
+    from spectral.gridding import estimate_cell_size
+
+    points = _df[[x_col, y_col]].dropna()
+    return estimate_cell_size(points[x_col].to_numpy(), points[y_col].to_numpy())
+
+
+# Derived channels (ratios, dose rate, custom expressions) become extra columns of one shared frame
+@cached(st.cache_resource(show_spinner=False, max_entries=4))
+def with_channels(file_hash, expressions, _df):
+    from spectral.channels import derive
+
+    return _df.assign(**derive(_df, dict(expressions))) if expressions else _df
+
+
+# Neighbours and weights of every node depend only on X/Y, so switching the Z
+# channel re-grids with one gather (IDW, nearest) or one bincount (cell mean)
+@cached(st.cache_resource(show_spinner=False, max_entries=2))
+def grid_index(file_hash, x_col, y_col, method, cell_size, _df):
+    from spectral.gridding import GridIndex
+
+    return GridIndex(_df[x_col].to_numpy(dtype=float), _df[y_col].to_numpy(dtype=float), cell_size, method)
+
+
+# Grids are saved to the on-disk cache and memory-mapped back, so they survive restarts
+@cached(st.cache_resource(show_spinner=False, max_entries=8))
+def build_grid(file_hash, x_col, y_col, z_col, method, cell_size, _df):
+    from spectral.gridding import GridIndex, grid_points
+    from spectral.gridfile import Grid
+
+    def build():
+        z = _df[z_col].to_numpy(dtype=float)
+        if method in GridIndex.METHODS:
+            index = grid_index(file_hash, x_col, y_col, method, cell_size, _df)
+            return Grid.from_axes(index.x_axis, index.y_axis, index.grid(z), name=z_col)
+        # grid_points drops rows with a NaN in any of the three columns
+        axes_and_values = grid_points(_df[x_col].to_numpy(dtype=float), _df[y_col].to_numpy(dtype=float), z,
+                                      cell_size=cell_size, method=method)
+        return Grid.from_axes(*axes_and_values, name=z_col)
+    return cached_grid(key=grid_cache_key(file_hash, x_col, y_col, z_col, method, cell_size), build=build)
+
+
+# KD-tree over the raw survey points, for the sample nearest the hover marker
+@cached(st.cache_resource(show_spinner=False, max_entries=2))
+def point_index(file_hash, x_col, y_col, _df):
+    from spectral.spatial import PointIndex
+
+    return PointIndex(_df[x_col].to_numpy(dtype=float), _df[y_col].to_numpy(dtype=float))
+
+
+@cached(st.cache_resource(show_spinner=False, max_entries=8))
+def open_saved_grid(file_hash, _upload):
+    return cached_grid(_upload)
+
+
+@cached(st.cache_resource(show_spinner=False, max_entries=8))
+def grid_pyramid(file_hash, x_col, y_col, z_col, method, cell_size, _grid):
+    from spectral.tiles import TilePyramid
+
+    return TilePyramid(_grid.values, _grid.x_axis, _grid.y_axis)
+
+
+# Filtered grids join the on-disk grid cache under the source grid's key plus the filter chain
+@cached(st.cache_resource(show_spinner=False, max_entries=4))
+def filtered_grid(file_hash, x_col, y_col, z_col, method, cell_size, filters, _grid):
+    from spectral.filters import filter_grid
+
+    return cached_grid(key=grid_cache_key(file_hash, x_col, y_col, z_col, method, cell_size, "filter", filters),
+                       build=lambda: filter_grid(_grid, filters))
+
+
+# One renderer per map view; the hover marker is blitted onto its cached base image
+@cached(st.cache_resource(show_spinner=False, max_entries=32))
+def map_renderer(file_hash, x_col, y_col, z_col, method, cell_size, plot_type, cmap, stat, x_range, y_range, _pyramid):
+    from spectral.tiles import MapRenderer
+
+    values, extent = _pyramid.view(x_range, y_range, stat=stat)
+    return MapRenderer(values, extent, kind=plot_type, cmap=cmap, vmin=_pyramid.vmin, vmax=_pyramid.vmax,
+                       title=f"Grid Map of {z_col}", x_label=x_col, y_label=y_col)
+
+
+# One job queue per server: every session's anomaly fits share its few worker processes,
+# and a second request for the same grid joins the job already running
+@cached(st.cache_resource(show_spinner=False))
+def job_queue():
+    from spectral.jobs import JobQueue
+
+    def log_job(status):
+        record(f"{status['name']} (background job)", status["seconds"], app="grid")
+
+    return JobQueue(on_finish=log_job)
+
+
+# Polls a background job without rerunning the page; the whole page reruns once it finishes
+# (or once the queue has forgotten it, so the page submits it again)
+@st.fragment(run_every=1.0)
+def job_progress(job_id):
+    status = job_queue().status(job_id)
+    if status["state"] in ("queued", "running"):
+        label = status["message"] or ("Waiting for a free worker" if status["state"] == "queued" else "Running")
+        st.progress(status["progress"], text=f"⏳ {status['name']}: {label} ({status['seconds']:.0f}s)")
+    else:
+        st.rerun()
+
 
 st.set_page_config(page_title="Radiometric Grid Map", layout="wide")
 st.title("🌍 Radiometric Grid Map Viewer")
+perf_run = start_run("grid")
 
-uploaded_file = st.file_uploader("📤 Upload Excel file with radiometric data", type="xlsx")
+# File extension offered for each format in the save-grid menu
+SAVE_FORMATS = {"Native (.sgrd)": ("native", ".sgrd"), "Surfer ASCII (.grd)": ("surfer", ".grd"),
+                "Surfer Binary (.grd)": ("surfer-binary", ".grd"), "ESRI ASCII (.asc)": ("esri", ".asc")}
 
-if uploaded_file:
-    df = pd.read_excel(uploaded_file)
-    numeric_columns = df.select_dtypes(include=np.number).columns.tolist()
+uploaded_file = st.file_uploader("📤 Upload Excel, CSV or XYZ data, or a saved grid (.sgrd, .grd, .asc)",
+                                 type=["xlsx", "csv", "xyz", "txt", "dat"] + [ext[1:] for ext in GRID_FORMATS])
 
-    if len(numeric_columns) >= 3:
+if uploaded_file:
+    # Plotting and gridding modules load with the first upload, not on the empty start page
+    import matplotlib.pyplot as plt
+    from spectral.channels import available, find_channels, parse, ternary_rgb
+    from spectral.gridding import METHOD_LABELS
+    from spectral.core import fft_spectrum
+    from spectral.report import anomaly_notes, zone_shares, zone_thresholds
+    from spectral.spatial import node_index, profile
+    from spectral.tiles import STATS
+
+    file_hash = content_hash(uploaded_file)
+    saved_grid = detect_grid_format(uploaded_file.name) is not None
+    if not saved_grid:
+        df = load_workbook(file_hash, uploaded_file)
+        numeric_columns = df.select_dtypes(include=np.number).columns.tolist()
+
+    if saved_grid or len(numeric_columns) >= 3:
         st.subheader("🗺️ Grid Map Visualization")
 
-        x_grid_col = st.selectbox("🧭 Select X (Grid)", numeric_columns, key="x_grid")
-        y_grid_col = st.selectbox("🧭 Select Y (Grid)", numeric_columns, key="y_grid")
-        z_grid_col = st.selectbox("📊 Select Z (Value)", numeric_columns, key="z_grid")
-
-        grid_data = df[[x_grid_col, y_grid_col, z_grid_col]].dropna()
-
         try:
-            pivot_table = grid_data.pivot_table(index=y_grid_col, columns=x_grid_col, values=z_grid_col)
-            X, Y = np.meshgrid(pivot_table.columns, pivot_table.index)
-            Z = pivot_table.values
+            if saved_grid:
+                # A saved grid opens memory-mapped as-is; there is nothing to re-grid
+                grid = open_saved_grid(file_hash, uploaded_file)
+                x_grid_col, y_grid_col = "X", "Y"
+                z_grid_col = grid.name or os.path.splitext(os.path.basename(uploaded_file.name))[0]
+                st.caption(f"{grid.shape[1]} x {grid.shape[0]} nodes, cell {grid.dx:g} x {grid.dy:g}"
+                           + (f", CRS {grid.crs}" if grid.crs else ""))
+                grid_key = (file_hash, x_grid_col, y_grid_col, z_grid_col, "saved", grid.dx)
+            else:
+                x_grid_col = st.selectbox("🧭 Select X (Grid)", numeric_columns, key="x_grid")
+                y_grid_col = st.selectbox("🧭 Select Y (Grid)", numeric_columns, key="y_grid")
+
+                # Ratios of the K/eTh/eU/TC columns found in the file, plus an optional custom expression
+                expressions = {label: expression for label, expression in available(numeric_columns).items()
+                               if label not in numeric_columns}
+                custom = st.text_input("🧮 Derived Channel (e.g. (eU + eTh) / K)", "", key="custom_channel").strip()
+                if custom:
+                    try:
+                        parse(custom)
+                        if available(numeric_columns, {custom: custom}):
+                            expressions[custom] = custom
+                        else:
+                            st.warning(f"'{custom}' uses a channel that is not in this file.")
+                    except (SyntaxError, ValueError) as e:
+                        st.warning(f"Invalid channel expression: {e}")
+                df = with_channels(file_hash, tuple(expressions.items()), df)
+                z_grid_col = st.selectbox("📊 Select Z (Value)", numeric_columns + list(expressions), key="z_grid")
+
+                grid_method = st.selectbox("🧮 Gridding Method", list(METHOD_LABELS))
+                cell_size = st.number_input("📏 Cell Size", min_value=0.0,
+                                            value=default_cell_size(file_hash, x_grid_col, y_grid_col, df),
+                                            format="%.4f")
+
+                grid_key = (file_hash, x_grid_col, y_grid_col, z_grid_col, METHOD_LABELS[grid_method], cell_size)
+                grid = build_grid(*grid_key[:-1], cell_size or None, df)
+            grid_x, grid_y, Z = grid.to_arrays()
 
-            fig_map, ax_map = plt.subplots()
             cmap = st.selectbox("🎨 Select Color Map", plt.colormaps(), index=plt.colormaps().index("viridis"))
             plot_type = st.radio("📈 Choose Grid Map Type", ["Contour Map", "Heatmap"])
 
-            norm = Normalize(vmin=np.nanmin(Z), vmax=np.nanmax(Z))
+            # Only the zoomed window is drawn, from the coarsest pyramid level that fills the figure
+            pyramid = grid_pyramid(*grid_key, grid)
+            zoom_x = st.slider("🔍 Zoom - X Range", float(grid_x[0]), float(grid_x[-1]), (float(grid_x[0]), float(grid_x[-1])))
+            zoom_y = st.slider("🔍 Zoom - Y Range", float(grid_y[0]), float(grid_y[-1]), (float(grid_y[0]), float(grid_y[-1])))
+            display_stat = st.selectbox("🧮 Value Shown When Zoomed Out", STATS)
 
-            if plot_type == "Contour Map":
-                contour = ax_map.contourf(X, Y, Z, levels=20, cmap=cmap, norm=norm)
-                fig_map.colorbar(contour, ax=ax_map)
-            else:
-                heatmap = ax_map.imshow(Z, aspect='auto', origin='lower',
-                                        extent=[X.min(), X.max(), Y.min(), Y.max()],
-                                        cmap=cmap, norm=norm)
-                fig_map.colorbar(heatmap, ax=ax_map)
-
-            ax_map.set_xlabel(x_grid_col)
-            ax_map.set_ylabel(y_grid_col)
-            ax_map.set_title(f"Grid Map of {z_grid_col}")
-            ax_map.grid(True)
+            renderer = map_renderer(*grid_key, plot_type, cmap, display_stat, zoom_x, zoom_y, pyramid)
+            st.image(renderer.image())
 
-            st.pyplot(fig_map)
+            save_as = st.selectbox("💾 Save Grid As", list(SAVE_FORMATS))
+            save_format, save_extension = SAVE_FORMATS[save_as]
+            # Encoded only when the button is clicked, not on every rerun
+            st.download_button("⬇️ Download Grid", partial(grid_bytes, grid, save_format),
+                               file_name=f"{z_grid_col}{save_extension}", mime="application/octet-stream")
 
             # ZONE CLASSIFICATION
             z_min, z_max = np.nanmin(Z), np.nanmax(Z)
-            z_range = z_max - z_min
-
-            low_thresh = z_min + 0.33 * z_range
-            med_thresh = z_min + 0.66 * z_range
+            low_thresh, med_thresh = zone_thresholds(Z)
+            shares = zone_shares(Z, (low_thresh, med_thresh))
 
             st.markdown("#### 🔍 Zone Classification (based on Z-value ranges):")
             st.markdown(f"""
-            - 🟦 **Low Zone:** ≤ {low_thresh:.2f}  
-            - 🟨 **Medium Zone:** > {low_thresh:.2f} and ≤ {med_thresh:.2f}  
-            - 🟥 **High Zone:** > {med_thresh:.2f}
+            - 🟦 **Low Zone:** ≤ {low_thresh:.2f} ({shares['low']:.0%} of the grid)  
+            - 🟨 **Medium Zone:** > {low_thresh:.2f} and ≤ {med_thresh:.2f} ({shares['medium']:.0%})  
+            - 🟥 **High Zone:** > {med_thresh:.2f} ({shares['high']:.0%})
             """)
 
             # Hover Simulation
-            hover_x = st.slider("📍 Simulate Hover - X", float(X.min()), float(X.max()), float((X.min() + X.max()) / 2))
-            hover_y = st.slider("📍 Simulate Hover - Y", float(Y.min()), float(Y.max()), float((Y.min() + Y.max()) / 2))
+            hover_x = st.slider("📍 Simulate Hover - X", float(grid_x[0]), float(grid_x[-1]), float((grid_x[0] + grid_x[-1]) / 2))
+            hover_y = st.slider("📍 Simulate Hover - Y", float(grid_y[0]), float(grid_y[-1]), float((grid_y[0] + grid_y[-1]) / 2))
 
-            x_idx = (np.abs(pivot_table.columns - hover_x)).argmin()
-            y_idx = (np.abs(pivot_table.index - hover_y)).argmin()
+            # The grid is its own index: the nearest node is arithmetic on the origin and cell size
+            (y_idx,), (x_idx,), _ = node_index(grid, [hover_x], [hover_y])
             hover_value = Z[y_idx, x_idx]
 
-            st.info(f"🧭 At (X={pivot_table.columns[x_idx]:.2f}, Y={pivot_table.index[y_idx]:.2f}) → {z_grid_col} = {hover_value:.2f}")
-
-            ax_map.plot(pivot_table.columns[x_idx], pivot_table.index[y_idx], 'ko', markersize=6, label='Selected Point')
-            ax_map.legend(loc='upper right')
-
-            st.pyplot(fig_map)
+            st.info(f"🧭 At (X={grid_x[x_idx]:.2f}, Y={grid_y[y_idx]:.2f}) → {z_grid_col} = {hover_value:.2f}")
+            if not saved_grid and z_grid_col in df:
+                (sample_distance,), (sample_row,) = point_index(file_hash, x_grid_col, y_grid_col, df).query([hover_x], [hover_y])
+                if sample_row >= 0:
+                    st.caption(f"Nearest sample: {z_grid_col} = {df[z_grid_col].iloc[sample_row]:.2f} at "
+                               f"(X={df[x_grid_col].iloc[sample_row]:.2f}, Y={df[y_grid_col].iloc[sample_row]:.2f}), "
+                               f"{sample_distance:.2f} away")
+
+            st.image(renderer.with_marker(grid_x[x_idx], grid_y[y_idx]))
+
+            # PROFILE SPECTRUM (bilinear samples along a line, at the grid spacing, into the FFT)
+            if st.checkbox("✂️ Spectrum Along a Profile"):
+                start_col, end_col = st.columns(2)
+                profile_start = (start_col.number_input("Start X", value=float(grid_x[0]), format="%.4f"),
+                                 start_col.number_input("Start Y", value=float(grid_y[0]), format="%.4f"))
+                profile_end = (end_col.number_input("End X", value=float(grid_x[-1]), format="%.4f"),
+                               end_col.number_input("End Y", value=float(grid_y[-1]), format="%.4f"))
+                distance, _, _, section = profile(grid, profile_start, profile_end)
+                valid = np.isfinite(section)
+                if valid.sum() < 4:
+                    st.warning("The profile crosses fewer than 4 grid nodes with values.")
+                else:
+                    # Gaps inside the profile are bridged linearly; blank ends are trimmed
+                    first, last = np.flatnonzero(valid)[[0, -1]]
+                    distance, section, valid = distance[first:last + 1], section[first:last + 1], valid[first:last + 1]
+                    section = np.interp(distance, distance[valid], section[valid])
+                    spacing = distance[1] - distance[0]
+                    frequency, magnitude = fft_spectrum(section - section.mean(), spacing)
+                    keep = magnitude > 0
+
+                    fig_profile, (ax_section, ax_fft) = plt.subplots(1, 2, figsize=(12, 4))
+                    ax_section.plot(distance, section)
+                    ax_section.set_title(f"{z_grid_col} Along the Profile")
+                    ax_section.set_xlabel("Distance")
+                    ax_section.set_ylabel(z_grid_col)
+                    ax_fft.plot(frequency[keep], np.log(magnitude[keep] ** 2))
+                    ax_fft.set_title("Profile Power Spectrum")
+                    ax_fft.set_xlabel("Frequency (cycles per unit distance)")
+                    ax_fft.set_ylabel("ln P")
+                    with stage("st.pyplot fig_profile"):
+                        st.pyplot(fig_profile)
+                    bridged = int((~valid).sum())
+                    st.caption(f"{len(section)} samples every {spacing:g} over {distance[-1]:g}"
+                               + (f"; {bridged} blank samples bridged" if bridged else ""))
+
+            # WAVENUMBER FILTERS (the whole chain is one rfft2 / irfft2 pair)
+            filter_text = st.text_input("🌀 Wavenumber Filters (e.g. upward:100 dz, bandpass:200:5000, rtp:-12:2)", "",
+                                        key="filters").split()
+            if filter_text:
+                from spectral.filters import FILTERS, parse_filter
+
+                try:
+                    filters = tuple(parse_filter(spec) for spec in filter_text)
+                except ValueError as e:
+                    st.warning(f"{e}. Filters: " + "; ".join(f"{name} ({description})"
+                                                            for name, (_, description) in FILTERS.items()))
+                else:
+                    filtered = filtered_grid(*grid_key, filters, grid)
+                    fig_filtered, ax_filtered = plt.subplots()
+                    image = ax_filtered.imshow(filtered.values, origin='lower', aspect='auto', extent=filtered.extent,
+                                               cmap=cmap)
+                    fig_filtered.colorbar(image, ax=ax_filtered)
+                    ax_filtered.set_title(f"{z_grid_col}: {' '.join(filter_text)}")
+                    ax_filtered.set_xlabel(x_grid_col)
+                    ax_filtered.set_ylabel(y_grid_col)
+                    with stage("st.pyplot fig_filtered"):
+                        st.pyplot(fig_filtered)
+                    st.download_button("⬇️ Download Filtered Grid", partial(grid_bytes, filtered, save_format),
+                                       file_name=f"{z_grid_col} filtered{save_extension}",
+                                       mime="application/octet-stream")
 
             # INTERPRETATION
             st.subheader("🧠 Interpretation")
@@ -113,24 +332,60 @@ if uploaded_file:
             # AI-BASED ANOMALY ZONES
             st.subheader("🤖 AI-based Pattern Detection (Anomaly Zones)")
 
-            model = IsolationForest(contamination=0.1)
-            anomalies = model.fit_predict(Z.reshape(-1, 1))
-            anomaly_grid = anomalies.reshape(Z.shape)
-
-            fig_anomaly, ax_anomaly = plt.subplots()
-            ax_anomaly.imshow(anomaly_grid, aspect='auto', origin='lower',
-                              extent=[X.min(), X.max(), Y.min(), Y.max()],
-                              cmap="coolwarm")
-            ax_anomaly.set_title("Anomaly Zones")
-            ax_anomaly.set_xlabel(x_grid_col)
-            ax_anomaly.set_ylabel(y_grid_col)
-
-            st.pyplot(fig_anomaly)
+            # The isolation forest runs in the background job queue; the rest of the page stays live
+            from spectral.anomaly import anomaly_labels
+            from spectral.jobs import JobForgotten
+
+            queue = job_queue()
+            anomaly_grid = None
+            anomaly_job = queue.submit(anomaly_labels, np.asarray(Z), key=grid_key, name="Anomaly zones")
+            anomaly_status = queue.status(anomaly_job)
+            if anomaly_status["state"] == "done":
+                try:
+                    anomaly_grid = queue.result(anomaly_job)
+                except JobForgotten:
+                    # Dropped by other sessions' submissions since the status check; queue it again
+                    anomaly_job = queue.submit(anomaly_labels, np.asarray(Z), key=grid_key, name="Anomaly zones")
+                    anomaly_status = queue.status(anomaly_job)
+            if anomaly_status["state"] in ("queued", "running"):
+                job_progress(anomaly_job)
+            elif anomaly_grid is None:
+                st.error(f"❌ Anomaly detection {anomaly_status['state']}: {anomaly_status['error']}")
+            else:
 
-  
+                fig_anomaly, ax_anomaly = plt.subplots()
+                ax_anomaly.imshow(anomaly_grid, aspect='auto', origin='lower',
+                                  extent=pyramid.extent,
+                                  cmap="coolwarm")
+                ax_anomaly.set_title("Anomaly Zones")
+                ax_anomaly.set_xlabel(x_grid_col)
+                ax_anomaly.set_ylabel(y_grid_col)
+
+                with stage("st.pyplot fig_anomaly"):
+                    st.pyplot(fig_anomaly)
+                st.caption(" ".join(anomaly_notes(Z, anomaly_grid)))
+
+            # TERNARY K-eTh-eU MAP (each channel gridded on the same nodes)
+            radiometric = {} if saved_grid else find_channels(numeric_columns)
+            if all(name in radiometric for name in ("K", "eTh", "eU")) and st.checkbox("🎨 Ternary Map (K, eTh, eU as red, green, blue)"):
+                bands = [build_grid(*grid_key[:3], radiometric[name], grid_key[4], cell_size or None, df)
+                         for name in ("K", "eTh", "eU")]
+                if len({band.shape for band in bands}) > 1:
+                    st.warning("K, eTh and eU cover different areas with this method; try IDW or Cell Mean.")
+                else:
+                    fig_ternary, ax_ternary = plt.subplots()
+                    ax_ternary.imshow(ternary_rgb(*(np.asarray(band.values) for band in bands)), origin='lower',
+                                      aspect='auto', extent=bands[0].extent)
+                    ax_ternary.set_title("Ternary Map (R = K, G = eTh, B = eU)")
+                    ax_ternary.set_xlabel(x_grid_col)
+                    ax_ternary.set_ylabel(y_grid_col)
+                    with stage("st.pyplot fig_ternary"):
+                        st.pyplot(fig_ternary)
 
         except Exception as e:
             st.error(f"❌ Could not generate grid map: {e}")
 
     else:
         st.warning("You need at least 3 numeric columns: X, Y, Z.")
+
+performance_panel(perf_run)
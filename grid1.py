@@ -1,12 +1,15 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-from scipy.interpolate import griddata
-import matplotlib.pyplot as plt
-from matplotlib.colors import Normalize
-from matplotlib.patches import Rectangle
-from matplotlib.widgets import Cursor
+from spectral.cache import content_hash, read_excel_cached
+
+
+# Gridding is keyed by the upload's content hash, columns, method and cell size,
+# so colour map and plot type changes only redraw the figure
+@st.cache_data(show_spinner=False)
+def build_grid(file_hash, x_col, y_col, z_col, method, cell_size, _grid_data):
+    from spectral.gridding import grid_points
+
+    return grid_points(_grid_data[x_col], _grid_data[y_col], _grid_data[z_col], cell_size=cell_size, method=method)
+
 
 st.set_page_config(page_title="Radiometric Grid Map", layout="wide")
 st.title("🌍 Radiometric Grid Map Viewer")
@@ -14,7 +17,13 @@ st.title("🌍 Radiometric Grid Map Viewer")
 uploaded_file = st.file_uploader("📤 Upload Excel file with radiometric data", type="xlsx")
 
 if uploaded_file:
-    df = pd.read_excel(uploaded_file)
+    # Plotting and gridding modules load with the first upload, not on the empty start page
+    import numpy as np
+    import matplotlib.pyplot as plt
+    from spectral.gridding import METHOD_LABELS, estimate_cell_size
+
+    file_hash = content_hash(uploaded_file)
+    df = read_excel_cached(uploaded_file)
     numeric_columns = df.select_dtypes(include=np.number).columns.tolist()
 
     if len(numeric_columns) >= 3:
@@ -27,9 +36,14 @@ if uploaded_file:
         grid_data = df[[x_grid_col, y_grid_col, z_grid_col]].dropna()
 
         try:
-            pivot_table = grid_data.pivot_table(index=y_grid_col, columns=x_grid_col, values=z_grid_col)
-            X, Y = np.meshgrid(pivot_table.columns, pivot_table.index)
-            Z = pivot_table.values
+            grid_method = st.selectbox("🧮 Gridding Method", list(METHOD_LABELS))
+            cell_size = st.number_input("📏 Cell Size", min_value=0.0,
+                                        value=estimate_cell_size(grid_data[x_grid_col], grid_data[y_grid_col]),
+                                        format="%.4f")
+
+            grid_x, grid_y, Z = build_grid(file_hash, x_grid_col, y_grid_col, z_grid_col, METHOD_LABELS[grid_method],
+                                           cell_size or None, grid_data)
+            X, Y = np.meshgrid(grid_x, grid_y)
 
             fig_map, ax_map = plt.subplots()
             cmap = st.selectbox("🎨 Select Color Map", plt.colormaps(), index=plt.colormaps().index("viridis"))
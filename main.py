@@ -1,23 +1,66 @@
 import streamlit as st
-import pandas as pd
-import matplotlib.pyplot as plt
+from spectral.cache import content_hash, read_excel_cached
+
+
+# Parse and clean each upload once; widget changes only redraw the plot
+@st.cache_data(show_spinner=False)
+def load_workbook(file_hash, _upload):
+    import pandas as pd
+
+    df = read_excel_cached(_upload)
+    x = pd.to_numeric(df.iloc[:, 0], errors='coerce')
+    y = pd.to_numeric(df.iloc[:, 1], errors='coerce')
+    return df, df[(~x.isna()) & (~y.isna())]
+
+
+# Every site's first two columns, parsed in parallel and stacked into one array
+@st.cache_data(show_spinner=False)
+def load_sites(file_hashes, _uploads):
+    from spectral.compare import load_spectra
+
+    return load_spectra(_uploads)
+
 
 # App Configuration
 st.set_page_config(page_title="Spectral Analysis", layout="centered")
 st.title("📈 Spectral Analysis Program")
 st.markdown("### 👨‍💻 Developed by **Incrisz**")
 
+mode = st.radio("🗂️ Mode", ["Single File", "Compare Sites"], horizontal=True)
+if mode == "Compare Sites":
+    uploaded_files = st.file_uploader("📤 Upload site workbooks (.xlsx)", type="xlsx", accept_multiple_files=True)
+    if not uploaded_files:
+        st.info("Upload two or more Excel files to compare their spectra.")
+        st.stop()
+
+    from spectral.compare import overlay_chart
+
+    try:
+        stack = load_sites(tuple(content_hash(f) for f in uploaded_files), uploaded_files)
+        fits = stack.fits()
+        x_label = st.text_input("🧭 X-axis Label", "X (CYC/K_unit) - 2D RADIALLY")
+        y_label = st.text_input("🧭 Y-axis Label", "Y (Ln_P) - SPECTRUM")
+        show_fits = st.checkbox("📐 Overlay Regression Lines", value=True)
+
+        st.subheader(f"📊 {len(stack)} Sites")
+        st.altair_chart(overlay_chart(stack, fits if show_fits else None, x_label=x_label, y_label=y_label),
+                        width="stretch")
+        st.subheader("📐 Slope and Depth by Site")
+        st.dataframe(fits.style.format(precision=4), hide_index=True)
+    except Exception as e:
+        st.error(f"❌ An error occurred while comparing the files: {e}")
+    st.stop()
+
 # File Upload
 uploaded_file = st.file_uploader("📤 Upload your Excel file (.xlsx)", type="xlsx")
 
 if uploaded_file:
-    try:
-        df = pd.read_excel(uploaded_file)
+    # matplotlib loads with the first upload, not on the empty start page
+    import matplotlib.pyplot as plt
 
-        # Clean the data
-        x = pd.to_numeric(df.iloc[:, 0], errors='coerce')
-        y = pd.to_numeric(df.iloc[:, 1], errors='coerce')
-        valid_data = df[(~x.isna()) & (~y.isna())]
+    try:
+        # Load and clean the data
+        df, valid_data = load_workbook(content_hash(uploaded_file), uploaded_file)
         x = valid_data.iloc[:, 0]
         y = valid_data.iloc[:, 1]
 
@@ -0,0 +1,21 @@
+"""Shared spectral-analysis routines used by the site scripts and apps."""
+
+import importlib
+
+__all__ = [
+    "SITES",
+    "clean_spectrum",
+    "fft_spectrum",
+    "load_spectrum",
+    "plot_spectrum",
+    "process_site",
+    "site_source",
+]
+
+
+# The re-exports load .core (pandas, matplotlib) on first use, so
+# ``python -m spectral`` starts without importing the numeric stack.
+def __getattr__(name):
+    if name in __all__:
+        return getattr(importlib.import_module(".core", __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
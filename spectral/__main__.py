@@ -0,0 +1,355 @@
+import argparse
+import sys
+import time
+
+
+def batch(args):
+    from .core import SITES, process_site
+
+    sites = args.sites or list(SITES)
+    start = time.perf_counter()
+    failed = 0
+    for name in sites:
+        try:
+            result = process_site(name, data_dir=args.data_dir, out_dir=args.out, dpi=args.dpi)
+        except Exception as e:
+            failed += 1
+            print(f"{name}: failed ({e})", file=sys.stderr)
+            continue
+        print(f"{result['site']}: {result['points']} points -> {result['figure']}")
+
+    elapsed = time.perf_counter() - start
+    print(f"Processed {len(sites) - failed}/{len(sites)} sites in {elapsed:.2f}s")
+    return 1 if failed else 0
+
+
+def survey(args):
+    from .batch import run_batch
+
+    summary = run_batch(args.paths, out_dir=args.out, workers=args.workers, dpi=args.dpi)
+    return 1 if summary.empty or (summary["error"] != "").any() else 0
+
+
+def cache(args):
+    from . import cache as sheet_cache
+    from .batch import discover_workbooks
+
+    cache_dir = args.cache_dir or sheet_cache.CACHE_DIR
+    if args.action == "warm":
+        for path in discover_workbooks(args.paths):
+            start = time.perf_counter()
+            df = sheet_cache.read_excel_cached(path, sheet_name=args.sheet, cache_dir=cache_dir)
+            print(f"{path}: {len(df)} rows cached in {time.perf_counter() - start:.2f}s")
+    elif args.action == "purge":
+        if args.max_mb is None:
+            removed = sheet_cache.purge(cache_dir)
+        else:
+            removed = sheet_cache.evict(cache_dir, int(args.max_mb * 2**20))
+        print(f"Removed {removed} cached entries from {cache_dir}")
+    else:
+        entries = sheet_cache.cache_entries(cache_dir)
+        total = sum(size for _, _, size in entries)
+        print(f"{cache_dir}: {len(entries)} cached entries, {total / 2**20:.1f} MB")
+    return 0
+
+
+def depth(args):
+    from .core import SITES, load_spectrum, site_source
+    from .depth import estimate_depths
+
+    spectra = {}
+    for name in args.sites or list(SITES):
+        path, title = site_source(name, args.data_dir)
+        spectra[title] = load_spectrum(path)
+
+    options = {"n_resamples": args.resamples, "confidence": args.confidence} if args.intervals else {}
+    depths = estimate_depths(spectra, n_segments=args.segments, min_points=args.min_points, units=args.units,
+                             intervals=args.intervals, **options)
+    if args.out:
+        depths.to_csv(args.out, index=False)
+    print(depths.to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+    return 0
+
+
+def stream(args):
+    import numpy as np
+    import pandas as pd
+
+    from .gridding import grid_points
+    from .gridfile import Grid, detect_grid_format, write_grid
+    from .ingest import bin_chunks, line_spectra, read_chunks, scan
+
+    start = time.perf_counter()
+    info = scan(args.path, args.x, args.y, chunk_rows=args.chunk_rows)
+    print(f"{args.path}: {info['rows']:,d} rows, {len(info['lines'])} lines, bounds {info['bounds']}")
+
+    if args.z:
+        chunks = read_chunks(args.path, [args.x, args.y, args.z], chunk_rows=args.chunk_rows)
+        gx, gy, Z = bin_chunks(chunks, args.x, args.y, args.z, args.cell_size, info["bounds"])
+        if args.fill:
+            # Interpolate the empty cells from the binned cell centres, not the raw points
+            xx, yy = np.meshgrid(gx, gy)
+            filled = ~np.isnan(Z)
+            gx, gy, Z = grid_points(xx[filled], yy[filled], Z[filled], cell_size=args.cell_size,
+                                    bounds=info["bounds"])
+        out = args.out or "grid.csv"
+        if detect_grid_format(out):
+            write_grid(out, Grid.from_axes(gx, gy, Z, name=args.z))
+        else:
+            pd.DataFrame(Z, index=pd.Index(gy, name=args.y), columns=gx).to_csv(out)
+        print(f"{Z.shape[1]} x {Z.shape[0]} grid of {args.z} written to {out}")
+
+    if args.spectra:
+        chunks = read_chunks(args.path, [args.spectra], chunk_rows=args.chunk_rows)
+        spectra = line_spectra(chunks, args.spectra, args.sampling_interval, args.segment_length)
+        out = args.spectra_out or "line_spectra.csv"
+        frames = [spectrum.to_frame().assign(line=line) for line, spectrum in spectra.items()]
+        (pd.concat(frames) if frames else pd.DataFrame(columns=["line"])).to_csv(out, index=False)
+        print(f"Welch spectra of {args.spectra} for {len(spectra)} lines written to {out}")
+
+    print(f"Done in {time.perf_counter() - start:.2f}s")
+    return 0
+
+
+def grid(args):
+    import numpy as np
+
+    from .gridfile import Grid, read_grid, write_grid
+
+    source = read_grid(args.path)
+    if args.crs:
+        source.crs = args.crs
+    x_min, x_max, y_min, y_max = source.bounds
+    print(f"{args.path}: {source.shape[1]} x {source.shape[0]} nodes, cell {source.dx:g} x {source.dy:g}, "
+          f"X {x_min:g}..{x_max:g}, Y {y_min:g}..{y_max:g}" + (f", CRS {source.crs}" if source.crs else ""))
+
+    if args.action == "convert":
+        write_grid(args.out, source, args.format)
+        print(f"Written to {args.out}")
+    elif args.action == "anomaly":
+        from .anomaly import detect_anomalies
+
+        labels, scores, _ = detect_anomalies(source, contamination=args.contamination)
+        write_grid(args.out, Grid(scores if args.scores else labels, source.x0, source.y0, source.dx, source.dy,
+                                  source.crs, f"{source.name or 'grid'} anomaly"), args.format)
+        print(f"{int(np.sum(labels == -1))} anomalous nodes, map written to {args.out}")
+    return 0
+
+
+def depth_map(args):
+    import numpy as np
+
+    from .gridfile import detect_grid_format, read_grid, write_grid
+    from .ingest import read_table
+    from .windowed import grid_depths, line_depths
+
+    band = tuple(args.band) if args.band else None
+    if detect_grid_format(args.path):
+        try:
+            depths = grid_depths(read_grid(args.path), args.window, args.step, band, args.units, args.workers)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 2
+        out = args.out or "depth.sgrd"
+        write_grid(out, depths)
+        print(f"{depths.shape[1]} x {depths.shape[0]} depth map, median depth {np.nanmedian(depths.values):.4f}")
+    elif not args.column:
+        print("depth-map on a line file needs --column", file=sys.stderr)
+        return 2
+    else:
+        data = read_table(args.path)
+        depths = line_depths(data, args.column, args.window, args.step, args.sampling_interval, band, args.units,
+                             workers=args.workers)
+        if not len(depths):
+            print(f"No line holds {args.window} valid samples of {args.column}", file=sys.stderr)
+            return 1
+        out = args.out or "depth_profiles.csv"
+        depths.to_csv(out, index=False)
+        print(f"{len(depths)} windows, median depth {depths['depth'].median():.4f}")
+    print(f"Written to {out}")
+    return 0
+
+
+def filter_(args):
+    import numpy as np
+
+    from .filters import filter_grid, parse_filter
+    from .gridfile import detect_grid_format, read_grid, write_grid
+
+    try:
+        filters = [parse_filter(spec) for spec in args.filters]
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    source = read_grid(args.path)
+    # Native output is written tile by tile into a memory map; other formats are encoded from memory
+    native = (args.format or detect_grid_format(args.out)) == "native"
+    result = filter_grid(source, filters, tile_size=args.tile, overlap=args.overlap,
+                         out=args.out if native else None, workers=args.workers)
+    if not native:
+        write_grid(args.out, result, args.format)
+    print(f"{result.name}: range {np.nanmin(result.values):.6g}..{np.nanmax(result.values):.6g}, written to {args.out}")
+    return 0
+
+
+def perf(args):
+    import os
+
+    import pandas as pd
+
+    from .instrument import LOG_PATH, summarise
+
+    path = args.log or LOG_PATH
+    if not os.path.exists(path):
+        print(f"No performance log at {path}; open the apps first or set SPECTRAL_PERF_LOG", file=sys.stderr)
+        return 1
+    table = summarise(path)
+    if args.app:
+        table = table[table["app"] == args.app]
+    if args.top:
+        table = table.head(args.top)
+    with pd.option_context("display.width", 200, "display.max_columns", None, "display.float_format", "{:.4g}".format):
+        print(table.to_string(index=False))
+    return 0
+
+
+def run(args):
+    from .pipeline import run_manifest
+
+    summary = run_manifest(args.manifest, workers=args.workers)
+    return 1 if (summary["error"] != "").any() else 0
+
+
+def report(args):
+    from .report import build_report
+
+    build_report(args.results, out_dir=args.out, formats=args.format, title=args.title,
+                 workers=args.workers, dpi=args.dpi)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m spectral", description="Spectral analysis tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    batch_parser = commands.add_parser("batch", help="plot many site spectra to PNG in one process")
+    batch_parser.add_argument("sites", nargs="*", help="site names or workbook paths (default: all known sites)")
+    batch_parser.add_argument("--data-dir", default=".", help="directory holding <site>.xlsx files")
+    batch_parser.add_argument("--out", default="figures", help="directory for the PNG figures")
+    batch_parser.add_argument("--dpi", type=int, default=100)
+    batch_parser.set_defaults(func=batch)
+
+    survey_parser = commands.add_parser("survey", help="analyse a directory of site workbooks across a process pool")
+    survey_parser.add_argument("paths", nargs="+", help="workbooks or directories containing *.xlsx files")
+    survey_parser.add_argument("--out", default="figures", help="directory for figures and summary.csv")
+    survey_parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    survey_parser.add_argument("--dpi", type=int, default=100)
+    survey_parser.set_defaults(func=survey)
+
+    cache_parser = commands.add_parser("cache", help="warm, inspect or purge the parsed-workbook cache")
+    cache_parser.add_argument("action", choices=["warm", "purge", "info"])
+    cache_parser.add_argument("paths", nargs="*", help="workbooks or directories to warm")
+    cache_parser.add_argument("--sheet", default=0, type=lambda s: int(s) if s.isdigit() else s,
+                              help="sheet name or index to warm (default: first sheet)")
+    cache_parser.add_argument("--max-mb", type=float, default=None,
+                              help="purge only least recently used entries down to this size")
+    cache_parser.add_argument("--cache-dir", default=None)
+    cache_parser.set_defaults(func=cache)
+
+    depth_parser = commands.add_parser("depth", help="fit spectral segments and estimate source depths per site")
+    depth_parser.add_argument("sites", nargs="*", help="site names or workbook paths (default: all known sites)")
+    depth_parser.add_argument("--data-dir", default=".", help="directory holding <site>.xlsx files")
+    depth_parser.add_argument("--segments", type=int, default=3, help="number of linear segments (deep, shallow, noise)")
+    depth_parser.add_argument("--min-points", type=int, default=5, help="fewest points allowed in a segment")
+    depth_parser.add_argument("--units", choices=["cycles", "radians"], default="cycles",
+                              help="wavenumber units of the X column")
+    depth_parser.add_argument("--intervals", choices=["bootstrap", "jackknife"], default=None,
+                              help="add confidence intervals to every segment's slope, intercept and depth")
+    depth_parser.add_argument("--resamples", type=int, default=2000, help="bootstrap resamples per segment")
+    depth_parser.add_argument("--confidence", type=float, default=0.95, help="confidence level of the intervals")
+    depth_parser.add_argument("--out", default=None, help="also write the table to this CSV file")
+    depth_parser.set_defaults(func=depth)
+
+    stream_parser = commands.add_parser("stream", help="grid or take line spectra of a large CSV/XYZ survey in chunks")
+    stream_parser.add_argument("path", help="CSV, XYZ or Geosoft ASCII flight-line file")
+    stream_parser.add_argument("--x", default="X", help="easting column (default: X)")
+    stream_parser.add_argument("--y", default="Y", help="northing column (default: Y)")
+    stream_parser.add_argument("--z", default=None, help="column to grid by cell averaging")
+    stream_parser.add_argument("--cell-size", type=float, default=None, help="grid cell size in X/Y units")
+    stream_parser.add_argument("--fill", action="store_true", help="interpolate cells that received no samples")
+    stream_parser.add_argument("--out", default=None, help="grid CSV file (default: grid.csv)")
+    stream_parser.add_argument("--spectra", default=None, help="column to take a Welch spectrum of along each line")
+    stream_parser.add_argument("--sampling-interval", type=float, default=1.0, help="sample spacing along the lines")
+    stream_parser.add_argument("--segment-length", type=int, default=256, help="Welch segment length in samples")
+    stream_parser.add_argument("--spectra-out", default=None, help="spectra CSV file (default: line_spectra.csv)")
+    stream_parser.add_argument("--chunk-rows", type=int, default=1_000_000, help="rows held in memory at a time")
+    stream_parser.set_defaults(func=stream)
+
+    grid_parser = commands.add_parser("grid", help="inspect, convert or find anomalies in a saved grid file")
+    grid_parser.add_argument("action", choices=["info", "convert", "anomaly"])
+    grid_parser.add_argument("path", help="native .sgrd, Surfer .grd or ESRI .asc grid")
+    grid_parser.add_argument("--out", default=None, help="output grid for convert/anomaly (format from extension)")
+    grid_parser.add_argument("--format", choices=["native", "surfer", "surfer-binary", "esri"], default=None,
+                             help="output format when the extension is ambiguous")
+    grid_parser.add_argument("--crs", default=None, help="coordinate reference system to record, e.g. EPSG:32632")
+    grid_parser.add_argument("--contamination", type=float, default=0.1, help="expected share of anomalous nodes")
+    grid_parser.add_argument("--scores", action="store_true", help="write anomaly scores instead of -1/1 labels")
+    grid_parser.set_defaults(func=grid)
+
+    depth_map_parser = commands.add_parser("depth-map",
+                                           help="moving-window depths along flight lines or over tiles of a grid")
+    depth_map_parser.add_argument("path", help="grid file (.sgrd/.grd/.asc) or CSV/XYZ flight-line file")
+    depth_map_parser.add_argument("--column", default=None, help="channel to analyse in a line file")
+    depth_map_parser.add_argument("--window", type=int, default=64, help="window length in samples or tile size in cells")
+    depth_map_parser.add_argument("--step", type=int, default=None, help="window step (default: half a window)")
+    depth_map_parser.add_argument("--sampling-interval", type=float, default=1.0, help="sample spacing along lines")
+    depth_map_parser.add_argument("--band", type=float, nargs=2, default=None, metavar=("K_MIN", "K_MAX"),
+                                  help="wavenumber band to fit (default: deep segment of the mean spectrum)")
+    depth_map_parser.add_argument("--units", choices=["cycles", "radians"], default="cycles")
+    depth_map_parser.add_argument("--workers", type=int, default=None, help="threads (default: CPU count)")
+    depth_map_parser.add_argument("--out", default=None, help="depth grid or CSV (default: depth.sgrd / depth_profiles.csv)")
+    depth_map_parser.set_defaults(func=depth_map)
+
+    filter_parser = commands.add_parser("filter", help="apply wavenumber filters (continuation, derivatives, RTP) to a grid")
+    filter_parser.add_argument("path", help="native .sgrd, Surfer .grd or ESRI .asc grid")
+    filter_parser.add_argument("out", help="output grid (format from extension); .sgrd is written without holding it in memory")
+    filter_parser.add_argument("filters", nargs="+", metavar="FILTER",
+                               help="name:param:... applied in one transform, e.g. upward:500 dz rtp:-12:2 "
+                                    "(upward, downward, dz, dx, dy, bandpass, rtp)")
+    filter_parser.add_argument("--tile", type=int, default=None, help="filter in tiles of this many cells a side")
+    filter_parser.add_argument("--overlap", type=int, default=None, help="cells each tile borrows from its neighbours")
+    filter_parser.add_argument("--format", choices=["native", "surfer", "surfer-binary", "esri"], default=None)
+    filter_parser.add_argument("--workers", type=int, default=None, help="threads for tiles (default: CPU count)")
+    filter_parser.set_defaults(func=filter_)
+
+    perf_parser = commands.add_parser("perf", help="summarise the apps' per-stage timing log across sessions")
+    perf_parser.add_argument("log", nargs="?", default=None, help="JSON-lines log (default: SPECTRAL_PERF_LOG or <cache>/perf.jsonl)")
+    perf_parser.add_argument("--app", default=None, help="only stages of this app (grid, upgrade)")
+    perf_parser.add_argument("--top", type=int, default=None, help="show the N stages with the most total time")
+    perf_parser.set_defaults(func=perf)
+
+    run_parser = commands.add_parser("run", help="run the stages listed in a YAML/JSON manifest, without Streamlit")
+    run_parser.add_argument("manifest", help="manifest file (see spectral/pipeline.py for the layout)")
+    run_parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    run_parser.set_defaults(func=run)
+
+    report_parser = commands.add_parser("report", help="render a PDF/HTML interpretation report from a run's outputs")
+    report_parser.add_argument("results", help="output directory of `run` (holding run.json and summary.csv)")
+    report_parser.add_argument("--format", nargs="+", choices=["html", "pdf"], default=["html", "pdf"])
+    report_parser.add_argument("--out", default=None, help="directory for the report (default: the results directory)")
+    report_parser.add_argument("--title", default=None)
+    report_parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    report_parser.add_argument("--dpi", type=int, default=100)
+    report_parser.set_defaults(func=report)
+
+    args = parser.parse_args(argv)
+    if args.command == "grid" and args.action != "info" and not args.out:
+        parser.error(f"grid {args.action} needs --out")
+
+    if args.command == "stream" and args.z and not args.cell_size:
+        parser.error("stream --z needs --cell-size")
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from scipy.ndimage import uniform_filter
+
+FEATURES = ["value", "local_mean", "local_std", "residual", "gradient_x", "gradient_y"]
+
+
+def spatial_features(Z, window=5):
+    """Per-cell features of a grid, ignoring NaN cells.
+
+    Local mean and standard deviation come from NaN-aware box filters over
+    a ``window`` x ``window`` neighbourhood; gradients are taken on the grid
+    with gaps filled by the local mean. Returns ``(features, valid)`` where
+    ``features`` has one row per valid cell and ``valid`` is the cell mask.
+    """
+    Z = np.asarray(Z, dtype=float)
+    valid = ~np.isnan(Z)
+    filled = np.where(valid, Z, 0.0)
+    weight = valid.astype(float)
+
+    # Box sums of z, z² and the mask give NaN-aware local moments in one pass each
+    count = uniform_filter(weight, size=window, mode="nearest")
+    # Filter round-off leaves tiny non-zero counts where a window holds no data
+    covered = count > 0.5 / window ** 2
+    local_mean = np.divide(uniform_filter(filled, size=window, mode="nearest"), count,
+                           out=np.full(Z.shape, np.nan), where=covered)
+    local_sq = np.divide(uniform_filter(filled * filled, size=window, mode="nearest"), count,
+                         out=np.full(Z.shape, np.nan), where=covered)
+    local_std = np.sqrt(np.maximum(local_sq - local_mean ** 2, 0.0))
+
+    smooth = np.where(valid, Z, np.nan_to_num(local_mean, nan=np.nanmean(Z) if valid.any() else 0.0))
+    gradient_y, gradient_x = np.gradient(smooth) if min(Z.shape) > 1 else (np.zeros_like(Z), np.zeros_like(Z))
+
+    columns = [Z, local_mean, local_std, Z - local_mean, gradient_x, gradient_y]
+    features = np.column_stack([column[valid] for column in columns])
+    return features, valid
+
+
+def fit_model(features, contamination=0.1, sample_size=50_000, n_estimators=100, random_state=0, n_jobs=None):
+    """Fit an IsolationForest on at most ``sample_size`` rows of ``features``.
+
+    A fixed ``random_state`` makes both the subsample and the forest
+    repeatable, so the same grid always gives the same zones.
+    """
+    from sklearn.ensemble import IsolationForest
+
+    rng = np.random.default_rng(random_state)
+    if len(features) > sample_size:
+        features = features[rng.choice(len(features), sample_size, replace=False)]
+
+    model = IsolationForest(contamination=contamination, n_estimators=n_estimators,
+                            random_state=random_state, n_jobs=n_jobs)
+    return model.fit(features)
+
+
+def score(model, features, chunk_size=100_000, n_jobs=None):
+    """Decision scores for ``features`` (negative means anomalous), in parallel chunks."""
+    chunks = [features[start:start + chunk_size] for start in range(0, len(features), chunk_size)]
+    if not chunks:
+        return np.empty(0)
+    with ThreadPoolExecutor(max_workers=n_jobs or os.cpu_count()) as pool:
+        return np.concatenate(list(pool.map(model.decision_function, chunks)))
+
+
+def detect_anomalies(Z, contamination=0.1, window=5, sample_size=50_000, random_state=0, n_jobs=None, model=None,
+                     progress=None):
+    """Anomaly map for a grid.
+
+    Returns ``(labels, scores, model)``: ``labels`` is ``-1`` for anomalous
+    cells, ``1`` for normal cells and NaN where ``Z`` has no data, and
+    ``scores`` holds the IsolationForest decision values on the same grid.
+    Pass a previously fitted ``model`` to skip fitting. ``progress`` is
+    called as ``progress(fraction, message)`` before each step.
+    """
+    progress = progress or (lambda fraction, message: None)
+    progress(0.05, "Computing spatial features")
+    features, valid = spatial_features(Z, window)
+    labels = np.full(valid.shape, np.nan)
+    scores = np.full(valid.shape, np.nan)
+    if len(features) == 0:
+        return labels, scores, model
+
+    if model is None:
+        progress(0.3, "Fitting the isolation forest")
+        model = fit_model(features, contamination, sample_size, random_state=random_state, n_jobs=n_jobs)
+    progress(0.6, f"Scoring {len(features):,} cells")
+    values = score(model, features, n_jobs=n_jobs)
+    scores[valid] = values
+    labels[valid] = np.where(values < 0, -1.0, 1.0)
+    return labels, scores, model
+
+
+def anomaly_labels(Z, contamination=0.1, window=5, sample_size=50_000, random_state=0, n_jobs=None):
+    """:func:`detect_anomalies` labels only, reporting progress when run as a background job."""
+    from .jobs import progress
+
+    return detect_anomalies(Z, contamination, window, sample_size, random_state, n_jobs, progress=progress)[0]
@@ -0,0 +1,124 @@
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+from matplotlib.figure import Figure
+
+from .core import fft_spectrum, load_spectrum, plot_spectrum, site_source
+from .resample import infer_interval, is_uniform, resample
+
+
+def discover_workbooks(paths):
+    """Expand files and directories into a sorted, de-duplicated list of workbooks."""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            found.extend(glob.glob(os.path.join(path, "*.xlsx")))
+        else:
+            found.append(path)
+
+    # Skip the lock files Excel leaves next to open workbooks
+    found = [p for p in found if not os.path.basename(p).startswith("~$")]
+    return sorted(set(os.path.normpath(p) for p in found))
+
+
+def sampling_interval(x):
+    """Median spacing of ``x``, falling back to 1 when it is not usable."""
+    step = infer_interval(x)
+    return step if step > 0 else 1.0
+
+
+def analyse_workbook(path, out_dir, dpi=100):
+    """Clean, plot and FFT one workbook. Runs inside a worker process."""
+    start = time.perf_counter()
+    _, title = site_source(path)
+    stem = os.path.splitext(os.path.basename(path))[0]
+
+    data = load_spectrum(path)
+    x = data.iloc[:, 0].to_numpy()
+    y = data.iloc[:, 1].to_numpy()
+
+    figure_path = os.path.join(out_dir, f"{stem}.png")
+    plot_spectrum(data, f"{title} 2D Radial Spectrum").savefig(figure_path, dpi=dpi)
+
+    # The FFT needs even spacing, so irregular or unsorted X is resampled first
+    interval = sampling_interval(x)
+    profile = y if is_uniform(x) or len(x) < 2 else resample(x, y, interval)[1]
+    xf, magnitude = fft_spectrum(profile, interval)
+
+    fft_path = os.path.join(out_dir, f"{stem}_fft.png")
+    fig = Figure(figsize=(8, 5))
+    ax = fig.add_subplot()
+    ax.plot(xf, magnitude, color='green')
+    ax.set_title(f"{title} Frequency Spectrum")
+    ax.set_xlabel("Frequency")
+    ax.set_ylabel("Magnitude")
+    ax.grid(True)
+    fig.tight_layout()
+    fig.savefig(fft_path, dpi=dpi)
+
+    # Ignore the DC bin when picking the dominant frequency
+    peak = int(np.argmax(magnitude[1:])) + 1 if len(magnitude) > 1 else 0
+
+    return {
+        "site": title,
+        "source": path,
+        "points": len(data),
+        "x_min": float(x.min()) if len(x) else np.nan,
+        "x_max": float(x.max()) if len(x) else np.nan,
+        "y_min": float(y.min()) if len(y) else np.nan,
+        "y_max": float(y.max()) if len(y) else np.nan,
+        "y_mean": float(y.mean()) if len(y) else np.nan,
+        "sampling_interval": interval,
+        "peak_frequency": float(xf[peak]) if len(xf) else np.nan,
+        "peak_magnitude": float(magnitude[peak]) if len(magnitude) else np.nan,
+        "figure": figure_path,
+        "fft_figure": fft_path,
+        "seconds": time.perf_counter() - start,
+        "error": "",
+    }
+
+
+def run_batch(paths, out_dir="figures", workers=None, dpi=100, progress=print):
+    """Analyse every workbook under ``paths`` across a process pool.
+
+    Returns the per-site summary as a DataFrame, which is also written to
+    ``<out_dir>/summary.csv``. ``progress`` is called with one line per
+    finished site and a timing report at the end; pass ``None`` to silence it.
+    """
+    workbooks = discover_workbooks(paths)
+    os.makedirs(out_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    report = progress or (lambda message: None)
+
+    start = time.perf_counter()
+    rows = []
+    with ProcessPoolExecutor(max_workers=min(workers, max(len(workbooks), 1))) as pool:
+        futures = {pool.submit(analyse_workbook, path, out_dir, dpi): path for path in workbooks}
+        for done, future in enumerate(as_completed(futures), 1):
+            path = futures[future]
+            try:
+                row = future.result()
+                report(f"[{done}/{len(workbooks)}] {row['site']}: {row['points']} points in {row['seconds']:.2f}s")
+            except Exception as e:
+                row = {"site": site_source(path)[1], "source": path, "error": str(e)}
+                report(f"[{done}/{len(workbooks)}] {path}: failed ({e})")
+            rows.append(row)
+
+    elapsed = time.perf_counter() - start
+    summary = pd.DataFrame(rows)
+    if not summary.empty:
+        summary = summary.sort_values("source").reset_index(drop=True)
+    summary.to_csv(os.path.join(out_dir, "summary.csv"), index=False)
+
+    busy = summary["seconds"].sum() if "seconds" in summary else 0.0
+    failed = int((summary["error"] != "").sum()) if "error" in summary else 0
+    report(
+        f"Processed {len(workbooks) - failed}/{len(workbooks)} workbooks with {workers} workers "
+        f"in {elapsed:.2f}s ({len(workbooks) / elapsed if elapsed else 0:.1f} sites/s, "
+        f"{busy:.2f}s of worker time, {busy / elapsed if elapsed else 0:.1f}x parallel)"
+    )
+    return summary
@@ -0,0 +1,191 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+# Parsed sheets are kept as one .npy file per column so numeric columns can be
+# memory-mapped straight back into a DataFrame on the next load.
+CACHE_DIR = os.environ.get("SPECTRAL_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "spectral"))
+MAX_BYTES = int(float(os.environ.get("SPECTRAL_CACHE_MAX_MB", "1024")) * 2**20)
+
+_META = "meta.json"
+# Report figures live as single PNG files in this subdirectory and share the eviction budget
+FIGURES_DIR = "figures"
+_CHUNK = 1 << 20
+
+# Digests of files on disk, keyed by (path, size, mtime) so unchanged files are hashed once per process
+_file_digests = {}
+
+
+def content_hash(source):
+    """SHA-1 of a workbook given as a path, bytes or a file-like object."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return hashlib.sha1(source).hexdigest()
+
+    if isinstance(source, (str, os.PathLike)):
+        path = os.path.abspath(source)
+        stat = os.stat(path)
+        stamp = (path, stat.st_size, stat.st_mtime_ns)
+        if stamp not in _file_digests:
+            digest = hashlib.sha1()
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(_CHUNK), b""):
+                    digest.update(block)
+            _file_digests[stamp] = digest.hexdigest()
+        return _file_digests[stamp]
+
+    # Uploads (BytesIO / Streamlit UploadedFile) expose their whole buffer
+    if hasattr(source, "getvalue"):
+        return hashlib.sha1(source.getvalue()).hexdigest()
+
+    position = source.tell()
+    digest = hashlib.sha1()
+    for block in iter(lambda: source.read(_CHUNK), b""):
+        digest.update(block)
+    source.seek(position)
+    return digest.hexdigest()
+
+
+def cache_key(digest, sheet_name=0):
+    return hashlib.sha1(f"{digest}\0{sheet_name!r}".encode()).hexdigest()
+
+
+def _entry_size(entry):
+    return sum(entry_file.stat().st_size for entry_file in os.scandir(entry))
+
+
+def _store(entry, df):
+    import numpy as np
+
+    columns, kinds = [], []
+    # Unique per call: sessions are threads of one process and may store the same upload at once
+    try:
+        tmp = tempfile.mkdtemp(dir=os.path.dirname(entry), prefix=f"{os.path.basename(entry)}.tmp-")
+    except OSError:
+        return
+    try:
+        for i, name in enumerate(df.columns):
+            values = df.iloc[:, i].to_numpy()
+            # Numbers, booleans and naive datetimes map; anything else is pickled
+            if values.dtype.kind in "biufcM":
+                np.save(os.path.join(tmp, f"{i}.npy"), values)
+                kinds.append("array")
+            else:
+                np.save(os.path.join(tmp, f"{i}.npy"), values.astype(object), allow_pickle=True)
+                kinds.append("object")
+            columns.append(name if isinstance(name, (str, int, float)) else str(name))
+
+        with open(os.path.join(tmp, _META), "w") as f:
+            json.dump({"columns": columns, "kinds": kinds, "rows": len(df)}, f)
+        os.rename(tmp, entry)
+    except OSError:
+        # Another session or process stored the same sheet first, or the cache is not writable
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def _load(entry):
+    import numpy as np
+    import pandas as pd
+
+    meta_path = os.path.join(entry, _META)
+    with open(meta_path) as f:
+        meta = json.load(f)
+
+    data = {}
+    for i, (name, kind) in enumerate(zip(meta["columns"], meta["kinds"])):
+        path = os.path.join(entry, f"{i}.npy")
+        if kind == "array":
+            data[name] = np.load(path, mmap_mode="r")
+        else:
+            data[name] = np.load(path, allow_pickle=True)
+
+    # Mark the entry as recently used for LRU eviction
+    os.utime(meta_path)
+    return pd.DataFrame(data, index=pd.RangeIndex(meta["rows"]), copy=False)
+
+
+def read_excel_cached(source, sheet_name=0, cache_dir=None, max_bytes=None):
+    """Drop-in replacement for ``pd.read_excel`` backed by the column cache.
+
+    The first read of a workbook sheet parses it with pandas and stores the
+    columns under a key built from the file's content hash and the sheet
+    name. Later reads of identical content memory-map the stored columns,
+    so the returned frame is read-only where it came from the cache.
+    """
+    # numpy and pandas load on the first read, so apps can import this module on their start page
+    import pandas as pd
+
+    if not isinstance(sheet_name, (str, int)):
+        return pd.read_excel(source, sheet_name=sheet_name)
+
+    cache_dir = cache_dir or CACHE_DIR
+    entry = os.path.join(cache_dir, cache_key(content_hash(source), sheet_name))
+    if os.path.isdir(entry):
+        try:
+            return _load(entry)
+        except (OSError, ValueError):
+            shutil.rmtree(entry, ignore_errors=True)
+
+    df = pd.read_excel(source, sheet_name=sheet_name)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+    except OSError:
+        return df
+    _store(entry, df)
+    evict(cache_dir, max_bytes)
+    return df
+
+
+def cache_entries(cache_dir=None):
+    """List ``(path, last_used, size_bytes)`` for every cached sheet, grid and figure, oldest first."""
+    cache_dir = cache_dir or CACHE_DIR
+    if not os.path.isdir(cache_dir):
+        return []
+
+    entries = []
+    for item in os.scandir(cache_dir):
+        meta_path = os.path.join(item.path, _META)
+        if item.is_dir() and ".tmp-" not in item.name and os.path.exists(meta_path):
+            entries.append((item.path, os.stat(meta_path).st_mtime, _entry_size(item.path)))
+    figures = os.path.join(cache_dir, FIGURES_DIR)
+    if os.path.isdir(figures):
+        for item in os.scandir(figures):
+            if item.is_file() and item.name.endswith(".png") and ".tmp-" not in item.name:
+                stat = item.stat()
+                entries.append((item.path, stat.st_mtime, stat.st_size))
+    return sorted(entries, key=lambda entry: entry[1])
+
+
+def evict(cache_dir=None, max_bytes=None, keep=()):
+    """Remove least recently used entries until the cache fits in ``max_bytes``.
+
+    Entries in ``keep`` (e.g. the one just stored, which the caller is
+    about to open) are never removed, even if they alone exceed the budget.
+    """
+    max_bytes = MAX_BYTES if max_bytes is None else max_bytes
+    keep = {os.path.abspath(path) for path in keep}
+    entries = cache_entries(cache_dir)
+    total = sum(size for _, _, size in entries)
+
+    removed = 0
+    for path, _, size in entries:
+        if total <= max_bytes:
+            break
+        if os.path.abspath(path) in keep:
+            continue
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        total -= size
+        removed += 1
+    return removed
+
+
+def purge(cache_dir=None):
+    """Remove every cached sheet, grid and figure. Returns the number of entries removed."""
+    return evict(cache_dir, max_bytes=0)
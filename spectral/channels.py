@@ -0,0 +1,144 @@
+"""Derived radiometric channels: ratios, total count and ternary colour.
+
+Expressions use the channel names ``K``, ``eTh``, ``eU`` and ``TC`` (or
+any column name that is a Python identifier) with ``+ - * /``, ``**``
+and numbers, e.g. ``eTh/K`` or ``(eU + eTh) / K``. Every operation is a
+vectorised NumPy call; division by a value at or below
+``min_denominator`` gives NaN instead of inf, and NaN inputs stay NaN.
+"""
+import ast
+import operator
+import re
+from functools import lru_cache
+
+import numpy as np
+
+# Column names recognised for each radiometric channel (compared without case, spaces, '_' or units)
+ALIASES = {
+    "K": ["k", "kpct", "kperc", "potassium"],
+    "eTh": ["eth", "th", "ethppm", "thppm", "thorium"],
+    "eU": ["eu", "u", "euppm", "uppm", "uranium"],
+    "TC": ["tc", "totalcount", "tcnr"],
+}
+
+# Ground-level air absorbed dose rate in nGy/h from K (%), eU and eTh (ppm), IAEA-TECDOC-1363
+DOSE_RATE = "13.078 * K + 5.675 * eU + 2.494 * eTh"
+
+# Channels offered by the grid viewer, as label -> expression, when their inputs exist
+STANDARD = {
+    "eTh/K": "eTh / K",
+    "eU/K": "eU / K",
+    "eU/eTh": "eU / eTh",
+    "K/TC": "K / TC",
+    "Dose rate (nGy/h)": DOSE_RATE,
+}
+
+_BINARY = {ast.Add: np.add, ast.Sub: np.subtract, ast.Mult: np.multiply, ast.Pow: np.power}
+
+
+def _key(name):
+    return re.sub(r"[\s_%()\[\]]|ppm$", "", str(name).lower())
+
+
+def find_channels(columns):
+    """Map ``K``/``eTh``/``eU``/``TC`` to the first matching column name in ``columns``."""
+    found = {}
+    for column in columns:
+        key = _key(column)
+        for channel, aliases in ALIASES.items():
+            if channel not in found and (key in aliases or key == channel.lower()):
+                found[channel] = column
+    return found
+
+
+def safe_divide(numerator, denominator, min_denominator=0.0):
+    """``numerator / denominator`` with NaN wherever ``denominator <= min_denominator``.
+
+    Radiometric channels are non-negative, so zero and small negative
+    values from noise would otherwise give inf or sign-flipped ratios.
+    """
+    numerator = np.asarray(numerator, dtype=float)
+    denominator = np.asarray(denominator, dtype=float)
+    shape = np.broadcast_shapes(numerator.shape, denominator.shape)
+    out = np.full(shape, np.nan)
+    np.divide(numerator, denominator, out=out, where=denominator > min_denominator)
+    return out
+
+
+@lru_cache(maxsize=256)
+def parse(expression):
+    """Check an expression and return its tree and the names it uses."""
+    tree = ast.parse(expression, mode="eval")
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            names.add(node.id)
+        elif not isinstance(node, (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Constant, ast.Load, ast.USub,
+                                   ast.UAdd, ast.Div, *_BINARY)):
+            raise ValueError(f"Unsupported syntax in channel expression {expression!r}: {type(node).__name__}")
+        if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float)):
+            raise ValueError(f"Only numbers may appear as constants in {expression!r}")
+    return tree, frozenset(names)
+
+
+def _resolve(name, data, channels):
+    column = channels.get(name, name)
+    if column not in data:
+        raise KeyError(f"No column for '{name}'")
+    return np.asarray(data[column], dtype=float)
+
+
+def evaluate(expression, data, min_denominator=0.0, channels=None):
+    """Evaluate ``expression`` over the columns of ``data`` (a DataFrame or dict of arrays).
+
+    Channel names are matched to columns with :func:`find_channels` unless
+    ``channels`` gives the mapping. Returns a float array.
+    """
+    tree, _ = parse(expression)
+    channels = find_channels(list(data.keys())) if channels is None else channels
+
+    def run(node):
+        if isinstance(node, ast.Expression):
+            return run(node.body)
+        if isinstance(node, ast.Constant):
+            return float(node.value)
+        if isinstance(node, ast.Name):
+            return _resolve(node.id, data, channels)
+        if isinstance(node, ast.UnaryOp):
+            value = run(node.operand)
+            return np.negative(value) if isinstance(node.op, ast.USub) else value
+        left, right = run(node.left), run(node.right)
+        if isinstance(node.op, ast.Div):
+            return safe_divide(left, right, min_denominator)
+        with np.errstate(invalid="ignore", over="ignore"):
+            return _BINARY[type(node.op)](left, right)
+
+    return np.asarray(run(tree), dtype=float)
+
+
+def available(columns, expressions=STANDARD):
+    """The ``label -> expression`` entries whose inputs all exist in ``columns``."""
+    channels = find_channels(columns)
+    return {label: expression for label, expression in expressions.items()
+            if all(name in channels or name in columns for name in parse(expression)[1])}
+
+
+def derive(data, expressions, min_denominator=0.0):
+    """Evaluate ``{label: expression}`` into a dict of new columns."""
+    channels = find_channels(list(data.keys()))
+    return {label: evaluate(expression, data, min_denominator, channels) for label, expression in expressions.items()}
+
+
+def ternary_rgb(k, th, u, clip=(2.0, 98.0)):
+    """Red/green/blue image from K, eTh and eU scaled to their ``clip`` percentiles.
+
+    Inputs may be grids or point arrays of the same shape; the result has
+    a trailing axis of three values in [0, 1] and NaN where any input is NaN.
+    """
+    bands = []
+    for band in (k, th, u):
+        band = np.asarray(band, dtype=float)
+        low, high = np.nanpercentile(band, clip)
+        with np.errstate(invalid="ignore"):
+            bands.append(np.clip((band - low) / (high - low if high > low else 1.0), 0.0, 1.0))
+    return np.stack(bands, axis=-1)
@@ -0,0 +1,151 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .cache import read_excel_cached
+from .core import clean_spectrum
+from .depth import DEPTH_FACTORS, fit_intervals, fit_segments, prefix_sums, segment_fit
+
+
+class SpectrumStack:
+    """Many site spectra held end to end in two float arrays.
+
+    Site ``i`` is ``x[offsets[i]:offsets[i + 1]]`` (and the same slice of
+    ``y``), so per-site reductions run over the whole stack at once
+    instead of looping over frames.
+    """
+
+    def __init__(self, names, x, y, offsets):
+        self.names = list(names)
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+
+    @classmethod
+    def from_spectra(cls, spectra):
+        """Stack ``{name: cleaned two-column frame}`` (as from ``clean_spectrum``)."""
+        names = list(spectra)
+        counts = [len(spectra[name]) for name in names]
+        x = np.concatenate([spectra[name].iloc[:, 0].to_numpy(dtype=float) for name in names] or [np.empty(0)])
+        y = np.concatenate([spectra[name].iloc[:, 1].to_numpy(dtype=float) for name in names] or [np.empty(0)])
+        return cls(names, x, y, np.concatenate([[0], np.cumsum(counts)]))
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def counts(self):
+        return np.diff(self.offsets)
+
+    def site(self, index):
+        """``(x, y)`` views of one site."""
+        start, stop = self.offsets[index], self.offsets[index + 1]
+        return self.x[start:stop], self.y[start:stop]
+
+    def frame(self, max_points=None):
+        """Long-form ``site, x, y`` frame for plotting, every site thinned to ``max_points``."""
+        keep = np.ones(len(self.x), dtype=bool)
+        if max_points:
+            position = np.arange(len(self.x)) - np.repeat(self.offsets[:-1], self.counts)
+            stride = np.repeat(np.maximum(-(-self.counts // max_points), 1), self.counts)
+            keep = position % stride == 0
+        return pd.DataFrame({"site": np.repeat(self.names, self.counts)[keep], "x": self.x[keep], "y": self.y[keep]})
+
+    def fits(self, units="cycles"):
+        """Straight-line fit of every site in one pass over shared prefix sums.
+
+        Returns one row per site with its point count, X range, slope,
+        intercept, r² and the depth the slope implies (``-slope / 4π`` for
+        cycles, ``-slope / 2`` for radians).
+        """
+        sums = prefix_sums(self.x, self.y)
+        start, stop = self.offsets[:-1], self.offsets[1:]
+        slope, intercept, sse, _ = segment_fit(sums, start, stop)
+        n = stop - start
+        with np.errstate(divide="ignore", invalid="ignore"):
+            total = (sums["yy"][stop] - sums["yy"][start]) - (sums["y"][stop] - sums["y"][start]) ** 2 / n
+            r2 = 1.0 - sse / total
+
+        # reduceat over the non-empty sites only; an empty site adds nothing to its neighbour's slice
+        x_min, x_max = np.full(len(self), np.nan), np.full(len(self), np.nan)
+        filled = n > 0
+        if filled.any():
+            x_min[filled] = np.minimum.reduceat(self.x, start[filled])
+            x_max[filled] = np.maximum.reduceat(self.x, start[filled])
+        return pd.DataFrame({"site": self.names, "points": n, "x_min": x_min, "x_max": x_max, "slope": slope,
+                             "intercept": intercept, "r2": r2, "depth": -slope / DEPTH_FACTORS[units]})
+
+    def fit_intervals(self, method="bootstrap", n_resamples=2000, confidence=0.95, units="cycles", seed=0):
+        """Confidence intervals of every site's straight-line slope, intercept and depth.
+
+        All sites are resampled together (see :func:`~spectral.depth.fit_intervals`);
+        returns one row per site.
+        """
+        intervals = fit_intervals(self.x, self.y, self.offsets, method, n_resamples, confidence, units, seed)
+        intervals.insert(0, "site", self.names)
+        return intervals
+
+    def segment_depths(self, n_segments=3, min_points=3, units="cycles"):
+        """Depth of every spectral segment of every site, one column per segment.
+
+        Sites too short for ``n_segments`` segments get NaN depths.
+        """
+        rows = []
+        for index, name in enumerate(self.names):
+            try:
+                fit = fit_segments(*self.site(index), n_segments, min_points, units)
+                rows.append({"site": name, **dict(zip(fit["segment"] + " depth", fit["depth"]))})
+            except ValueError:
+                rows.append({"site": name})
+        return pd.DataFrame(rows)
+
+
+def load_spectra(sources, names=None, x_column=0, y_column=1, workers=None):
+    """Read and clean many spectrum workbooks concurrently into one ``SpectrumStack``.
+
+    ``sources`` are paths or uploaded files; parsing goes through the
+    workbook cache, so sites read before come back memory-mapped. Names
+    default to the file names without extension.
+    """
+    sources = list(sources)
+    names = list(names) if names is not None else None
+    if names is None:
+        names = [os.path.splitext(os.path.basename(getattr(source, "name", str(source))))[0] for source in sources]
+    # Repeated names (two uploads of lau.xlsx) become "lau", "lau (2)", ...
+    seen = {}
+    for i, name in enumerate(names):
+        seen[name] = seen.get(name, 0) + 1
+        if seen[name] > 1:
+            names[i] = f"{name} ({seen[name]})"
+
+    def load(source):
+        return clean_spectrum(read_excel_cached(source), x_column, y_column)
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        frames = list(pool.map(load, sources))
+    return SpectrumStack.from_spectra(dict(zip(names, frames)))
+
+
+def overlay_chart(stack, fits=None, max_points=2000, x_label="X", y_label="Y"):
+    """Interactive Altair overlay of every site's spectrum and, with ``fits``, its fitted line.
+
+    Clicking a site in the legend highlights it; the chart zooms and pans.
+    """
+    import altair as alt
+
+    highlight = alt.selection_point(fields=["site"], bind="legend")
+    colour = alt.Color("site:N", title="Site")
+    opacity = alt.condition(highlight, alt.value(0.9), alt.value(0.1))
+    points = alt.Chart(stack.frame(max_points)).mark_line(point=alt.OverlayMarkDef(size=12)).encode(
+        x=alt.X("x:Q", title=x_label), y=alt.Y("y:Q", title=y_label), color=colour, opacity=opacity,
+        tooltip=["site", "x", "y"]).add_params(highlight)
+    layers = [points]
+    if fits is not None:
+        ends = pd.DataFrame({"site": np.repeat(fits["site"].to_numpy(), 2),
+                             "x": np.column_stack([fits["x_min"], fits["x_max"]]).ravel()})
+        ends["y"] = np.repeat(fits["intercept"].to_numpy(), 2) + np.repeat(fits["slope"].to_numpy(), 2) * ends["x"]
+        layers.append(alt.Chart(ends).mark_line(strokeDash=[6, 3], strokeWidth=2).encode(
+            x="x:Q", y="y:Q", color=colour, opacity=opacity))
+    return alt.layer(*layers).interactive()
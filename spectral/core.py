@@ -0,0 +1,110 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from .cache import read_excel_cached
+
+# Site workbooks shipped with the repo and the titles used on their plots
+SITES = {
+    "dong": ("dong.xlsx", "Dong"),
+    "guyok": ("guyok.xlsx", "Guyok"),
+    "kaltungo": ("kaltungo.xlsx", "Kaltungo"),
+    "lau": ("lau.xlsx", "Lau"),
+}
+
+X_LABEL = "X (CYC/K_unit) - 2D RADIALLY"
+Y_LABEL = "Y (Ln_P) - SPECTRUM"
+
+
+def clean_spectrum(df, x_column=0, y_column=1):
+    """Return the rows of ``df`` where both spectrum columns are numeric.
+
+    Columns may be given by position or by name. Each column is converted
+    once with ``pd.to_numeric(errors='coerce')`` and the result holds the
+    two float columns under their original names.
+    """
+    x_name = df.columns[x_column] if isinstance(x_column, int) else x_column
+    y_name = df.columns[y_column] if isinstance(y_column, int) else y_column
+
+    x = pd.to_numeric(df[x_name], errors='coerce').to_numpy(dtype=float)
+    y = pd.to_numeric(df[y_name], errors='coerce').to_numpy(dtype=float)
+    valid = ~(np.isnan(x) | np.isnan(y))
+
+    return pd.DataFrame({x_name: x[valid], y_name: y[valid]}, index=df.index[valid])
+
+
+def load_spectrum(path, sheet_name=0, x_column=0, y_column=1):
+    """Read a spectrum workbook and return its cleaned X/Y columns."""
+    df = read_excel_cached(path, sheet_name=sheet_name)
+    return clean_spectrum(df, x_column, y_column)
+
+
+def site_source(name, data_dir="."):
+    """Resolve a site name or workbook path to ``(path, title)``."""
+    key = name.lower()
+    if key in SITES:
+        filename, title = SITES[key]
+        return os.path.join(data_dir, filename), title
+
+    if os.path.splitext(name)[1]:
+        path = name
+    else:
+        path = os.path.join(data_dir, f"{name}.xlsx")
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return path, stem.replace("_", " ").title()
+
+
+def fft_spectrum(y, sampling_interval=1.0):
+    """One-sided FFT magnitude of ``y`` as plotted in the upgrade app.
+
+    Returns ``(frequency, magnitude)`` with ``magnitude = 2/N |FFT(y)|``
+    over the first ``N // 2`` bins.
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    # rfft holds the same non-negative bins as fft at half the cost
+    yf = np.fft.rfft(y)[:n // 2]
+    xf = np.fft.rfftfreq(n, sampling_interval)[:n // 2]
+    return xf, 2.0 / n * np.abs(yf)
+
+
+def plot_spectrum(data, title, ax=None, color='blue'):
+    """Draw a cleaned spectrum the way the site scripts do.
+
+    Without ``ax`` a standalone Agg-backed figure is created, so nothing
+    touches pyplot or needs a display. The figure is returned.
+    """
+    if ax is None:
+        from matplotlib.figure import Figure
+
+        fig = Figure(figsize=(8, 5))
+        ax = fig.add_subplot()
+    else:
+        fig = ax.figure
+
+    ax.plot(data.iloc[:, 0], data.iloc[:, 1], marker='o', linestyle='-', color=color)
+    ax.set_title(title)
+    ax.set_xlabel(X_LABEL)
+    ax.set_ylabel(Y_LABEL)
+    ax.grid(True)
+    fig.tight_layout()
+    return fig
+
+
+def process_site(name, data_dir=".", out_dir="figures", dpi=100):
+    """Load, clean and plot one site, writing ``<out_dir>/<site>.png``.
+
+    Returns a summary dict with the site title, figure path and the
+    number of points that survived cleaning.
+    """
+    path, title = site_source(name, data_dir)
+    data = load_spectrum(path)
+
+    os.makedirs(out_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    figure_path = os.path.join(out_dir, f"{stem}.png")
+    fig = plot_spectrum(data, f"{title} 2D Radial Spectrum")
+    fig.savefig(figure_path, dpi=dpi)
+
+    return {"site": title, "source": path, "figure": figure_path, "points": len(data)}
@@ -0,0 +1,303 @@
+import numpy as np
+import pandas as pd
+
+# Segment names from the lowest to the highest wavenumber
+SEGMENT_NAMES = {
+    1: ["deep"],
+    2: ["deep", "shallow"],
+    3: ["deep", "shallow", "noise"],
+}
+
+# ln(P) = c - 4*pi*h*k for k in cycles/unit, or c - 2*h*k for k in radians/unit
+DEPTH_FACTORS = {"cycles": 4 * np.pi, "radians": 2.0}
+
+
+def prefix_sums(x, y):
+    """Cumulative sums that give least-squares fits of any x[i:j] in O(1)."""
+    zero = np.zeros(1)
+    return {
+        "n": np.arange(len(x) + 1, dtype=float),
+        "x": np.concatenate([zero, np.cumsum(x)]),
+        "y": np.concatenate([zero, np.cumsum(y)]),
+        "xx": np.concatenate([zero, np.cumsum(x * x)]),
+        "xy": np.concatenate([zero, np.cumsum(x * y)]),
+        "yy": np.concatenate([zero, np.cumsum(y * y)]),
+    }
+
+
+def segment_fit(sums, start, stop):
+    """Slope, intercept, residual sum of squares and centred Sxx of ``[start, stop)``.
+
+    ``start`` and ``stop`` may be arrays, so any number of candidate
+    segments are scored in one vectorised pass.
+    """
+    n = sums["n"][stop] - sums["n"][start]
+    sx = sums["x"][stop] - sums["x"][start]
+    sy = sums["y"][stop] - sums["y"][start]
+    sxx = sums["xx"][stop] - sums["xx"][start]
+    sxy = sums["xy"][stop] - sums["xy"][start]
+    syy = sums["yy"][stop] - sums["yy"][start]
+    return fit_sums(n, sx, sy, sxx, sxy, syy)
+
+
+def fit_sums(n, sx, sy, sxx, sxy, syy):
+    """Least-squares line from the sums of 1, x, y, x², xy and y² (arrays of any shape).
+
+    Returns ``(slope, intercept, sse, cxx)``; degenerate sums give NaN.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cxx = sxx - sx * sx / n
+        cxy = sxy - sx * sy / n
+        cyy = syy - sy * sy / n
+        slope = cxy / cxx
+        intercept = (sy - slope * sx) / n
+        sse = np.maximum(cyy - slope * cxy, 0.0)
+    return slope, intercept, sse, cxx
+
+
+def _segment_costs(sums, start, stop, min_points):
+    """Residual sum of squares of every ``[start, stop)`` pair; inf for segments under ``min_points``."""
+    cost = segment_fit(sums, start, stop)[2]
+    cost[((stop - start) < min_points) | np.isnan(cost)] = np.inf
+    return cost
+
+
+def find_breakpoints(x, y, n_segments=3, min_points=3, max_cells=2**20):
+    """Indices splitting ``x``/``y`` into the least-squares optimal segments.
+
+    Every ``[i, j)`` segment cost comes from the prefix sums; dynamic
+    programming then picks the split with the smallest total residual.
+    Costs are scored one block of segment ends at a time (about
+    ``max_cells`` candidate segments per block), so memory stays O(n)
+    while each block is one vectorised pass. Time is O(n² · n_segments).
+    Returns the segment boundaries ``[0, b1, ..., n]``.
+    """
+    n = len(x)
+    if n < n_segments * min_points:
+        raise ValueError(f"Need at least {n_segments * min_points} points for {n_segments} segments")
+
+    sums = prefix_sums(x, y)
+    stops = np.arange(n + 1)
+    block = max(max_cells // (n + 1), 1)
+
+    # best[k, j]: smallest residual for splitting x[:j] into k + 1 segments; choice[k - 1, j]: where the last starts
+    best = np.empty((n_segments, n + 1))
+    choice = np.zeros((n_segments - 1, n + 1), dtype=np.intp)
+    for first in range(0, n + 1, block):
+        stop = stops[first:first + block]
+        # Only segments that start before their end can be finite, and earlier ends are already solved
+        cost = _segment_costs(sums, stops[:stop[-1] + 1, None], stop[None, :], min_points)
+        best[0, stop] = cost[0]
+        for k in range(1, n_segments):
+            candidates = best[k - 1, :stop[-1] + 1, None] + cost
+            choice[k - 1, stop] = np.argmin(candidates, axis=0)
+            best[k, stop] = candidates[choice[k - 1, stop], np.arange(len(stop))]
+
+    bounds = [n]
+    for split in reversed(choice):
+        bounds.append(int(split[bounds[-1]]))
+    bounds.append(0)
+    return bounds[::-1]
+
+
+def fit_segments(x, y, n_segments=3, min_points=3, units="cycles"):
+    """Fit ``n_segments`` straight lines to a ln(P) spectrum and convert slopes to depths.
+
+    Depth is ``-slope / 4π`` for wavenumbers in cycles per unit (the site
+    workbooks) or ``-slope / 2`` for radians per unit, in the horizontal
+    unit's reciprocal (km for cycles/km). Returns one row per segment with
+    its x range, slope, intercept, standard errors and depth.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    order = np.argsort(x, kind="stable")
+    x, y = x[order], y[order]
+
+    bounds = find_breakpoints(x, y, n_segments, min_points)
+    sums = prefix_sums(x, y)
+    start, stop = np.array(bounds[:-1]), np.array(bounds[1:])
+    slope, intercept, sse, cxx = segment_fit(sums, start, stop)
+
+    points = stop - start
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope_stderr = np.sqrt(sse / np.maximum(points - 2, 1) / cxx)
+        r2 = 1.0 - sse / (sums["yy"][stop] - sums["yy"][start]
+                          - (sums["y"][stop] - sums["y"][start]) ** 2 / points)
+
+    factor = DEPTH_FACTORS[units]
+    names = SEGMENT_NAMES.get(n_segments, [f"segment {i + 1}" for i in range(n_segments)])
+    return pd.DataFrame({
+        "segment": names,
+        "x_start": x[start],
+        "x_end": x[stop - 1],
+        "points": points,
+        "slope": slope,
+        "intercept": intercept,
+        "slope_stderr": slope_stderr,
+        "r2": r2,
+        "depth": -slope / factor,
+        "depth_stderr": slope_stderr / factor,
+    })
+
+
+def _group_sums(features, counts=None):
+    """``(n, sx, sy, sxx, sxy, syy)`` from per-point ``[1, x, y, x², xy, y²]`` rows, weighted by ``counts``."""
+    sums = features.sum(axis=0) if counts is None else counts @ features
+    return tuple(np.moveaxis(sums, -1, 0))
+
+
+def resample_fits(x, y, offsets=None, method="bootstrap", n_resamples=2000, seed=0, max_cells=2**22):
+    """Slopes and intercepts of every group of points refitted on resampled data.
+
+    Group ``i`` is ``x[offsets[i]:offsets[i + 1]]`` (one group by
+    default). No model is refitted: each resample's line comes from its
+    six sums through :func:`fit_sums`. A block of bootstrap draws is a
+    matrix of how often each point was drawn times the group's
+    ``[1, x, y, x², xy, y²]`` columns, so thousands of resamples cost one
+    matrix product (``max_cells`` bounds the count matrix); the jackknife
+    takes every leave-one-out fit of every group at once from the group
+    totals minus each point. Points are centred on their group means
+    first, for accurate sums.
+
+    Returns ``(group, slope, intercept)``: one entry per resample, with
+    ``group`` naming the group it belongs to.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    offsets = np.asarray([0, len(x)] if offsets is None else offsets, dtype=np.int64)
+    counts = np.diff(offsets)
+    group_of = np.repeat(np.arange(len(counts)), counts)
+    with np.errstate(invalid="ignore"):
+        x_mean = np.bincount(group_of, x, minlength=len(counts)) / counts
+        y_mean = np.bincount(group_of, y, minlength=len(counts)) / counts
+    xc, yc = x - x_mean[group_of], y - y_mean[group_of]
+    features = np.column_stack([np.ones_like(xc), xc, yc, xc * xc, xc * yc, yc * yc])
+
+    if method == "jackknife":
+        totals = np.column_stack([np.bincount(group_of, column, minlength=len(counts)) for column in features.T])
+        slope, intercept, _, _ = fit_sums(*np.moveaxis(totals[group_of] - features, -1, 0))
+        group = group_of
+    elif method == "bootstrap":
+        rng = np.random.default_rng(seed)
+        slope = np.full((len(counts), n_resamples), np.nan)
+        intercept = np.full((len(counts), n_resamples), np.nan)
+        for i, (start, n) in enumerate(zip(offsets[:-1], counts)):
+            if n < 2:
+                continue
+            block = max(min(max_cells // n, n_resamples), 1)
+            for first in range(0, n_resamples, block):
+                size = min(block, n_resamples - first)
+                draws = rng.integers(0, n, (size, n)) + n * np.arange(size)[:, None]
+                drawn = np.bincount(draws.ravel(), minlength=size * n).reshape(size, n).astype(float)
+                fit = fit_sums(*_group_sums(features[start:start + n], drawn))
+                slope[i, first:first + size], intercept[i, first:first + size] = fit[0], fit[1]
+        group = np.repeat(np.arange(len(counts)), n_resamples)
+        slope, intercept = slope.ravel(), intercept.ravel()
+    else:
+        raise ValueError(f"Unknown resampling method '{method}', expected 'bootstrap' or 'jackknife'")
+
+    # Back from centred coordinates: y - ȳ = b (x - x̄) + a
+    return group, slope, intercept + y_mean[group] - slope * x_mean[group]
+
+
+def fit_intervals(x, y, offsets=None, method="bootstrap", n_resamples=2000, confidence=0.95, units="cycles",
+                  seed=0):
+    """Confidence intervals of the slope, intercept and depth of every group of points.
+
+    Groups are as in :func:`resample_fits`. Bootstrap intervals are the
+    percentiles of the resampled fits; jackknife intervals are the
+    estimate ± Student's t times the jackknife standard error. The depth
+    interval follows from the slope's (``depth = -slope / factor``).
+    Returns one row per group with the full-data estimates, their
+    ``_low``/``_high`` bounds and the standard errors.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    offsets = np.asarray([0, len(x)] if offsets is None else offsets, dtype=np.int64)
+    points = np.diff(offsets)
+    sums = prefix_sums(x, y)
+    slope, intercept, _, _ = segment_fit(sums, offsets[:-1], offsets[1:])
+    group, slope_r, intercept_r = resample_fits(x, y, offsets, method, n_resamples, seed)
+
+    tail = 100 * (1 - confidence) / 2
+    with np.errstate(invalid="ignore", divide="ignore"):
+        if method == "bootstrap":
+            slope_r = slope_r.reshape(len(points), -1)
+            intercept_r = intercept_r.reshape(len(points), -1)
+            valid = np.isfinite(slope_r).any(axis=1)
+            slope_low, slope_high = np.full((2, len(points)), np.nan)
+            intercept_low, intercept_high = np.full((2, len(points)), np.nan)
+            slope_se, intercept_se = np.full((2, len(points)), np.nan)
+            if valid.any():
+                slope_low[valid], slope_high[valid] = np.nanpercentile(slope_r[valid], [tail, 100 - tail], axis=1)
+                intercept_low[valid], intercept_high[valid] = np.nanpercentile(intercept_r[valid],
+                                                                               [tail, 100 - tail], axis=1)
+                slope_se[valid] = np.nanstd(slope_r[valid], axis=1, ddof=1)
+                intercept_se[valid] = np.nanstd(intercept_r[valid], axis=1, ddof=1)
+        else:
+            from scipy.stats import t as student_t
+
+            def jackknife_se(values):
+                mean = np.bincount(group, values, minlength=len(points)) / points
+                spread = np.bincount(group, (values - mean[group]) ** 2, minlength=len(points))
+                return np.sqrt((points - 1) / points * spread)
+
+            slope_se, intercept_se = jackknife_se(slope_r), jackknife_se(intercept_r)
+            half = student_t.ppf(1 - tail / 100, np.maximum(points - 1, 1))
+            slope_low, slope_high = slope - half * slope_se, slope + half * slope_se
+            intercept_low, intercept_high = intercept - half * intercept_se, intercept + half * intercept_se
+
+    factor = DEPTH_FACTORS[units]
+    return pd.DataFrame({
+        "points": points,
+        "slope": slope,
+        "slope_low": slope_low,
+        "slope_high": slope_high,
+        "slope_se": slope_se,
+        "intercept": intercept,
+        "intercept_low": intercept_low,
+        "intercept_high": intercept_high,
+        "intercept_se": intercept_se,
+        "depth": -slope / factor,
+        "depth_low": -slope_high / factor,
+        "depth_high": -slope_low / factor,
+    })
+
+
+def segment_intervals(x, y, segments, units="cycles", **options):
+    """Confidence interval columns for the segments of a :func:`fit_segments` table.
+
+    The breakpoints stay where the full-data fit put them; only the points
+    within each segment are resampled. ``options`` go to :func:`fit_intervals`.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    order = np.argsort(x, kind="stable")
+    offsets = np.concatenate([[0], np.cumsum(segments["points"].to_numpy())])
+    intervals = fit_intervals(x[order], y[order], offsets, units=units, **options)
+    columns = [c for c in intervals.columns if c.endswith(("_low", "_high"))]
+    return segments.assign(**{c: intervals[c].to_numpy() for c in columns})
+
+
+def estimate_depths(spectra, n_segments=3, min_points=3, units="cycles", intervals=None, **options):
+    """Segment fits for many spectra at once.
+
+    ``spectra`` maps a site name to a cleaned two-column frame (as
+    returned by ``load_spectrum``). Returns all segments stacked with a
+    leading ``site`` column; sites that cannot be fitted are skipped.
+    With ``intervals`` (``"bootstrap"`` or ``"jackknife"``) every segment
+    also gets confidence bounds; ``options`` go to :func:`fit_intervals`.
+    """
+    frames = []
+    for site, data in spectra.items():
+        try:
+            fit = fit_segments(data.iloc[:, 0], data.iloc[:, 1], n_segments, min_points, units)
+        except ValueError:
+            continue
+        if intervals:
+            fit = segment_intervals(data.iloc[:, 0], data.iloc[:, 1], fit, units, method=intervals, **options)
+        fit.insert(0, "site", site)
+        frames.append(fit)
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,267 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+METHODS = ["idw", "linear", "cubic", "nearest", "minimum_curvature", "mean"]
+
+# Labels shown by the grid viewers
+METHOD_LABELS = {
+    "IDW (KD-tree)": "idw",
+    "Linear (griddata)": "linear",
+    "Cubic (griddata)": "cubic",
+    "Nearest": "nearest",
+    "Minimum Curvature": "minimum_curvature",
+    "Cell Mean (bincount)": "mean",
+}
+
+
+def estimate_cell_size(x, y, sample=100_000, seed=0):
+    """Median nearest-neighbour spacing of the points, a sensible default cell size."""
+    points = np.column_stack([x, y])
+    if len(points) > sample:
+        points = points[np.random.default_rng(seed).choice(len(points), sample, replace=False)]
+    distance = cKDTree(points).query(points, k=2)[0][:, 1]
+    distance = distance[distance > 0]
+    return float(np.median(distance)) if len(distance) else 1.0
+
+
+def grid_axes(x, y, cell_size, bounds=None):
+    """Cell-centre axes covering ``bounds`` (default: the extent of the points)."""
+    x_min, x_max, y_min, y_max = bounds or (np.min(x), np.max(x), np.min(y), np.max(y))
+    nx = int(np.floor((x_max - x_min) / cell_size + 1e-9)) + 1
+    ny = int(np.floor((y_max - y_min) / cell_size + 1e-9)) + 1
+    return x_min + cell_size * np.arange(nx), y_min + cell_size * np.arange(ny)
+
+
+def _tiles(nx, ny, tile_size):
+    for row in range(0, ny, tile_size):
+        for col in range(0, nx, tile_size):
+            yield slice(row, min(row + tile_size, ny)), slice(col, min(col + tile_size, nx))
+
+
+def _idw_tile(tree, z, gx, gy, neighbours, power, max_distance):
+    nodes = np.column_stack([a.ravel() for a in np.meshgrid(gx, gy)])
+    distance, index = tree.query(nodes, k=neighbours, distance_upper_bound=max_distance)
+    distance = distance.reshape(len(nodes), -1)
+    index = index.reshape(len(nodes), -1)
+
+    found = np.isfinite(distance)
+    values = z[np.where(found, index, 0)]
+    with np.errstate(divide="ignore"):
+        weights = np.where(found, 1.0 / np.maximum(distance, 1e-300) ** power, 0.0)
+
+    # Nodes sitting on a sample take its value exactly
+    exact = found & (distance == 0)
+    weights = np.where(exact.any(axis=1, keepdims=True), exact.astype(float), weights)
+    with np.errstate(invalid="ignore"):
+        result = (weights * values).sum(axis=1) / weights.sum(axis=1)
+    return result.reshape(len(gy), len(gx))
+
+
+def _points_near(order_x, x_sorted, x, y, x_range, y_range):
+    lo, hi = np.searchsorted(x_sorted, x_range)
+    candidates = order_x[lo:hi]
+    keep = (y[candidates] >= y_range[0]) & (y[candidates] <= y_range[1])
+    return candidates[keep]
+
+
+def _griddata_tile(points_index, x, y, z, gx, gy, method):
+    from scipy.interpolate import griddata
+
+    gxx, gyy = np.meshgrid(gx, gy)
+    if len(points_index) < 4:
+        return np.full(gxx.shape, np.nan)
+    return griddata((x[points_index], y[points_index]), z[points_index], (gxx, gyy), method=method)
+
+
+def _minimum_curvature_tile(points_index, x, y, z, gx, gy, cell_size, tension):
+    from scipy.sparse import diags, eye, kron
+    from scipy.sparse.linalg import spsolve
+
+    ny, nx = len(gy), len(gx)
+    if len(points_index) == 0:
+        return np.full((ny, nx), np.nan)
+
+    # Average the samples falling on each node
+    col = np.clip(np.rint((x[points_index] - gx[0]) / cell_size).astype(np.intp), 0, nx - 1)
+    row = np.clip(np.rint((y[points_index] - gy[0]) / cell_size).astype(np.intp), 0, ny - 1)
+    node = row * nx + col
+    count = np.bincount(node, minlength=nx * ny)
+    total = np.bincount(node, weights=z[points_index], minlength=nx * ny)
+    has_data = count > 0
+
+    # Minimise |(1 - T) ∇²z|² + T |∇z|² subject to a heavy penalty at data nodes
+    def second_difference(n):
+        return diags([1.0, -2.0, 1.0], [-1, 0, 1], shape=(n, n))
+
+    laplacian = kron(eye(ny), second_difference(nx)) + kron(second_difference(ny), eye(nx))
+    system = (1.0 - tension) * (laplacian.T @ laplacian) - tension * laplacian
+    penalty = 1e6 * has_data
+    system = (system + diags(penalty)).tocsc()
+    rhs = penalty * np.where(has_data, total / np.maximum(count, 1), 0.0)
+    return spsolve(system, rhs).reshape(ny, nx)
+
+
+class GridIndex:
+    """Which samples every grid node is built from, for one set of X/Y positions.
+
+    The KD-tree queries (``"idw"``, ``"nearest"``) or the sample-to-cell
+    assignment (``"mean"``) depend only on the coordinates, so they are
+    done once; :meth:`grid` then turns any value channel sampled at the
+    same positions into a grid with one gather and weighted sum, or one
+    ``np.bincount``. Samples with a NaN value drop out of their nodes'
+    weights, so channels with gaps share the same index.
+    """
+
+    METHODS = ["idw", "nearest", "mean"]
+
+    def __init__(self, x, y, cell_size=None, method="idw", bounds=None, neighbours=8, power=2.0, max_distance=None,
+                 block_size=1 << 16):
+        if method not in self.METHODS:
+            raise ValueError(f"GridIndex supports {self.METHODS}, not '{method}'")
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        self.valid = ~(np.isnan(x) | np.isnan(y))
+        x, y = x[self.valid], y[self.valid]
+        if len(x) == 0:
+            raise ValueError("No valid points to grid")
+
+        self.method = method
+        self.cell_size = cell_size or estimate_cell_size(x, y)
+        self.x_axis, self.y_axis = grid_axes(x, y, self.cell_size, bounds)
+        self.shape = (len(self.y_axis), len(self.x_axis))
+        self.n_points = len(x)
+
+        if method == "mean":
+            col = np.rint((x - self.x_axis[0]) / self.cell_size).astype(np.intp)
+            row = np.rint((y - self.y_axis[0]) / self.cell_size).astype(np.intp)
+            if bounds is None:
+                # The last cell takes the points up to the data's edge
+                col, row = np.minimum(col, self.shape[1] - 1), np.minimum(row, self.shape[0] - 1)
+            inside = (col >= 0) & (col < self.shape[1]) & (row >= 0) & (row < self.shape[0])
+            # Points outside explicit bounds go to a spare bin past the last node
+            self.cell = np.where(inside, row * self.shape[1] + col, self.shape[0] * self.shape[1])
+            return
+
+        k = 1 if method == "nearest" else neighbours
+        max_distance = max_distance or 5 * self.cell_size
+        tree = cKDTree(np.column_stack([x, y]))
+        n_nodes = self.shape[0] * self.shape[1]
+        # int32 indices and float32 weights keep the index at 8 bytes per node and neighbour
+        self.index = np.empty((n_nodes, k), dtype=np.int32)
+        self.weights = np.empty((n_nodes, k), dtype=np.float32)
+        for start in range(0, n_nodes, block_size):
+            node = np.arange(start, min(start + block_size, n_nodes))
+            nodes = np.column_stack([self.x_axis[node % self.shape[1]], self.y_axis[node // self.shape[1]]])
+            distance, index = tree.query(nodes, k=k, distance_upper_bound=max_distance)
+            distance, index = distance.reshape(len(node), k), index.reshape(len(node), k)
+            found = np.isfinite(distance)
+            with np.errstate(divide="ignore"):
+                weights = np.where(found, 1.0 / np.maximum(distance, 1e-300) ** power, 0.0)
+            # Nodes sitting on a sample take its value exactly, as in grid_points
+            exact = found & (distance == 0)
+            weights = np.where(exact.any(axis=1, keepdims=True), exact.astype(float), weights)
+            self.index[node] = np.where(found, index, 0)
+            self.weights[node] = weights
+
+    def grid(self, z, block_size=1 << 16):
+        """Grid the values ``z`` (one per input sample, aligned with ``x``/``y``)."""
+        z = np.asarray(z, dtype=float)[self.valid]
+        if len(z) != self.n_points:
+            raise ValueError(f"Expected {self.n_points} values, got {len(z)}")
+        finite = ~np.isnan(z)
+        n_nodes = self.shape[0] * self.shape[1]
+
+        if self.method == "mean":
+            count = np.bincount(self.cell, weights=finite, minlength=n_nodes + 1)[:n_nodes]
+            total = np.bincount(self.cell, weights=np.where(finite, z, 0.0), minlength=n_nodes + 1)[:n_nodes]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                return np.where(count > 0, total / count, np.nan).reshape(self.shape)
+
+        filled = np.where(finite, z, 0.0)
+        Z = np.empty(n_nodes)
+        for start in range(0, n_nodes, block_size):
+            block = slice(start, start + block_size)
+            index = self.index[block]
+            weights = self.weights[block] * finite[index]
+            with np.errstate(invalid="ignore"):
+                Z[block] = (weights * filled[index]).sum(axis=1) / weights.sum(axis=1)
+        return Z.reshape(self.shape)
+
+
+def grid_points(x, y, z, cell_size=None, method="idw", bounds=None, tile_size=256, workers=None,
+                neighbours=8, power=2.0, max_distance=None, margin=8, tension=0.25):
+    """Interpolate scattered ``(x, y, z)`` samples onto a regular grid.
+
+    ``method`` is ``"idw"`` (KD-tree inverse-distance weighting),
+    ``"linear"``/``"cubic"``/``"nearest"`` (``scipy.interpolate.griddata``),
+    ``"minimum_curvature"`` (a tensioned biharmonic spline solved on
+    the grid) or ``"mean"`` (the average of the samples in each cell,
+    see :class:`GridIndex`). The output is built tile by tile, with ``margin`` extra
+    cells of overlap around each tile for the local methods, so memory
+    stays bounded by the tile size and tiles run on ``workers`` threads.
+
+    Nodes farther than ``max_distance`` (default five cells) from every
+    sample are left as NaN. Returns ``(x_axis, y_axis, Z)`` with ``Z``
+    indexed ``[row (y), column (x)]`` like the pivot-table grids.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown gridding method '{method}', expected one of {METHODS}")
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    z = np.asarray(z, dtype=float)
+    valid = ~(np.isnan(x) | np.isnan(y) | np.isnan(z))
+    x, y, z = x[valid], y[valid], z[valid]
+    if len(x) == 0:
+        raise ValueError("No valid points to grid")
+
+    cell_size = cell_size or estimate_cell_size(x, y)
+    if method == "mean":
+        index = GridIndex(x, y, cell_size, "mean", bounds)
+        return index.x_axis, index.y_axis, index.grid(z)
+
+    max_distance = max_distance or 5 * cell_size
+    gx, gy = grid_axes(x, y, cell_size, bounds)
+    tree = cKDTree(np.column_stack([x, y]))
+    order_x = np.argsort(x, kind="stable")
+    x_sorted = x[order_x]
+    pad = margin * cell_size
+
+    def run(tile):
+        rows, cols = tile
+        tile_x, tile_y = gx[cols], gy[rows]
+        if method == "idw":
+            return _idw_tile(tree, z, tile_x, tile_y, neighbours, power, max_distance)
+
+        # Local methods see the tile plus a margin so the seams match
+        ext_x = np.concatenate([tile_x[0] - cell_size * np.arange(margin, 0, -1), tile_x,
+                                tile_x[-1] + cell_size * np.arange(1, margin + 1)])
+        ext_y = np.concatenate([tile_y[0] - cell_size * np.arange(margin, 0, -1), tile_y,
+                                tile_y[-1] + cell_size * np.arange(1, margin + 1)])
+        nearby = _points_near(order_x, x_sorted, x, y, (ext_x[0] - pad, ext_x[-1] + pad),
+                              (ext_y[0] - pad, ext_y[-1] + pad))
+        if method == "minimum_curvature":
+            nearby = nearby[(x[nearby] >= ext_x[0] - cell_size / 2) & (x[nearby] <= ext_x[-1] + cell_size / 2)
+                            & (y[nearby] >= ext_y[0] - cell_size / 2) & (y[nearby] <= ext_y[-1] + cell_size / 2)]
+            values = _minimum_curvature_tile(nearby, x, y, z, ext_x, ext_y, cell_size, tension)
+        else:
+            values = _griddata_tile(nearby, x, y, z, ext_x, ext_y, method)
+        return values[margin:margin + len(tile_y), margin:margin + len(tile_x)]
+
+    Z = np.empty((len(gy), len(gx)))
+    tiles = list(_tiles(len(gx), len(gy), tile_size))
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        for tile, values in zip(tiles, pool.map(run, tiles)):
+            Z[tile] = values
+
+    # Blank nodes that are too far from any sample to be trusted
+    if method != "idw":
+        for rows, cols in tiles:
+            nodes = np.column_stack([a.ravel() for a in np.meshgrid(gx[cols], gy[rows])])
+            distance = tree.query(nodes, k=1, distance_upper_bound=max_distance)[0]
+            Z[rows, cols][np.isinf(distance).reshape(Z[rows, cols].shape)] = np.nan
+
+    return gx, gy, Z
@@ -0,0 +1,401 @@
+import hashlib
+import io
+import json
+import os
+import shutil
+import struct
+import tempfile
+
+import numpy as np
+
+from . import cache
+
+# Native grid file: magic, header length, JSON header padded so the float32
+# body starts on a 64-byte boundary, then rows from south to north.
+MAGIC = b"SPGRID\x01\n"
+_ALIGN = 64
+_BODY = "<f4"
+
+# Surfer marks blank nodes with this value in every format version
+SURFER_BLANK = 1.70141e38
+ESRI_NODATA = -9999.0
+
+GRID_FORMATS = {".sgrd": "native", ".grd": "surfer", ".asc": "esri"}
+# Surfer 6 binary headers hold the node counts as signed 16-bit integers
+_DSBB_MAX_NODES = 32767
+
+
+class Grid:
+    """A regular grid described by its origin, cell size and values.
+
+    ``values[row, col]`` is the node at ``(x0 + col * dx, y0 + row * dy)``,
+    the same layout ``grid_points`` returns. Coordinates are never
+    materialised beyond the two 1D axes, and ``values`` may be a
+    ``np.memmap``: slicing a grid only slices the map, so reading a window
+    of a large file touches just the rows it needs.
+    """
+
+    def __init__(self, values, x0, y0, dx, dy=None, crs="", name=""):
+        self.values = values
+        self.x0 = float(x0)
+        self.y0 = float(y0)
+        self.dx = float(dx)
+        self.dy = float(dx if dy is None else dy)
+        self.crs = crs or ""
+        self.name = name or ""
+
+    @classmethod
+    def from_axes(cls, x_axis, y_axis, values, crs="", name=""):
+        """Grid from cell-centre axes such as those returned by ``grid_points``."""
+        x_axis, y_axis = np.asarray(x_axis, dtype=float), np.asarray(y_axis, dtype=float)
+        dx = x_axis[1] - x_axis[0] if len(x_axis) > 1 else 1.0
+        dy = y_axis[1] - y_axis[0] if len(y_axis) > 1 else dx
+        if not (np.allclose(np.diff(x_axis), dx) and np.allclose(np.diff(y_axis), dy)):
+            raise ValueError("Grid axes must be evenly spaced")
+        return cls(values, x_axis[0], y_axis[0], dx, dy, crs, name)
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    @property
+    def x_axis(self):
+        return self.x0 + self.dx * np.arange(self.shape[1])
+
+    @property
+    def y_axis(self):
+        return self.y0 + self.dy * np.arange(self.shape[0])
+
+    @property
+    def bounds(self):
+        """``(x_min, x_max, y_min, y_max)`` of the node centres."""
+        return (self.x0, self.x0 + self.dx * (self.shape[1] - 1), self.y0, self.y0 + self.dy * (self.shape[0] - 1))
+
+    @property
+    def extent(self):
+        """``[left, right, bottom, top]`` cell edges, half a cell beyond the outer nodes, for ``imshow``."""
+        x_min, x_max, y_min, y_max = self.bounds
+        return [x_min - self.dx / 2, x_max + self.dx / 2, y_min - self.dy / 2, y_max + self.dy / 2]
+
+    def header(self):
+        return {"nx": self.shape[1], "ny": self.shape[0], "x0": self.x0, "y0": self.y0,
+                "dx": self.dx, "dy": self.dy, "crs": self.crs, "name": self.name}
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self.values, dtype=dtype)
+
+    def __getitem__(self, key):
+        rows, cols = key if isinstance(key, tuple) else (key, slice(None))
+        if not (isinstance(rows, slice) and isinstance(cols, slice)):
+            raise TypeError("Grids are sliced with row and column slices; use .values for single nodes")
+        row0, _, row_step = rows.indices(self.shape[0])
+        col0, _, col_step = cols.indices(self.shape[1])
+        return Grid(self.values[rows, cols], self.x0 + col0 * self.dx, self.y0 + row0 * self.dy,
+                    self.dx * col_step, self.dy * row_step, self.crs, self.name)
+
+    def window(self, x_range=None, y_range=None):
+        """The sub-grid whose nodes fall inside ``x_range``/``y_range``."""
+        x_range = x_range or self.bounds[:2]
+        y_range = y_range or self.bounds[2:]
+        col0 = max(int(np.ceil((x_range[0] - self.x0) / self.dx - 1e-9)), 0)
+        col1 = int(np.floor((x_range[1] - self.x0) / self.dx + 1e-9)) + 1
+        row0 = max(int(np.ceil((y_range[0] - self.y0) / self.dy - 1e-9)), 0)
+        row1 = int(np.floor((y_range[1] - self.y0) / self.dy + 1e-9)) + 1
+        return self[row0:max(row1, row0 + 1), col0:max(col1, col0 + 1)]
+
+    def to_arrays(self):
+        """``(x_axis, y_axis, values)`` as returned by ``grid_points``."""
+        return self.x_axis, self.y_axis, self.values
+
+
+def detect_grid_format(path):
+    """``"native"``, ``"surfer"`` or ``"esri"`` from the file name, or None."""
+    name = getattr(path, "name", path)
+    return GRID_FORMATS.get(os.path.splitext(str(name))[1].lower())
+
+
+def _read_bytes(source):
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            return f.read()
+    if hasattr(source, "getvalue"):
+        return source.getvalue()
+    return source.read()
+
+
+class _Output:
+    """Opens a path for binary writing, or passes an open binary file through."""
+
+    def __init__(self, target):
+        self.target = target
+        self.owned = isinstance(target, (str, os.PathLike))
+
+    def __enter__(self):
+        self.file = open(self.target, "wb") if self.owned else self.target
+        return self.file
+
+    def __exit__(self, *exc):
+        if self.owned:
+            self.file.close()
+
+
+def _row_blocks(values, chunk_rows):
+    for start in range(0, values.shape[0], chunk_rows):
+        yield np.asarray(values[start:start + chunk_rows], dtype=float)
+
+
+def _file_header(header):
+    header = json.dumps(header).encode()
+    offset = len(MAGIC) + 4 + len(header)
+    header += b" " * (-offset % _ALIGN)
+    return MAGIC + struct.pack("<I", len(header)) + header
+
+
+def save_grid(target, grid, chunk_rows=4096):
+    """Write ``grid`` in the native format, ``chunk_rows`` rows at a time."""
+    with _Output(target) as f:
+        f.write(_file_header(grid.header()))
+        for block in _row_blocks(grid.values, chunk_rows):
+            f.write(block.astype(_BODY).tobytes())
+
+
+def create_grid(path, like, name=None):
+    """New native grid file on the nodes of ``like``, memory-mapped for writing.
+
+    The values start as zeros and are filled in place, so a grid
+    larger than memory can be written block by block.
+    """
+    header = {**like.header(), "name": like.name if name is None else name}
+    prefix = _file_header(header)
+    with open(path, "wb") as f:
+        f.write(prefix)
+        f.truncate(len(prefix) + header["nx"] * header["ny"] * np.dtype(_BODY).itemsize)
+    return open_grid(path, mode="r+")
+
+
+def _read_header(f):
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError("Not a spectral grid file")
+    (length,) = struct.unpack("<I", f.read(4))
+    return json.loads(f.read(length)), len(MAGIC) + 4 + length
+
+
+def _from_header(values, header):
+    return Grid(values, header["x0"], header["y0"], header["dx"], header["dy"], header["crs"], header["name"])
+
+
+def open_grid(path, mode="r"):
+    """Memory-map a native grid file; nothing but the header is read up front.
+
+    ``mode`` is passed to ``np.memmap``: ``"r"`` for read-only, ``"r+"``
+    to edit values in place, ``"c"`` for private copy-on-write.
+    """
+    with open(path, "rb") as f:
+        header, offset = _read_header(f)
+    values = np.memmap(path, dtype=_BODY, mode=mode, offset=offset, shape=(header["ny"], header["nx"]))
+    return _from_header(values, header)
+
+
+def read_native(source):
+    """Native grid from an upload or other in-memory file (read-only values)."""
+    data = _read_bytes(source)
+    header, offset = _read_header(io.BytesIO(data))
+    values = np.frombuffer(data, _BODY, header["nx"] * header["ny"], offset).reshape(header["ny"], header["nx"])
+    return _from_header(values, header)
+
+
+def read_surfer(source, crs="", name=""):
+    """Read a Surfer 6 ASCII (DSAA), Surfer 6 binary (DSBB) or Surfer 7 (DSRB) grid."""
+    data = _read_bytes(source)
+    tag = data[:4]
+    if tag == b"DSAA":
+        tokens = data.split()
+        nx, ny = int(tokens[1]), int(tokens[2])
+        x_lo, x_hi, y_lo, y_hi = (float(t) for t in tokens[3:7])
+        values = np.array(tokens[9:9 + nx * ny], dtype=float).reshape(ny, nx)
+    elif tag == b"DSBB":
+        nx, ny = struct.unpack("<hh", data[4:8])
+        x_lo, x_hi, y_lo, y_hi = struct.unpack("<4d", data[8:40])
+        values = np.frombuffer(data, "<f4", nx * ny, 56).reshape(ny, nx).astype(float)
+    elif tag == b"DSRB":
+        # Tagged sections: header, GRID (geometry), DATA (float64 rows)
+        position = 0
+        while position < len(data):
+            section, size = struct.unpack("<4si", data[position:position + 8])
+            body = position + 8
+            if section == b"GRID":
+                ny, nx = struct.unpack("<ii", data[body:body + 8])
+                x_lo, y_lo, dx, dy = struct.unpack("<4d", data[body + 8:body + 40])
+                x_hi, y_hi = x_lo + dx * (nx - 1), y_lo + dy * (ny - 1)
+            elif section == b"DATA":
+                values = np.frombuffer(data, "<f8", nx * ny, body).reshape(ny, nx).copy()
+                break
+            position = body + size
+    else:
+        raise ValueError("Not a Surfer grid (expected a DSAA, DSBB or DSRB header)")
+
+    values[values >= SURFER_BLANK * 0.999] = np.nan
+    dx = (x_hi - x_lo) / (nx - 1) if nx > 1 else 1.0
+    dy = (y_hi - y_lo) / (ny - 1) if ny > 1 else dx
+    return Grid(values, x_lo, y_lo, dx, dy, crs, name)
+
+
+def write_surfer(target, grid, binary=False, chunk_rows=4096):
+    """Write a Surfer 6 grid, ASCII (DSAA) by default or binary (DSBB).
+
+    DSBB stores the node counts as 16-bit integers, so binary grids wider
+    or taller than 32767 nodes are written as Surfer 7 (DSRB) instead,
+    which every Surfer version since 7 reads from the same ``.grd`` name.
+    """
+    ny, nx = grid.shape
+    if binary and max(nx, ny) > _DSBB_MAX_NODES:
+        return _write_surfer7(target, grid, chunk_rows)
+    x_min, x_max, y_min, y_max = grid.bounds
+    z_min, z_max = np.nanmin(grid.values), np.nanmax(grid.values)
+    with _Output(target) as f:
+        if binary:
+            f.write(b"DSBB" + struct.pack("<hh6d", nx, ny, x_min, x_max, y_min, y_max, z_min, z_max))
+        else:
+            f.write(f"DSAA\n{nx} {ny}\n{x_min!r} {x_max!r}\n{y_min!r} {y_max!r}\n{z_min!r} {z_max!r}\n".encode())
+        for block in _row_blocks(grid.values, chunk_rows):
+            block = np.where(np.isnan(block), SURFER_BLANK, block)
+            if binary:
+                f.write(block.astype("<f4").tobytes())
+            else:
+                np.savetxt(f, block, fmt="%.7g")
+
+
+def _write_surfer7(target, grid, chunk_rows=4096):
+    # Tagged sections: header (version 2), GRID (int32 node counts, geometry, blank value), DATA (float64 rows)
+    ny, nx = grid.shape
+    data_size = nx * ny * 8
+    if data_size >= 2**31:
+        raise ValueError(f"A {nx} x {ny} grid is too large for a Surfer grid file; save it in the native format")
+    z_min, z_max = np.nanmin(grid.values), np.nanmax(grid.values)
+    with _Output(target) as f:
+        f.write(b"DSRB" + struct.pack("<ii", 4, 2))
+        f.write(b"GRID" + struct.pack("<iii8d", 72, ny, nx, grid.x0, grid.y0, grid.dx, grid.dy, z_min, z_max,
+                                      0.0, SURFER_BLANK))
+        f.write(b"DATA" + struct.pack("<i", data_size))
+        for block in _row_blocks(grid.values, chunk_rows):
+            f.write(np.where(np.isnan(block), SURFER_BLANK, block).astype("<f8").tobytes())
+
+
+def read_esri(source, crs="", name=""):
+    """Read an ESRI ASCII grid (``.asc``), corner or centre registered."""
+    data = _read_bytes(source)
+    lines = data.split(b"\n")
+    header = {}
+    for line in lines:
+        parts = line.split()
+        if len(parts) != 2 or not parts[0][:1].isalpha():
+            break
+        header[parts[0].decode().lower()] = float(parts[1])
+
+    nx, ny = int(header["ncols"]), int(header["nrows"])
+    dx = header.get("cellsize", header.get("dx"))
+    dy = header.get("cellsize", header.get("dy"))
+    if "xllcenter" in header:
+        x0, y0 = header["xllcenter"], header["yllcenter"]
+    else:
+        x0, y0 = header["xllcorner"] + dx / 2, header["yllcorner"] + dy / 2
+
+    body = b" ".join(lines[len(header):]).split()
+    # Rows are stored north to south
+    values = np.array(body[:nx * ny], dtype=float).reshape(ny, nx)[::-1].copy()
+    values[values == header.get("nodata_value", ESRI_NODATA)] = np.nan
+    return Grid(values, x0, y0, dx, dy, crs, name)
+
+
+def write_esri(target, grid, nodata=ESRI_NODATA, chunk_rows=4096):
+    """Write an ESRI ASCII grid; non-square cells use the common dx/dy extension."""
+    ny, nx = grid.shape
+    cells = f"cellsize {grid.dx!r}\n" if np.isclose(grid.dx, grid.dy) else f"dx {grid.dx!r}\ndy {grid.dy!r}\n"
+    with _Output(target) as f:
+        f.write((f"ncols {nx}\nnrows {ny}\nxllcorner {grid.x0 - grid.dx / 2!r}\nyllcorner {grid.y0 - grid.dy / 2!r}\n"
+                 f"{cells}NODATA_value {nodata!r}\n").encode())
+        # North row first, so walk the blocks from the top of the grid down
+        for stop in range(ny, 0, -chunk_rows):
+            block = np.asarray(grid.values[max(stop - chunk_rows, 0):stop], dtype=float)[::-1]
+            np.savetxt(f, np.where(np.isnan(block), nodata, block), fmt="%.7g")
+
+
+def read_grid(source, fmt=None, crs="", name=""):
+    """Open a native, Surfer or ESRI ASCII grid; native files are memory-mapped."""
+    fmt = fmt or detect_grid_format(source)
+    if fmt == "native":
+        return open_grid(source) if isinstance(source, (str, os.PathLike)) else read_native(source)
+    if fmt == "surfer":
+        return read_surfer(source, crs, name)
+    if fmt == "esri":
+        return read_esri(source, crs, name)
+    raise ValueError(f"Unknown grid format '{fmt}', expected one of {sorted(set(GRID_FORMATS.values()))}")
+
+
+def write_grid(target, grid, fmt=None):
+    """Write ``grid`` in the format named by ``fmt`` or the target's extension."""
+    fmt = fmt or detect_grid_format(target)
+    if fmt == "native":
+        save_grid(target, grid)
+    elif fmt in ("surfer", "surfer-binary"):
+        write_surfer(target, grid, binary=fmt == "surfer-binary")
+    elif fmt == "esri":
+        write_esri(target, grid)
+    else:
+        raise ValueError(f"Unknown grid format '{fmt}', expected one of {sorted(set(GRID_FORMATS.values()))}")
+
+
+def grid_bytes(grid, fmt):
+    """The encoded grid file, for download buttons."""
+    buffer = io.BytesIO()
+    write_grid(buffer, grid, fmt)
+    return buffer.getvalue()
+
+
+def grid_cache_key(*parts):
+    """Cache key for a grid derived from ``parts`` (upload hash, columns, method, ...)."""
+    return hashlib.sha1(json.dumps(["grid", *parts], default=str).encode()).hexdigest()
+
+
+def cached_grid(source=None, key=None, build=None, cache_dir=None, max_bytes=None):
+    """Memory-mapped grid from the sheet cache directory, built on first use.
+
+    Either ``source`` (an uploaded grid file in any supported format) or
+    ``key`` plus a ``build`` callable returning a ``Grid`` identifies the
+    entry. Entries share the LRU budget of the parsed-workbook cache, so
+    ``python -m spectral cache purge`` clears them too.
+    """
+    cache_dir = cache_dir or cache.CACHE_DIR
+    if key is None:
+        key = grid_cache_key(cache.content_hash(source))
+    entry = os.path.join(cache_dir, key)
+    path = os.path.join(entry, "grid.sgrd")
+
+    if os.path.exists(path):
+        os.utime(os.path.join(entry, cache._META))
+        return open_grid(path)
+
+    if build is None:
+        data = _read_bytes(source)
+        build = lambda: read_grid(io.BytesIO(data), detect_grid_format(source))  # noqa: E731
+    grid = build()
+
+    tmp = None
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Unique per call: sessions are threads of one process and may store the same grid at once
+        tmp = tempfile.mkdtemp(dir=cache_dir, prefix=f"{key}.tmp-")
+        save_grid(os.path.join(tmp, "grid.sgrd"), grid)
+        with open(os.path.join(tmp, cache._META), "w") as f:
+            json.dump({"kind": "grid", **grid.header()}, f)
+        os.rename(tmp, entry)
+    except OSError:
+        # Another session stored the same grid first, or the cache is not writable
+        if tmp is not None:
+            shutil.rmtree(tmp, ignore_errors=True)
+        if not os.path.exists(path):
+            return grid
+    cache.evict(cache_dir, max_bytes, keep=(entry,))
+    # Another session's eviction may still have removed it
+    return open_grid(path) if os.path.exists(path) else grid
+
@@ -0,0 +1,224 @@
+import io
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from .cache import read_excel_cached
+from .gridding import grid_axes
+from .spectrum import WelchAccumulator
+
+# Geosoft XYZ: "/" starts a comment or header, "Line"/"Tie" lines start a new flight line, "*" is a dummy value
+_LINE_MARKER = re.compile(r"^\s*(line|tie|trend)\b", re.IGNORECASE)
+_DUMMIES = ["*", "", "NaN", "nan", "NA", "n/a"]
+
+LINE_COLUMN = "line"
+# Line number of samples outside any Line/Tie block (a file without markers is one line)
+NO_LINE = -1.0
+
+
+def detect_format(path):
+    """``"excel"``, ``"csv"`` or ``"xyz"`` from the file name."""
+    name = getattr(path, "name", path)
+    extension = os.path.splitext(str(name))[1].lower()
+    if extension in (".xlsx", ".xls"):
+        return "excel"
+    if extension == ".csv":
+        return "csv"
+    return "xyz"
+
+
+def _text(source):
+    if isinstance(source, (str, os.PathLike)):
+        return open(source, "r", errors="replace")
+    if hasattr(source, "getvalue"):
+        return io.StringIO(source.getvalue().decode("utf-8", errors="replace"))
+    return source
+
+
+def xyz_layout(source):
+    """``(names, n_columns)`` of an XYZ file from its header and first data row.
+
+    Names come from the last ``/`` comment before the data when it has one
+    token per column, otherwise they are None.
+    """
+    names = None
+    f = _text(source)
+    # An open handle passed in is read again by read_chunks: rewind it rather than close it
+    owned = f is not source
+    position = None if owned else f.tell()
+    try:
+        for line in f:
+            if isinstance(line, bytes):
+                line = line.decode("utf-8", errors="replace")
+            stripped = line.strip()
+            if not stripped:
+                continue
+            if stripped.startswith("/"):
+                names = stripped.lstrip("/").split() or names
+                continue
+            if _LINE_MARKER.match(stripped):
+                continue
+            n_columns = len(stripped.split())
+            return (names if names and len(names) == n_columns else None), n_columns
+        return None, 0
+    finally:
+        if owned:
+            f.close()
+        else:
+            f.seek(position)
+
+
+def _numeric(chunk, columns):
+    # Same cleaning as pd.to_numeric(errors='coerce') on each column, per chunk
+    return {name: pd.to_numeric(chunk[name], errors="coerce").to_numpy(dtype=float) for name in columns}
+
+
+def _csv_chunks(source, columns, chunk_rows):
+    reader = pd.read_csv(source, chunksize=chunk_rows, usecols=columns, na_values=_DUMMIES,
+                         skipinitialspace=True, low_memory=True)
+    for chunk in reader:
+        yield _numeric(chunk, columns or list(chunk.columns))
+
+
+def _xyz_chunks(source, columns, chunk_rows, names):
+    header, n_columns = xyz_layout(source)
+    names = list(names or header or [f"col{i}" for i in range(n_columns)])
+    if not n_columns:
+        return
+
+    # Fixed field count so short "Line 1010" rows are padded rather than breaking the parser
+    text = source if isinstance(source, (str, os.PathLike)) else _text(source)
+    reader = pd.read_csv(text, sep=r"\s+", comment="/", header=None, names=range(n_columns), dtype=str,
+                         chunksize=chunk_rows, skip_blank_lines=True, on_bad_lines="skip", keep_default_na=False)
+
+    line_number = np.nan
+    for chunk in reader:
+        marker = chunk[0].fillna("").str.match(_LINE_MARKER.pattern, case=False).to_numpy()
+        if marker.any():
+            # Carry the current line number down to the data rows after each marker
+            numbers = pd.to_numeric(chunk[1].where(marker), errors="coerce")
+            if not marker[0]:
+                numbers.iloc[0] = line_number
+            line = numbers.ffill().to_numpy(dtype=float)
+            line_number = line[-1]
+        else:
+            line = np.full(len(chunk), line_number)
+
+        data = chunk[~marker].iloc[:, :len(names)]
+        data.columns = names[:data.shape[1]]
+        values = _numeric(data, columns or list(data.columns))
+        values[LINE_COLUMN] = line[~marker]
+        yield values
+
+
+def _line_numbers(chunk, rows):
+    """The chunk's line numbers, with samples outside any flight line all on ``NO_LINE``."""
+    if LINE_COLUMN not in chunk:
+        return np.full(rows, NO_LINE)
+    lines = chunk[LINE_COLUMN]
+    # NaN keys would never compare equal, so each unmarked sample would become a line of its own
+    return np.where(np.isnan(lines), NO_LINE, lines)
+
+
+def read_chunks(source, columns=None, chunk_rows=1_000_000, fmt=None, names=None):
+    """Stream a survey file as dicts of float arrays, ``chunk_rows`` rows at a time.
+
+    CSV files use their header row; Geosoft-style XYZ/ASCII files take
+    column names from ``names`` or the last ``/`` header comment, and every
+    chunk gets an extra ``"line"`` array holding the flight-line number
+    from the ``Line``/``Tie`` markers. Text and ``*`` dummies become NaN.
+    Excel workbooks are read whole (through the sheet cache) and yielded
+    in slices, since openpyxl cannot stream them.
+    """
+    fmt = fmt or detect_format(source)
+    columns = list(columns) if columns else None
+
+    if fmt == "csv":
+        yield from _csv_chunks(source, columns, chunk_rows)
+    elif fmt == "xyz":
+        yield from _xyz_chunks(source, columns, chunk_rows, names)
+    elif fmt == "excel":
+        df = read_excel_cached(source)
+        for start in range(0, len(df), chunk_rows):
+            yield _numeric(df.iloc[start:start + chunk_rows], columns or list(df.columns))
+    else:
+        raise ValueError(f"Unknown format '{fmt}', expected 'csv', 'xyz' or 'excel'")
+
+
+def read_table(source, columns=None, fmt=None, names=None):
+    """Whole file as a numeric DataFrame; for uploads small enough to hold in memory."""
+    if (fmt or detect_format(source)) == "excel":
+        return read_excel_cached(source)
+    chunks = list(read_chunks(source, columns, fmt=fmt, names=names))
+    if not chunks:
+        return pd.DataFrame()
+    return pd.DataFrame({name: np.concatenate([chunk[name] for chunk in chunks]) for name in chunks[0]})
+
+
+def scan(source, x, y, fmt=None, chunk_rows=1_000_000):
+    """One pass over a file for the row count, X/Y bounds and flight lines."""
+    rows = 0
+    bounds = [np.inf, -np.inf, np.inf, -np.inf]
+    lines = set()
+    for chunk in read_chunks(source, fmt=fmt, chunk_rows=chunk_rows):
+        rows += len(chunk[x])
+        if np.isfinite(chunk[x]).any() and np.isfinite(chunk[y]).any():
+            bounds = [min(bounds[0], np.nanmin(chunk[x])), max(bounds[1], np.nanmax(chunk[x])),
+                      min(bounds[2], np.nanmin(chunk[y])), max(bounds[3], np.nanmax(chunk[y]))]
+        lines.update(np.unique(_line_numbers(chunk, len(chunk[x]))).tolist())
+    return {"rows": rows, "bounds": tuple(float(b) for b in bounds), "lines": sorted(lines)}
+
+
+def bin_chunks(chunks, x, y, z, cell_size, bounds):
+    """Average ``z`` into grid cells as the chunks stream past.
+
+    Memory is fixed by the grid size, not the file size. Returns
+    ``(x_axis, y_axis, Z)`` like ``grid_points``; empty cells are NaN and
+    can be filled afterwards with ``grid_points`` on the cell centres.
+    """
+    gx, gy = grid_axes(None, None, cell_size, bounds)
+    total = np.zeros(len(gx) * len(gy))
+    count = np.zeros(len(gx) * len(gy))
+
+    for chunk in chunks:
+        cx, cy, cz = chunk[x], chunk[y], chunk[z]
+        col = np.rint((cx - gx[0]) / cell_size)
+        row = np.rint((cy - gy[0]) / cell_size)
+        keep = ~np.isnan(cz) & (col >= 0) & (col < len(gx)) & (row >= 0) & (row < len(gy))
+        cell = row[keep].astype(np.intp) * len(gx) + col[keep].astype(np.intp)
+        total += np.bincount(cell, weights=cz[keep], minlength=total.size)
+        count += np.bincount(cell, minlength=count.size)
+
+    with np.errstate(invalid="ignore"):
+        Z = (total / count).reshape(len(gy), len(gx))
+    return gx, gy, Z
+
+
+def line_spectra(chunks, column, sampling_interval=1.0, segment_length=256, **welch_options):
+    """Welch spectrum of ``column`` for every flight line in a stream.
+
+    Each line keeps only a running power sum and the samples of its last
+    partial segment, so any number of lines of any length fit in memory.
+    NaN samples are dropped. Returns ``{line: Spectrum}`` for every line
+    long enough for one segment.
+    """
+    accumulators = {}
+    for chunk in chunks:
+        values = chunk[column]
+        lines = _line_numbers(chunk, len(values))
+        keep = ~np.isnan(values)
+        values, lines = values[keep], lines[keep]
+        if not len(values):
+            continue
+
+        # Rows arrive grouped by line, so split the chunk where the line number changes
+        breaks = np.flatnonzero(np.diff(lines) != 0) + 1
+        for start, stop in zip(np.r_[0, breaks], np.r_[breaks, len(values)]):
+            line = float(lines[start])
+            if line not in accumulators:
+                accumulators[line] = WelchAccumulator(sampling_interval, segment_length, **welch_options)
+            accumulators[line].add(values[start:stop])
+
+    return {line: acc.spectrum() for line, acc in accumulators.items() if acc.segments}
@@ -0,0 +1,284 @@
+"""Per-stage wall time, CPU time and memory for the Streamlit apps.
+
+Wrap work in ``with stage("name"):`` (or decorate with :func:`timed`) and
+Streamlit-cached functions with :func:`cached`, which also counts cache
+hits and misses. Each rerun of an app starts a :class:`Run` with
+:func:`start_run`; every finished stage is added to it and appended as
+one JSON line to the performance log (``SPECTRAL_PERF_LOG``, default
+``<cache dir>/perf.jsonl``, ``off`` to disable), which
+``python -m spectral perf`` aggregates across sessions.
+
+CPU time is the calling thread's, so concurrent sessions do not inflate
+each other. Memory is not: both figures cover the whole server process.
+Allocation peaks need ``tracemalloc``, which slows allocation-heavy code
+and is switched on for the whole process with ``SPECTRAL_TRACE_MEMORY=1``
+at startup; a stage's peak then includes whatever other sessions
+allocated while it ran. The growth of the process's peak resident size
+is recorded either way.
+"""
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+
+from .cache import CACHE_DIR
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+LOG_PATH = os.environ.get("SPECTRAL_PERF_LOG", os.path.join(CACHE_DIR, "perf.jsonl"))
+
+_local = threading.local()
+_log_lock = threading.Lock()
+_stats_lock = threading.Lock()
+# Stages open on any thread while tracing, so a new stage's reset_peak() hands them the peak so far
+_trace_lock = threading.Lock()
+_open_stages = set()
+
+# (stage, "hit" / "miss") -> count, for every cached call in this process
+CACHE_STATS = Counter()
+
+if os.environ.get("SPECTRAL_TRACE_MEMORY") == "1":
+    tracemalloc.start()
+
+
+def _max_rss():
+    if resource is None:
+        return 0.0
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+class Run:
+    """The stages recorded during one rerun of an app."""
+
+    def __init__(self, app, session=""):
+        self.app = app
+        self.session = session
+        self.id = uuid.uuid4().hex[:12]
+        self.started = time.perf_counter()
+        self.records = []
+
+    @property
+    def seconds(self):
+        return time.perf_counter() - self.started
+
+    def frame(self):
+        """One row per stage in the order they finished."""
+        import pandas as pd
+
+        columns = ["stage", "depth", "cache", "wall_s", "cpu_s", "peak_alloc_mb", "rss_growth_mb"]
+        return pd.DataFrame(self.records, columns=columns + ["time", "app", "session", "run"])[columns]
+
+
+def start_run(app, session=None):
+    """Begin recording a rerun of ``app`` on this thread and return its :class:`Run`.
+
+    ``session`` defaults to an id kept in Streamlit's session state, so log
+    lines from one browser tab can be grouped.
+    """
+    if session is None:
+        import streamlit as st
+
+        session = st.session_state.setdefault("_perf_session", uuid.uuid4().hex[:8])
+    _local.run = Run(app, session)
+    _local.stack = []
+    return _local.run
+
+
+def current_run():
+    return getattr(_local, "run", None)
+
+
+def _write(record, path=None):
+    path = path or LOG_PATH
+    if path == "off":
+        return
+    line = json.dumps(record, default=str) + "\n"
+    try:
+        with _log_lock:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path, "a") as f:
+                f.write(line)
+    except OSError:
+        pass
+
+
+def record(name, wall, cpu=None, cache=None, peak_alloc_mb=None, rss_growth_mb=None, app=None):
+    """Add a finished stage to the current run and the log (also for work timed elsewhere, e.g. a job)."""
+    run = current_run()
+    entry = {"time": time.time(), "app": app or (run.app if run else ""), "session": run.session if run else "",
+             "run": run.id if run else "", "stage": name, "depth": len(getattr(_local, "stack", [])),
+             "cache": cache, "wall_s": wall, "cpu_s": cpu, "peak_alloc_mb": peak_alloc_mb,
+             "rss_growth_mb": rss_growth_mb}
+    if run is not None:
+        run.records.append(entry)
+    _write(entry)
+
+
+class _Stage:
+    def __init__(self, name, cache=None):
+        self.name = name
+        self.cache = cache
+        self.child_peak = 0
+
+    def __enter__(self):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        self.rss = _max_rss()
+        if tracemalloc.is_tracing():
+            with _trace_lock:
+                current, peak = tracemalloc.get_traced_memory()
+                # Every open stage (enclosing ones and other sessions') keeps the peak reached so far;
+                # this one starts a fresh peak
+                for other in _open_stages:
+                    other.child_peak = max(other.child_peak, peak)
+                tracemalloc.reset_peak()
+                self.base = current
+                _open_stages.add(self)
+        stack.append(self)
+        self.wall, self.cpu = time.perf_counter(), time.thread_time()
+        return self
+
+    def __exit__(self, *exc):
+        wall, cpu = time.perf_counter() - self.wall, time.thread_time() - self.cpu
+        stack = _local.stack
+        stack.pop()
+        peak_alloc = None
+        if hasattr(self, "base"):
+            with _trace_lock:
+                _open_stages.discard(self)
+                if tracemalloc.is_tracing():
+                    peak = max(tracemalloc.get_traced_memory()[1], self.child_peak)
+                    peak_alloc = max(peak - self.base, 0) / 2**20
+        record(self.name, wall, cpu, self.cache, peak_alloc, _max_rss() - self.rss)
+        return False
+
+
+def stage(name, cache=None):
+    """Context manager timing the block it wraps as stage ``name``."""
+    return _Stage(name, cache)
+
+
+def timed(name=None):
+    """Decorator timing every call of a function as a stage (named after the function by default)."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def call(*args, **kwargs):
+            with _Stage(name or fn.__name__):
+                return fn(*args, **kwargs)
+        return call
+    return wrap
+
+
+def cached(cache_decorator, name=None):
+    """Apply a Streamlit cache decorator and time each call, noting whether it hit the cache.
+
+    Use in place of the decorator itself::
+
+        @cached(st.cache_data(show_spinner=False))
+        def load_workbook(file_hash, _upload): ...
+    """
+    def wrap(fn):
+        label = name or fn.__name__
+
+        # Runs only on a miss; marks the innermost pending call of this thread as computed
+        @functools.wraps(fn)
+        def body(*args, **kwargs):
+            _local.misses[-1] = True
+            return fn(*args, **kwargs)
+
+        cached_fn = cache_decorator(body)
+
+        @functools.wraps(fn)
+        def call(*args, **kwargs):
+            misses = getattr(_local, "misses", None)
+            if misses is None:
+                misses = _local.misses = []
+            misses.append(False)
+            try:
+                with _Stage(label) as timer:
+                    result = cached_fn(*args, **kwargs)
+                    timer.cache = "miss" if misses[-1] else "hit"
+            finally:
+                misses.pop()
+            with _stats_lock:
+                CACHE_STATS[label, timer.cache] += 1
+            return result
+
+        call.clear = cached_fn.clear
+        return call
+    return wrap
+
+
+def cache_rates():
+    """Calls, hits and hit rate of every cached stage in this process."""
+    import pandas as pd
+
+    with _stats_lock:
+        stats = dict(CACHE_STATS)
+    names = sorted({name for name, _ in stats})
+    hits = [stats.get((name, "hit"), 0) for name in names]
+    misses = [stats.get((name, "miss"), 0) for name in names]
+    frame = pd.DataFrame({"stage": names, "hits": hits, "misses": misses})
+    frame["hit_rate"] = frame["hits"] / (frame["hits"] + frame["misses"]).where(lambda total: total > 0)
+    return frame
+
+
+def performance_panel(run=None):
+    """Collapsed "Performance" expander with this rerun's stages and the process's cache hit rates."""
+    import streamlit as st
+
+    run = run or current_run()
+    if run is None:
+        return
+    with st.expander("⏱️ Performance"):
+        stages = run.frame()
+        top = stages[stages["depth"] == 0]
+        st.caption(f"Rerun {run.id}: {run.seconds:.2f}s wall, {top['wall_s'].sum():.2f}s in "
+                   f"{len(top)} top-level stages, {top['cpu_s'].sum():.2f}s CPU"
+                   + (f"; log: {LOG_PATH}" if LOG_PATH != "off" else ""))
+        st.caption("Memory columns cover the whole server process, not this session alone; allocation peaks are "
+                   + ("traced" if tracemalloc.is_tracing() else "off (start the server with SPECTRAL_TRACE_MEMORY=1)")
+                   + ".")
+        st.dataframe(stages.assign(stage=stages["depth"].map(lambda depth: "  " * depth) + stages["stage"],
+                                   cache=stages["cache"].fillna("")).drop(columns="depth"), hide_index=True)
+        rates = cache_rates()
+        if len(rates):
+            st.markdown("**Cache hit rates (this server process)**")
+            st.dataframe(rates, hide_index=True)
+
+
+def summarise(path=None):
+    """Aggregate a performance log by app and stage, slowest total first.
+
+    Returns calls, total/mean/p95/max wall seconds, mean CPU seconds, the
+    largest allocation peak and the cache hit rate of every stage.
+    """
+    import pandas as pd
+
+    log = pd.read_json(path or LOG_PATH, lines=True)
+    if log.empty:
+        return log
+    log["hit"] = log["cache"].eq("hit")
+    log["is_cached"] = log["cache"].notna()
+    grouped = log.groupby(["app", "stage"])
+    frame = pd.DataFrame({
+        "calls": grouped.size(),
+        "sessions": grouped["session"].nunique(),
+        "total_s": grouped["wall_s"].sum(),
+        "mean_s": grouped["wall_s"].mean(),
+        "p95_s": grouped["wall_s"].quantile(0.95),
+        "max_s": grouped["wall_s"].max(),
+        "mean_cpu_s": grouped["cpu_s"].mean(),
+        "max_alloc_mb": grouped["peak_alloc_mb"].max(),
+        "hit_rate": grouped["hit"].sum() / grouped["is_cached"].sum().where(lambda n: n > 0),
+    }).reset_index().sort_values("total_s", ascending=False)
+    return frame
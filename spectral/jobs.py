@@ -0,0 +1,214 @@
+"""Local background job queue for the Streamlit apps.
+
+One :class:`JobQueue` per server process (held with ``st.cache_resource``)
+runs analyses in a small process pool, so a large upload neither blocks
+the session that sent it nor takes every core from the other sessions.
+Submitting the same function with the same key (upload hash plus
+parameters) returns the job already queued, running or finished instead
+of starting another. Pages poll :meth:`JobQueue.status` and collect
+:meth:`JobQueue.result` when it is done; job functions may call
+:func:`progress` to report how far they have got.
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+import pickle
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from . import cache
+
+# Worker processes shared by every session of one server
+WORKERS = int(os.environ.get("SPECTRAL_JOB_WORKERS", "0")) or max((os.cpu_count() or 2) // 2, 1)
+
+# Progress file of the job running in this worker process, if any
+_progress_path = None
+
+
+def progress(fraction, message=""):
+    """Report a running job's progress (0 to 1); does nothing outside a job."""
+    if _progress_path is None:
+        return
+    tmp = f"{_progress_path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({"fraction": float(fraction), "message": message, "time": time.time()}, f)
+    os.replace(tmp, _progress_path)
+
+
+def _run(path, fn, args, kwargs):
+    global _progress_path
+    _progress_path = path
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        _progress_path = None
+
+
+class JobForgotten(LookupError):
+    """The queue no longer holds the job (it finished and was dropped past ``keep``)."""
+
+    def __init__(self, job_id):
+        super().__init__(f"Job {job_id} forgotten")
+        self.job_id = job_id
+
+
+class Job:
+    """One submission: its future, what it runs and when it was sent."""
+
+    def __init__(self, job_id, name, future, progress_path):
+        self.id = job_id
+        self.name = name
+        self.future = future
+        self.progress_path = progress_path
+        self.submitted = time.time()
+        self.finished = None
+
+    @property
+    def state(self):
+        if self.future.cancelled():
+            return "cancelled"
+        if self.future.done():
+            return "failed" if self.future.exception() is not None else "done"
+        return "running" if self.future.running() else "queued"
+
+    def status(self):
+        """``id``, ``name``, ``state``, ``progress`` (0-1), ``message``, ``seconds`` and ``error``."""
+        state = self.state
+        report = {"fraction": 1.0 if state == "done" else 0.0, "message": ""}
+        if state == "running":
+            try:
+                with open(self.progress_path) as f:
+                    report = json.load(f)
+            except (OSError, ValueError):
+                pass
+        end = self.finished if self.finished is not None else time.time()
+        return {"id": self.id, "name": self.name, "state": state, "progress": report["fraction"],
+                "message": report["message"], "seconds": end - self.submitted,
+                "error": str(self.future.exception()) if state == "failed" else ""}
+
+
+class JobQueue:
+    """Process-pool job queue with submission de-duplication.
+
+    ``workers`` caps how many jobs run at once (default
+    ``SPECTRAL_JOB_WORKERS`` or half the CPUs); further jobs wait in
+    order. The last ``keep`` finished jobs stay available for
+    :meth:`result`; older ones are forgotten. ``on_finish`` is called
+    with the :meth:`Job.status` of every job as it ends (from a pool
+    thread), e.g. to log how long jobs took.
+    """
+
+    def __init__(self, workers=None, keep=64, jobs_dir=None, on_finish=None):
+        self.workers = workers or WORKERS
+        self.keep = keep
+        self.on_finish = on_finish
+        self.jobs_dir = jobs_dir or os.path.join(cache.CACHE_DIR, "jobs", str(os.getpid()))
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+        self.pool = None
+
+    def _executor(self):
+        # Spawned, not forked: the server process runs threads that a fork would copy mid-flight
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self.pool
+
+    @staticmethod
+    def job_id(fn, args=(), kwargs=None, key=None):
+        """Id of a submission: the function plus ``key``, or plus its pickled arguments."""
+        digest = hashlib.sha1(f"{fn.__module__}.{fn.__qualname__}".encode())
+        if key is not None:
+            digest.update(json.dumps([key, kwargs or {}], default=str, sort_keys=True).encode())
+        else:
+            digest.update(pickle.dumps((args, sorted((kwargs or {}).items()))))
+        return digest.hexdigest()
+
+    def submit(self, fn, *args, key=None, name=None, **kwargs):
+        """Queue ``fn(*args, **kwargs)`` and return the job id.
+
+        ``fn`` must be importable by the workers (a module-level function).
+        With ``key`` (e.g. the upload hash and settings) the arguments are
+        not hashed; an identical submission that is queued, running or done
+        returns the existing job, while a failed or cancelled one is rerun.
+        """
+        job_id = self.job_id(fn, args, kwargs, key)
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is not None and job.state not in ("failed", "cancelled"):
+                self.jobs.move_to_end(job_id)
+                return job_id
+
+            path = os.path.join(self.jobs_dir, f"{job_id}.json")
+            try:
+                future = self._executor().submit(_run, path, fn, args, kwargs)
+            except BrokenProcessPool:
+                # A worker died (out of memory, killed); start a fresh pool
+                self.pool = None
+                future = self._executor().submit(_run, path, fn, args, kwargs)
+            job = Job(job_id, name or fn.__name__, future, path)
+            future.add_done_callback(lambda _, job=job: self._finished(job))
+            self.jobs[job_id] = job
+            self._forget_old()
+        return job_id
+
+    def _finished(self, job):
+        job.finished = time.time()
+        if self.on_finish is not None:
+            self.on_finish(job.status())
+
+    def _forget_old(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.future.done()]
+        for job_id in finished[:max(len(finished) - self.keep, 0)]:
+            job = self.jobs.pop(job_id)
+            if os.path.exists(job.progress_path):
+                os.remove(job.progress_path)
+
+    def __contains__(self, job_id):
+        with self.lock:
+            return job_id in self.jobs
+
+    def _job(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+        if job is None:
+            raise JobForgotten(job_id)
+        return job
+
+    def status(self, job_id):
+        """:meth:`Job.status` of a job; state ``"forgotten"`` once it has been dropped past ``keep``."""
+        try:
+            return self._job(job_id).status()
+        except JobForgotten:
+            return {"id": job_id, "name": "", "state": "forgotten", "progress": 0.0, "message": "", "seconds": 0.0,
+                    "error": "the job is no longer held by the queue"}
+
+    def result(self, job_id, timeout=None):
+        """The job's return value, waiting up to ``timeout`` seconds; re-raises its error.
+
+        Raises :class:`JobForgotten` if the job has been dropped past ``keep``; submit it again.
+        """
+        return self._job(job_id).future.result(timeout)
+
+    def cancel(self, job_id):
+        """Cancel a job that has not started; returns False if it is already running or done.
+
+        Raises :class:`JobForgotten` if the job has been dropped past ``keep``.
+        """
+        return self._job(job_id).future.cancel()
+
+    def summary(self):
+        """Status of every job known to the queue, oldest first."""
+        with self.lock:
+            return [job.status() for job in self.jobs.values()]
+
+    def shutdown(self, wait=True):
+        if self.pool is not None:
+            self.pool.shutdown(wait=wait, cancel_futures=True)
+            self.pool = None
+        shutil.rmtree(self.jobs_dir, ignore_errors=True)
@@ -0,0 +1,303 @@
+"""Run the app stages headless from a YAML/JSON manifest.
+
+A manifest names an output directory, default stage settings and a list
+of inputs; each input may override any stage setting::
+
+    output: results
+    stages:
+      columns: {x: 0, y: 1}
+      resample: {interval: auto, kind: linear}
+      spectrum: {method: welch, segment_length: 128}
+      regression: true
+      depth: {segments: 3, min_points: 5}
+      figures: {dpi: 100}
+    inputs:
+      - dong.xlsx
+      - {path: lau.xlsx, name: Lau, stages: {depth: {segments: 2}}}
+      - path: survey.csv
+        stages:
+          grid: {x: X, y: Y, z: K, method: idw, cell_size: auto}
+          anomaly: {contamination: 0.1}
+    report: {formats: [html, pdf]}
+
+Only the stages present (and not ``false``) run. An optional ``report``
+section renders ``report.html``/``report.pdf`` from the outputs
+(see :mod:`spectral.report`). A grid ``z`` may also be a derived-channel
+expression such as ``eTh/K`` (see :mod:`spectral.channels`). Heavy modules are
+imported by the stage that needs them, never at start-up.
+"""
+import copy
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+SPECTRUM_STAGES = ["resample", "spectrum", "regression", "depth", "figures"]
+
+
+def load_manifest(path):
+    """Parse a ``.yaml``/``.yml`` or ``.json`` manifest into a dict."""
+    with open(path) as f:
+        if os.path.splitext(path)[1].lower() == ".json":
+            manifest = json.load(f)
+        else:
+            import yaml
+
+            manifest = yaml.safe_load(f)
+    if not isinstance(manifest, dict) or not manifest.get("inputs"):
+        raise ValueError(f"{path}: a manifest needs an 'inputs' list")
+    return manifest
+
+
+def _merge(base, override):
+    merged = copy.deepcopy(base)
+    for key, value in (override or {}).items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _merge(merged[key], value)
+        else:
+            merged[key] = copy.deepcopy(value)
+    return merged
+
+
+def resolve(manifest, base_dir="."):
+    """One job dict per input, with stage settings merged and paths made absolute.
+
+    Relative input and output paths are taken from ``base_dir`` (the
+    manifest's directory), so a manifest runs the same from anywhere.
+    """
+    output = os.path.join(base_dir, manifest.get("output", "results"))
+    jobs = []
+    for item in manifest["inputs"]:
+        item = {"path": item} if isinstance(item, str) else dict(item)
+        path = os.path.join(base_dir, item["path"])
+        name = item.get("name") or os.path.splitext(os.path.basename(path))[0]
+        jobs.append({
+            "name": name,
+            "path": os.path.normpath(path),
+            "sheet": item.get("sheet", manifest.get("sheet", 0)),
+            "stages": _merge(manifest.get("stages", {}), item.get("stages")),
+            "output": os.path.join(output, name),
+        })
+
+    names = [job["name"] for job in jobs]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Input names must be unique, got duplicates: {', '.join(duplicates)}")
+    return output, jobs
+
+
+def _settings(stages, name):
+    value = stages.get(name)
+    if value is None or value is False:
+        return None
+    return {} if value is True else dict(value)
+
+
+def _load(job):
+    from .ingest import detect_format, read_table
+
+    if detect_format(job["path"]) == "excel":
+        from .cache import read_excel_cached
+
+        return read_excel_cached(job["path"], sheet_name=job["sheet"])
+    return read_table(job["path"])
+
+
+def _spectrum_stages(job, df, summary):
+    import numpy as np
+    import pandas as pd
+
+    from .core import clean_spectrum
+
+    stages = job["stages"]
+    columns = stages.get("columns", {})
+    data = clean_spectrum(df, columns.get("x", 0), columns.get("y", 1))
+    x = data.iloc[:, 0].to_numpy()
+    y = data.iloc[:, 1].to_numpy()
+    summary["points"] = len(data)
+
+    profile, interval = y, float(stages.get("sampling_interval", 1.0))
+    resample = _settings(stages, "resample")
+    if resample is not None:
+        from .resample import infer_interval, resample as resample_profile
+
+        if resample.get("interval", "auto") == "auto":
+            interval = infer_interval(x)
+        else:
+            interval = float(resample["interval"])
+        _, profile = resample_profile(x, y, interval, kind=resample.get("kind", "linear"))
+        profile = profile[~np.isnan(profile)]
+        summary["resampled_points"] = len(profile)
+    summary["sampling_interval"] = interval
+
+    spectrum = _settings(stages, "spectrum")
+    if spectrum is not None:
+        method = spectrum.pop("method", "fft")
+        if method == "welch":
+            from .spectrum import welch
+
+            result = welch(profile, interval, **spectrum)
+            frequency, values, label = result.frequency, result.power, "power"
+        else:
+            from .core import fft_spectrum
+
+            frequency, values = fft_spectrum(profile, interval)
+            label = "magnitude"
+        pd.DataFrame({"frequency": frequency, label: values}).to_csv(
+            os.path.join(job["output"], "spectrum.csv"), index=False)
+        peak = int(np.argmax(values[1:])) + 1 if len(values) > 1 else 0
+        summary["peak_frequency"] = float(frequency[peak]) if len(frequency) else np.nan
+
+    if _settings(stages, "regression") is not None:
+        from .depth import prefix_sums, segment_fit
+
+        # The closed-form least-squares line the apps get from LinearRegression
+        slope, intercept, _, _ = segment_fit(prefix_sums(x, y), 0, len(x))
+        summary["slope"], summary["intercept"] = float(slope), float(intercept)
+
+    depth = _settings(stages, "depth")
+    if depth is not None:
+        from .depth import fit_segments
+
+        segments = fit_segments(x, y, depth.get("segments", 3), depth.get("min_points", 3),
+                                depth.get("units", "cycles"))
+        segments.to_csv(os.path.join(job["output"], "depth.csv"), index=False)
+        for row in segments.itertuples():
+            summary[f"depth_{row.segment}"] = row.depth
+
+    figures = _settings(stages, "figures")
+    if figures is not None:
+        from .core import plot_spectrum
+
+        path = os.path.join(job["output"], f"{job['name']}.png")
+        plot_spectrum(data, f"{job['name']} 2D Radial Spectrum").savefig(path, dpi=figures.get("dpi", 100))
+
+
+def _grid_stages(job, df, summary):
+    import numpy as np
+    import pandas as pd
+
+    from .gridding import estimate_cell_size, grid_points
+    from .gridfile import Grid, write_grid
+    from .report import zone_thresholds
+
+    settings = _settings(job["stages"], "grid")
+    x_col, y_col, z_col = settings.get("x", "X"), settings.get("y", "Y"), settings.get("z", "Z")
+    if z_col not in df.columns:
+        # A derived channel such as "eTh/K" (see spectral.channels)
+        from .channels import evaluate
+
+        df = df.assign(**{z_col: evaluate(z_col, df)})
+    points = df[[x_col, y_col, z_col]].apply(pd.to_numeric, errors="coerce").dropna()
+    x, y, z = (points[column].to_numpy() for column in (x_col, y_col, z_col))
+
+    cell_size = settings.get("cell_size", "auto")
+    cell_size = estimate_cell_size(x, y) if cell_size == "auto" else float(cell_size)
+    grid = Grid.from_axes(*grid_points(x, y, z, cell_size=cell_size, method=settings.get("method", "idw")),
+                          crs=settings.get("crs", ""), name=z_col)
+    fmt = settings.get("format", "native")
+    extension = {"native": ".sgrd", "esri": ".asc"}.get(fmt, ".grd")
+    write_grid(os.path.join(job["output"], f"grid{extension}"), grid, fmt)
+    summary.update(grid_nx=grid.shape[1], grid_ny=grid.shape[0], cell_size=cell_size,
+                   z_min=float(np.nanmin(grid.values)), z_max=float(np.nanmax(grid.values)))
+    summary["zone_low"], summary["zone_high"] = zone_thresholds(grid.values)
+
+    anomaly = _settings(job["stages"], "anomaly")
+    if anomaly is not None:
+        from .anomaly import detect_anomalies
+
+        labels, _, _ = detect_anomalies(grid.values, contamination=anomaly.get("contamination", 0.1),
+                                        window=anomaly.get("window", 5))
+        write_grid(os.path.join(job["output"], f"anomaly{extension}"),
+                   Grid(labels, grid.x0, grid.y0, grid.dx, grid.dy, grid.crs, f"{z_col} anomaly"), fmt)
+        summary["anomalous_cells"] = int(np.sum(labels == -1))
+
+
+def run_job(job):
+    """Run every configured stage of one input. Runs inside a worker process."""
+    start = time.perf_counter()
+    os.makedirs(job["output"], exist_ok=True)
+    summary = {"name": job["name"], "source": job["path"]}
+
+    df = _load(job)
+    if any(_settings(job["stages"], stage) is not None for stage in SPECTRUM_STAGES):
+        _spectrum_stages(job, df, summary)
+    if _settings(job["stages"], "grid") is not None:
+        _grid_stages(job, df, summary)
+
+    summary["seconds"] = time.perf_counter() - start
+    summary["error"] = ""
+    return summary
+
+
+def _environment():
+    import platform
+
+    import numpy as np
+    import pandas as pd
+    import scipy
+
+    return {"python": platform.python_version(), "numpy": np.__version__, "pandas": pd.__version__,
+            "scipy": scipy.__version__, "platform": platform.platform()}
+
+
+def _file_digest(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def run_manifest(path, workers=None, progress=print):
+    """Run a manifest across a process pool.
+
+    Writes each input's outputs under ``<output>/<name>/``, a
+    ``summary.csv`` with one row per input and a ``run.json`` recording the
+    resolved settings, input hashes and package versions for reproducing
+    the run. Returns the summary DataFrame.
+    """
+    import pandas as pd
+
+    manifest = load_manifest(path)
+    output, jobs = resolve(manifest, os.path.dirname(os.path.abspath(path)))
+    os.makedirs(output, exist_ok=True)
+    report = progress or (lambda message: None)
+    workers = workers or manifest.get("workers") or os.cpu_count() or 1
+
+    start = time.perf_counter()
+    rows = []
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+        futures = {pool.submit(run_job, job): job for job in jobs}
+        for done, future in enumerate(as_completed(futures), 1):
+            job = futures[future]
+            try:
+                row = future.result()
+                report(f"[{done}/{len(jobs)}] {job['name']}: done in {row['seconds']:.2f}s")
+            except Exception as e:
+                row = {"name": job["name"], "source": job["path"], "error": str(e)}
+                report(f"[{done}/{len(jobs)}] {job['name']}: failed ({e})")
+            rows.append(row)
+
+    summary = pd.DataFrame(rows).sort_values("name").reset_index(drop=True)
+    summary.to_csv(os.path.join(output, "summary.csv"), index=False)
+
+    record = {
+        "manifest": os.path.abspath(path),
+        "environment": _environment(),
+        "inputs": {job["name"]: _file_digest(job["path"]) if os.path.exists(job["path"]) else None for job in jobs},
+        "jobs": jobs,
+    }
+    with open(os.path.join(output, "run.json"), "w") as f:
+        json.dump(record, f, indent=2, default=str)
+
+    failed = int((summary["error"] != "").sum())
+    report(f"Ran {len(jobs) - failed}/{len(jobs)} inputs in {time.perf_counter() - start:.2f}s -> {output}")
+
+    settings = _settings(manifest, "report")
+    if settings is not None:
+        from .report import build_report
+
+        build_report(output, workers=workers, progress=progress, **settings)
+    return summary
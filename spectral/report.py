@@ -0,0 +1,431 @@
+"""Interpretation reports from the results of ``python -m spectral run``.
+
+    python -m spectral report results                 # results/report.html and report.pdf
+    python -m spectral report results --format pdf --workers 8
+
+Every site's figures (spectrum, depth segments, grid, zones, anomalies)
+are drawn headless in a process pool and kept in the figure cache under
+a key built from the content of the files they show, so rebuilding a
+report after a partial re-run only draws what changed. The notes under
+each site are written from its numbers, not from a fixed template.
+"""
+import hashlib
+import html
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from .cache import CACHE_DIR, FIGURES_DIR, content_hash, evict
+
+# Bump when a figure's appearance changes so cached PNGs are redrawn
+FIGURE_VERSION = 2
+FORMATS = ["html", "pdf"]
+# Low/medium/high zones split the grid's value range at these fractions, as in grid.py
+ZONE_FRACTIONS = (0.33, 0.66)
+ZONE_NAMES = ["low", "medium", "high"]
+# Grids are decimated to at most this many cells across before drawing
+MAX_FIGURE_CELLS = 1000
+
+
+def zone_thresholds(values, fractions=ZONE_FRACTIONS):
+    """Values splitting ``values`` into low, medium and high zones, ``(low, high)``."""
+    v_min, v_max = float(np.nanmin(values)), float(np.nanmax(values))
+    return tuple(v_min + fraction * (v_max - v_min) for fraction in fractions)
+
+
+def zone_shares(values, thresholds):
+    """Share of the finite cells of ``values`` in each zone, as ``{name: fraction}``."""
+    values = np.asarray(values, dtype=float)
+    finite = values[np.isfinite(values)]
+    counts = np.bincount(np.searchsorted(thresholds, finite, side="left"), minlength=len(thresholds) + 1)
+    return dict(zip(ZONE_NAMES, counts / max(len(finite), 1)))
+
+
+def _number(value, digits=4):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return str(value)
+    return "—" if np.isnan(value) else f"{value:.{digits}g}"
+
+
+def spectrum_notes(summary):
+    notes = []
+    if "peak_frequency" in summary and not _missing(summary["peak_frequency"]):
+        notes.append(f"The spectrum peaks at a frequency of {_number(summary['peak_frequency'])} "
+                     f"(sampling interval {_number(summary.get('sampling_interval', 1.0))}).")
+    return notes
+
+
+def depth_notes(segments):
+    """One sentence per fitted segment, deepest first."""
+    notes = []
+    for row in segments.itertuples():
+        notes.append(f"The {row.segment} segment (k = {_number(row.x_start)}–{_number(row.x_end)}, "
+                     f"{int(row.points)} points, r² = {_number(row.r2, 3)}) gives a depth of "
+                     f"{_number(row.depth)} ± {_number(row.depth_stderr, 2)}.")
+    if len(segments) > 1 and segments["depth"].iloc[0] > 0:
+        ratio = segments["depth"].iloc[0] / segments["depth"].iloc[1]
+        notes.append(f"The deep sources lie {_number(ratio, 3)} times deeper than the shallow ones.")
+    return notes
+
+
+def zone_notes(values, name):
+    thresholds = zone_thresholds(values)
+    shares = zone_shares(values, thresholds)
+    notes = [f"{name} ranges from {_number(np.nanmin(values))} to {_number(np.nanmax(values))} "
+             f"(mean {_number(np.nanmean(values))}).",
+             f"Zones: low ≤ {_number(thresholds[0])} covers {shares['low']:.0%} of the grid, "
+             f"medium up to {_number(thresholds[1])} covers {shares['medium']:.0%} and "
+             f"high covers {shares['high']:.0%}."]
+    if "eth/k" in name.lower() or "radiometric" in name.lower():
+        notes.append("High zones suggest elevated thorium or potassium; low zones are typically "
+                     "less mineralised or sedimentary ground.")
+    return notes
+
+
+def anomaly_notes(values, labels):
+    labels = np.asarray(labels, dtype=float)
+    anomalous, normal = labels == -1, labels == 1
+    share = anomalous.sum() / max(anomalous.sum() + normal.sum(), 1)
+    if not anomalous.any():
+        return ["No cells were flagged as anomalous."]
+    inside, outside = np.nanmean(values[anomalous]), np.nanmean(values[normal])
+    return [f"{int(anomalous.sum())} cells ({share:.1%}) are flagged as anomalous; they average "
+            f"{_number(inside)} against {_number(outside)} elsewhere."]
+
+
+def _missing(value):
+    return value is None or (isinstance(value, float) and np.isnan(value))
+
+
+def _decimated(grid):
+    values = np.asarray(grid.values, dtype=float)
+    step = max(-(-max(values.shape) // MAX_FIGURE_CELLS), 1)
+    return values[::step, ::step]
+
+
+def cached_figure(parts, draw, dpi=100, cache_dir=None, figsize=(8, 5)):
+    """PNG path of a figure drawn by ``draw(fig)``, reused while ``parts`` are unchanged.
+
+    ``parts`` must identify everything the figure shows (content hashes,
+    settings). Figures are drawn on a bare Agg ``Figure``, so no display or
+    pyplot state is involved. Returns ``(path, reused)``.
+    """
+    key = hashlib.sha1(json.dumps([FIGURE_VERSION, dpi, list(figsize), *parts], default=str).encode()).hexdigest()
+    folder = os.path.join(cache_dir or CACHE_DIR, FIGURES_DIR)
+    path = os.path.join(folder, f"{key}.png")
+    if os.path.exists(path):
+        os.utime(path)
+        return path, True
+
+    from matplotlib.figure import Figure
+
+    # Fixed margins instead of tight_layout, which measured every tick label and doubled the draw time
+    fig = Figure(figsize=figsize)
+    fig.subplots_adjust(left=0.1, right=0.95, bottom=0.11, top=0.92)
+    draw(fig)
+    os.makedirs(folder, exist_ok=True)
+    tmp = f"{path}.tmp-{os.getpid()}.png"
+    fig.savefig(tmp, dpi=dpi)
+    os.replace(tmp, path)
+    return path, False
+
+
+def _draw_spectrum(spectrum, title):
+    def draw(fig):
+        ax = fig.add_subplot()
+        # Welch power is drawn as ln(P), like the site spectra
+        label = spectrum.columns[1]
+        values = spectrum.iloc[:, 1].to_numpy(dtype=float)
+        if label == "power":
+            with np.errstate(divide="ignore"):
+                values, label = np.log(values), "ln power"
+        ax.plot(spectrum.iloc[:, 0], values, color="green")
+        ax.set_title(title)
+        ax.set_xlabel("Frequency")
+        ax.set_ylabel(label.capitalize())
+        ax.grid(True)
+    return draw
+
+
+def _draw_depth(job, segments, title):
+    from .core import X_LABEL, Y_LABEL, clean_spectrum
+
+    def draw(fig):
+        ax = fig.add_subplot()
+        # The input spectrum is only read when the figure is not cached
+        if os.path.exists(job["path"]):
+            from .pipeline import _load
+
+            columns = job["stages"].get("columns", {})
+            data = clean_spectrum(_load(job), columns.get("x", 0), columns.get("y", 1))
+            ax.plot(data.iloc[:, 0], data.iloc[:, 1], "o", color="blue", markersize=3)
+        for row, color in zip(segments.itertuples(), ["red", "orange", "gray", "purple", "brown"]):
+            k = np.array([row.x_start, row.x_end])
+            ax.plot(k, row.intercept + row.slope * k, color=color, linewidth=2,
+                    label=f"{row.segment}: h = {_number(row.depth, 3)}")
+        ax.set_title(title)
+        ax.set_xlabel(X_LABEL)
+        ax.set_ylabel(Y_LABEL)
+        ax.legend()
+        ax.grid(True)
+    return draw
+
+
+def _draw_grid(grid, title, cmap="viridis", thresholds=None):
+    def draw(fig):
+        ax = fig.add_subplot()
+        values = _decimated(grid)
+        if thresholds is None:
+            image = ax.imshow(values, origin="lower", extent=grid.extent, aspect="auto", cmap=cmap)
+            fig.colorbar(image, ax=ax, label=grid.name)
+        else:
+            from matplotlib.colors import ListedColormap
+
+            zones = np.where(np.isnan(values), np.nan, np.searchsorted(thresholds, values, side="left"))
+            image = ax.imshow(zones, origin="lower", extent=grid.extent, aspect="auto", vmin=-0.5, vmax=2.5,
+                              cmap=ListedColormap(["tab:blue", "gold", "tab:red"]))
+            colorbar = fig.colorbar(image, ax=ax, ticks=[0, 1, 2])
+            colorbar.ax.set_yticklabels([name.capitalize() for name in ZONE_NAMES])
+        ax.set_title(title)
+        ax.set_xlabel("X")
+        ax.set_ylabel("Y")
+    return draw
+
+
+def _site_files(site_dir, stem):
+    """Paths in ``site_dir`` named ``<stem>.<any grid extension>``."""
+    if not os.path.isdir(site_dir):
+        return None
+    for entry in sorted(os.listdir(site_dir)):
+        if os.path.splitext(entry)[0] == stem:
+            return os.path.join(site_dir, entry)
+    return None
+
+
+def render_site(job, summary, site_dir, dpi=100, cache_dir=None):
+    """Figures and notes for one site of a run. Runs inside a worker process.
+
+    ``job`` is the site's entry in ``run.json`` and ``summary`` its row of
+    ``summary.csv``. Returns a dict with the site name, its notes, the
+    depth table (as records) and ``(caption, png path)`` figures.
+    """
+    import pandas as pd
+
+    from .gridfile import read_grid
+
+    name = job["name"]
+    site = {"name": name, "summary": summary, "notes": spectrum_notes(summary), "depths": [],
+            "figures": [], "reused": 0, "error": str(summary.get("error", ""))}
+
+    def add(caption, parts, draw):
+        path, reused = cached_figure(parts, draw, dpi, cache_dir)
+        site["figures"].append((caption, path))
+        site["reused"] += reused
+
+    spectrum_path = os.path.join(site_dir, "spectrum.csv")
+    if os.path.exists(spectrum_path):
+        spectrum = pd.read_csv(spectrum_path)
+        add("Spectrum", ["spectrum", name, content_hash(spectrum_path)],
+            _draw_spectrum(spectrum, f"{name} Frequency Spectrum"))
+
+    depth_path = os.path.join(site_dir, "depth.csv")
+    if os.path.exists(depth_path):
+        segments = pd.read_csv(depth_path)
+        site["depths"] = segments[["segment", "x_start", "x_end", "points", "slope", "r2", "depth",
+                                   "depth_stderr"]].to_dict("records")
+        site["notes"] += depth_notes(segments)
+        source_hash = content_hash(job["path"]) if os.path.exists(job["path"]) else None
+        add("Spectral depth segments", ["depth", name, source_hash, job["stages"].get("columns"),
+                                        content_hash(depth_path)],
+            _draw_depth(job, segments, f"{name} Spectral Depth Segments"))
+
+    grid_path = _site_files(site_dir, "grid")
+    if grid_path:
+        grid = read_grid(grid_path)
+        grid_hash = content_hash(grid_path)
+        values = np.asarray(grid.values, dtype=float)
+        label = grid.name or "Z"
+        site["notes"] += zone_notes(values, label)
+        add(f"{label} grid", ["grid", name, grid_hash], _draw_grid(grid, f"{name} {label}"))
+        thresholds = zone_thresholds(values)
+        add(f"{label} zones", ["zones", name, grid_hash, thresholds],
+            _draw_grid(grid, f"{name} {label} Zones", thresholds=thresholds))
+
+        anomaly_path = _site_files(site_dir, "anomaly")
+        if anomaly_path:
+            anomaly = read_grid(anomaly_path)
+            site["notes"] += anomaly_notes(values, np.asarray(anomaly.values))
+            add("Anomaly zones", ["anomaly", name, content_hash(anomaly_path)],
+                _draw_grid(anomaly, f"{name} Anomaly Zones", cmap="coolwarm"))
+    return site
+
+
+def _copy_figure(path, target):
+    if os.path.exists(target):
+        os.remove(target)
+    try:
+        os.link(path, target)
+    except OSError:
+        shutil.copyfile(path, target)
+
+
+def _figure_name(site, index, path):
+    # The slug alone can collide ("a b" and "a_b"); the cached figure's content key cannot
+    stem = "".join(c if c.isalnum() or c in "-_" else "_" for c in site["name"])
+    key = os.path.splitext(os.path.basename(path))[0]
+    return f"{stem}-{index}-{key[:12]}.png"
+
+
+def _overview(sites):
+    """Rows of the cross-site table: name, points, peak frequency, segment depths, anomalous cells."""
+    depth_names = list(dict.fromkeys(row["segment"] for site in sites for row in site["depths"]))
+    header = ["Site", "Points", "Peak frequency", *[f"{name} depth" for name in depth_names], "Anomalous cells"]
+    rows = []
+    for site in sites:
+        depths = {row["segment"]: row["depth"] for row in site["depths"]}
+        summary = site["summary"]
+        rows.append([site["name"], _number(summary.get("points", np.nan), 6),
+                     _number(summary.get("peak_frequency", np.nan)),
+                     *[_number(depths.get(name, np.nan)) for name in depth_names],
+                     _number(summary.get("anomalous_cells", np.nan), 9)])
+    return header, rows
+
+
+DEPTH_HEADER = ["Segment", "k start", "k end", "Points", "Slope", "r²", "Depth", "± Depth"]
+
+
+def _depth_rows(site):
+    return [[value if isinstance(value, str) else _number(value) for value in row.values()] for row in site["depths"]]
+
+
+def write_html(sites, path, title):
+    """One self-describing HTML page; figures are referenced from ``figures/`` beside it."""
+    def table(header, rows):
+        head = "".join(f"<th>{html.escape(str(cell))}</th>" for cell in header)
+        body = "".join("<tr>" + "".join(f"<td>{html.escape(str(cell))}</td>" for cell in row) + "</tr>"
+                       for row in rows)
+        return f"<table><tr>{head}</tr>{body}</table>"
+
+    parts = [f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>{html.escape(title)}</title>",
+             "<style>body{font-family:sans-serif;max-width:960px;margin:auto}"
+             "table{border-collapse:collapse;margin:1em 0}td,th{border:1px solid #ccc;padding:4px 8px}"
+             "img{max-width:100%}.error{color:#b00}</style></head><body>",
+             f"<h1>{html.escape(title)}</h1>", table(*_overview(sites))]
+    for site in sites:
+        parts.append(f"<h2 id='{html.escape(site['name'])}'>{html.escape(site['name'])}</h2>")
+        if site["error"]:
+            parts.append(f"<p class='error'>Failed: {html.escape(site['error'])}</p>")
+        parts.append("<ul>" + "".join(f"<li>{html.escape(note)}</li>" for note in site["notes"]) + "</ul>")
+        if site["depths"]:
+            parts.append(table(DEPTH_HEADER, _depth_rows(site)))
+        for caption, figure in site["figures"]:
+            parts.append(f"<figure><img src='figures/{html.escape(figure)}' alt='{html.escape(caption)}'>"
+                         f"<figcaption>{html.escape(caption)}</figcaption></figure>")
+    parts.append("</body></html>")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(parts))
+
+
+def write_pdf(sites, path, title):
+    """A4 report: the cross-site table, then one section per site starting on a new page."""
+    from xml.sax.saxutils import escape
+
+    from reportlab import rl_config
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import cm
+    from reportlab.platypus import Image, PageBreak, Paragraph, SimpleDocTemplate, Table, TableStyle
+
+    # Binary image streams; reportlab's pure-Python ASCII85 encoding dominated the build time
+    rl_config.useA85 = 0
+    styles = getSampleStyleSheet()
+    grid_style = TableStyle([("GRID", (0, 0), (-1, -1), 0.5, colors.grey), ("FONTSIZE", (0, 0), (-1, -1), 8),
+                             ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey)])
+    folder = os.path.dirname(path)
+    story = [Paragraph(escape(title), styles["Title"])]
+    header, rows = _overview(sites)
+    story.append(Table([header, *rows], style=grid_style, repeatRows=1))
+
+    for site in sites:
+        story += [PageBreak(), Paragraph(escape(site["name"]), styles["Heading1"])]
+        if site["error"]:
+            story.append(Paragraph(f"<font color='red'>Failed: {escape(site['error'])}</font>", styles["Normal"]))
+        story += [Paragraph(f"• {escape(note)}", styles["Normal"]) for note in site["notes"]]
+        if site["depths"]:
+            story.append(Table([DEPTH_HEADER, *_depth_rows(site)], style=grid_style))
+        for caption, figure in site["figures"]:
+            story += [Image(os.path.join(folder, "figures", figure), width=16 * cm, height=10 * cm),
+                      Paragraph(escape(caption), styles["Italic"])]
+
+    SimpleDocTemplate(path, pagesize=A4, title=title).build(story)
+
+
+def build_report(results_dir, out_dir=None, formats=FORMATS, title=None, workers=None, dpi=100,
+                 cache_dir=None, progress=print):
+    """Render the report of a pipeline run in ``results_dir``.
+
+    Reads ``run.json`` and ``summary.csv``, draws every site's figures in
+    a process pool (reusing cached ones) and writes ``report.html`` and/or
+    ``report.pdf`` with a ``figures/`` folder into ``out_dir`` (default:
+    ``results_dir``). Returns the paths written.
+    """
+    import pandas as pd
+
+    with open(os.path.join(results_dir, "run.json")) as f:
+        jobs = json.load(f)["jobs"]
+    summary = pd.read_csv(os.path.join(results_dir, "summary.csv"))
+    rows = {str(row["name"]): {key: value for key, value in row.items() if not _missing(value)}
+            for row in summary.to_dict("records")}
+    out_dir = out_dir or results_dir
+    title = title or f"Spectral interpretation report — {os.path.basename(os.path.abspath(results_dir))}"
+    report = progress or (lambda message: None)
+    workers = workers or os.cpu_count() or 1
+
+    start = time.perf_counter()
+    sites = {}
+    with ProcessPoolExecutor(max_workers=min(workers, max(len(jobs), 1))) as pool:
+        futures = {pool.submit(render_site, job, rows.get(job["name"], {}), os.path.join(results_dir, job["name"]),
+                               dpi, cache_dir): job for job in jobs}
+        for done, future in enumerate(as_completed(futures), 1):
+            job = futures[future]
+            try:
+                site = future.result()
+                report(f"[{done}/{len(jobs)}] {job['name']}: {len(site['figures'])} figures "
+                       f"({site['reused']} from cache)")
+            except Exception as e:
+                site = {"name": job["name"], "summary": rows.get(job["name"], {}), "notes": [], "depths": [],
+                        "figures": [], "reused": 0, "error": str(e)}
+                report(f"[{done}/{len(jobs)}] {job['name']}: failed ({e})")
+            sites[job["name"]] = site
+    sites = [sites[job["name"]] for job in jobs]
+
+    # The cached PNGs are linked beside the report under names that change with their content
+    figures_dir = os.path.join(out_dir, "figures")
+    os.makedirs(figures_dir, exist_ok=True)
+    for site in sites:
+        figures = []
+        for index, (caption, path) in enumerate(site["figures"], 1):
+            name = _figure_name(site, index, path)
+            _copy_figure(path, os.path.join(figures_dir, name))
+            figures.append((caption, name))
+        site["figures"] = figures
+    # Only now that the report holds its own links may cached figures be evicted
+    evict(cache_dir)
+
+    written = []
+    for fmt in formats:
+        path = os.path.join(out_dir, f"report.{fmt}")
+        {"html": write_html, "pdf": write_pdf}[fmt](sites, path, title)
+        written.append(path)
+    reused = sum(site["reused"] for site in sites)
+    drawn = sum(len(site["figures"]) for site in sites) - reused
+    report(f"Reported {len(sites)} sites ({drawn} figures drawn, {reused} reused) in "
+           f"{time.perf_counter() - start:.2f}s -> {', '.join(written)}")
+    return written
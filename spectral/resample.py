@@ -0,0 +1,122 @@
+import numpy as np
+
+# Spline degree for each interpolation kind offered by the apps
+KINDS = {"linear": 1, "quadratic": 2, "cubic": 3}
+
+
+def sort_unique(x, y):
+    """Sort by ``x``, drop NaN, and average ``y`` over repeated ``x`` values.
+
+    ``y`` is ``(n,)`` or ``(n, series)``; rows with NaN in ``x`` or in any
+    series are dropped. Returns ``(x, y)`` with strictly increasing ``x``.
+    """
+    x = np.asarray(x, dtype=float).ravel()
+    y = np.asarray(y, dtype=float)
+    keep = ~np.isnan(x) & ~np.isnan(y.reshape(len(x), -1)).any(axis=1)
+    x, y = x[keep], y[keep]
+
+    x_unique, inverse, counts = np.unique(x, return_inverse=True, return_counts=True)
+    if len(x_unique) == len(x):
+        order = np.argsort(x, kind="stable")
+        return x[order], y[order]
+
+    flat = y.reshape(len(x), -1)
+    sums = np.zeros((len(x_unique), flat.shape[1]))
+    np.add.at(sums, inverse, flat)
+    return x_unique, (sums / counts[:, None]).reshape((len(x_unique),) + y.shape[1:])
+
+
+def infer_interval(x):
+    """Median positive spacing of ``x`` (sorted and de-duplicated first), or 1."""
+    x = np.unique(np.asarray(x, dtype=float)[~np.isnan(x)])
+    if len(x) < 2:
+        return 1.0
+    return float(np.median(np.diff(x)))
+
+
+def is_uniform(x, rtol=1e-3):
+    """True when ``x`` is sorted, without repeats and evenly spaced to ``rtol``."""
+    x = np.asarray(x, dtype=float)
+    if len(x) < 3:
+        return True
+    step = np.diff(x)
+    return bool(step.min() > 0 and np.ptp(step) <= rtol * abs(np.median(step)))
+
+
+def uniform_axis(x_min, x_max, interval):
+    """``x_min, x_min + interval, ...`` up to ``x_max`` (inclusive within round-off)."""
+    n = int(np.floor((x_max - x_min) / interval + 1e-9)) + 1
+    return x_min + interval * np.arange(max(n, 1))
+
+
+def resample(x, y, interval=None, kind="linear", axis=None):
+    """Resample one or many series sharing ``x`` onto a uniform axis.
+
+    ``y`` is ``(n,)`` or ``(n, series)``. ``x`` is sorted and de-duplicated
+    first, ``interval`` defaults to its median spacing and ``axis`` to the
+    uniform grid spanning it. Linear resampling is a single gather of
+    neighbour indices and weights applied to every series; quadratic and
+    cubic fit one spline over all series together. Returns ``(axis, values)``
+    with NaN outside the data range.
+    """
+    x, y = sort_unique(x, y)
+    degree = KINDS[kind]
+    if len(x) <= degree:
+        raise ValueError(f"{kind.capitalize()} resampling needs at least {degree + 1} distinct X values")
+    if axis is None:
+        axis = uniform_axis(x[0], x[-1], interval or infer_interval(x))
+    axis = np.asarray(axis, dtype=float)
+    inside = (axis >= x[0]) & (axis <= x[-1])
+
+    if degree == 1:
+        right = np.clip(np.searchsorted(x, axis, side="right"), 1, len(x) - 1)
+        weight = (axis - x[right - 1]) / (x[right] - x[right - 1])
+        weight = weight.reshape((-1,) + (1,) * (y.ndim - 1))
+        values = y[right - 1] * (1.0 - weight) + y[right] * weight
+    else:
+        from scipy.interpolate import make_interp_spline
+
+        values = make_interp_spline(x, y, k=degree, axis=0)(axis)
+
+    values[~inside] = np.nan
+    return axis, values
+
+
+def resample_many(series, interval=None, kind="linear", extent="overlap"):
+    """Resample profiles with different ``x`` onto one common uniform axis.
+
+    ``series`` is a list of ``(x, y)`` pairs. The axis covers the range all
+    profiles share (``extent="overlap"``) or any of them (``"union"``),
+    spaced by ``interval`` (default: the median of the per-profile
+    spacings). Linear resampling of every profile is one ``np.interp`` call:
+    each profile is shifted onto its own stretch of a single monotonic
+    axis. Returns ``(axis, values)`` with one row per profile.
+    """
+    cleaned = [sort_unique(x, y) for x, y in series]
+    if not cleaned:
+        return np.empty(0), np.empty((0, 0))
+    if any(len(x) < 2 for x, _ in cleaned):
+        raise ValueError("Every profile needs at least two distinct X values")
+
+    lows = np.array([x[0] for x, _ in cleaned])
+    highs = np.array([x[-1] for x, _ in cleaned])
+    low, high = (lows.max(), highs.min()) if extent == "overlap" else (lows.min(), highs.max())
+    if high < low:
+        raise ValueError("The profiles do not overlap; use extent='union'")
+    interval = interval or float(np.median([infer_interval(x) for x, _ in cleaned]))
+    axis = uniform_axis(low, high, interval)
+
+    if kind != "linear":
+        return axis, np.vstack([resample(x, y, kind=kind, axis=axis)[1] for x, y in cleaned])
+
+    # Shift profile i by i * span so all of them form one increasing sequence
+    span = (max(highs.max(), axis[-1]) - min(lows.min(), axis[0])) * 2.0 + 1.0
+    offsets = np.arange(len(cleaned)) * span
+    x_all = np.concatenate([x + offset for (x, _), offset in zip(cleaned, offsets)])
+    y_all = np.concatenate([y for _, y in cleaned])
+    targets = (axis[None, :] + offsets[:, None]).ravel()
+    values = np.interp(targets, x_all, y_all).reshape(len(cleaned), len(axis))
+
+    inside = (axis[None, :] >= lows[:, None]) & (axis[None, :] <= highs[:, None])
+    values[~inside] = np.nan
+    return axis, values
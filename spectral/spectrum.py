@@ -0,0 +1,236 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from scipy.fft import next_fast_len
+
+from .core import X_LABEL, Y_LABEL
+
+# Periodic (DFT-even) tapers, the usual choice for spectral estimation
+WINDOWS = {
+    "boxcar": np.ones,
+    "hann": lambda n: np.hanning(n + 1)[:-1],
+    "hamming": lambda n: np.hamming(n + 1)[:-1],
+    "blackman": lambda n: np.blackman(n + 1)[:-1],
+    "bartlett": lambda n: np.bartlett(n + 1)[:-1],
+}
+
+# Segments transformed per rfft call in welch(); bounds memory on long profiles
+_SEGMENT_BATCH = 256
+
+
+@dataclass(frozen=True)
+class Spectrum:
+    """A one-sided spectrum computed once and shared by every view of it."""
+
+    frequency: np.ndarray
+    power: np.ndarray
+
+    @property
+    def magnitude(self):
+        return np.sqrt(self.power)
+
+    @property
+    def ln_power(self):
+        with np.errstate(divide="ignore"):
+            return np.log(self.power)
+
+    @property
+    def wavelength(self):
+        with np.errstate(divide="ignore"):
+            return np.where(self.frequency == 0, np.nan, 1.0 / np.where(self.frequency == 0, 1.0, self.frequency))
+
+    def to_frame(self, x_label=X_LABEL, y_label=Y_LABEL):
+        """ln(P) against frequency in the two-column layout of the site workbooks."""
+        valid = self.power > 0
+        return pd.DataFrame({x_label: self.frequency[valid], y_label: self.ln_power[valid]})
+
+
+def get_window(window, n):
+    if isinstance(window, str):
+        if window not in WINDOWS:
+            raise ValueError(f"Unknown window '{window}', expected one of {sorted(WINDOWS)}")
+        return WINDOWS[window](n)
+    window = np.asarray(window, dtype=float)
+    if window.shape != (n,):
+        raise ValueError(f"Window has {window.size} samples, expected {n}")
+    return window
+
+
+def detrend(segments, kind="linear"):
+    """Remove the mean or least-squares line from each row of ``segments``."""
+    if kind in (None, False, "none"):
+        return segments
+    if kind == "constant":
+        return segments - segments.mean(axis=-1, keepdims=True)
+    if kind != "linear":
+        raise ValueError(f"Unknown detrend '{kind}', expected 'constant', 'linear' or None")
+
+    n = segments.shape[-1]
+    t = np.arange(n, dtype=float) - (n - 1) / 2.0
+    mean = segments.mean(axis=-1, keepdims=True)
+    slope = (segments @ t)[..., None] / (t @ t) if n > 1 else 0.0
+    return segments - mean - slope * t
+
+
+class WelchAccumulator:
+    """Running Welch average for profiles that arrive in pieces.
+
+    ``add`` takes consecutive samples of one profile; samples that do not
+    yet fill a whole segment are carried over to the next call, so a
+    streamed profile gives the same spectrum as ``welch`` on the whole of it.
+    """
+
+    def __init__(self, sampling_interval=1.0, segment_length=256, overlap=0.5, window="hann",
+                 detrend_type="linear", pad=True, scaling="density"):
+        self.sampling_interval = sampling_interval
+        self.segment_length = int(segment_length)
+        self.step = max(self.segment_length - int(round(overlap * self.segment_length)), 1)
+        self.nfft = next_fast_len(self.segment_length, real=True) if pad else self.segment_length
+        self.window = get_window(window, self.segment_length)
+        self.detrend_type = detrend_type
+
+        if scaling == "density":
+            self.scale = 1.0 / ((1.0 / sampling_interval) * (self.window ** 2).sum())
+        elif scaling == "spectrum":
+            self.scale = 1.0 / self.window.sum() ** 2
+        else:
+            raise ValueError(f"Unknown scaling '{scaling}', expected 'density' or 'spectrum'")
+
+        self.power = np.zeros(self.nfft // 2 + 1)
+        self.segments = 0
+        self.tail = np.empty(0)
+
+    def add(self, y):
+        y = np.concatenate([self.tail, np.asarray(y, dtype=float)])
+        if len(y) < self.segment_length:
+            self.tail = y
+            return self
+
+        segments = np.lib.stride_tricks.sliding_window_view(y, self.segment_length)[::self.step]
+        for start in range(0, len(segments), _SEGMENT_BATCH):
+            batch = detrend(segments[start:start + _SEGMENT_BATCH], self.detrend_type) * self.window
+            spectra = np.fft.rfft(batch, n=self.nfft, axis=-1)
+            self.power += (spectra.real ** 2 + spectra.imag ** 2).sum(axis=0)
+
+        self.segments += len(segments)
+        self.tail = y[len(segments) * self.step:].copy()
+        return self
+
+    def spectrum(self):
+        if self.segments == 0:
+            raise ValueError(f"Need at least {self.segment_length} samples for a spectrum")
+        power = self.power * (self.scale / self.segments)
+        # Fold the negative frequencies into the one-sided spectrum
+        power[1:(self.nfft + 1) // 2] *= 2
+        return Spectrum(np.fft.rfftfreq(self.nfft, self.sampling_interval), power)
+
+
+def welch(y, sampling_interval=1.0, segment_length=None, overlap=0.5, window="hann",
+          detrend_type="linear", pad=True, scaling="density"):
+    """Welch-averaged power spectrum of a uniformly sampled profile.
+
+    The profile is cut into overlapping segments (strided views, not
+    copies), each one detrended, windowed and zero-padded to a fast FFT
+    length, then transformed with ``rfft`` in batches and averaged.
+    ``scaling`` is ``"density"`` (power per unit frequency) or
+    ``"spectrum"`` (power per bin).
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n < 2:
+        raise ValueError("Need at least two samples for a spectrum")
+
+    segment_length = min(int(segment_length or min(n, 256)), n)
+    accumulator = WelchAccumulator(sampling_interval, segment_length, overlap, window, detrend_type, pad, scaling)
+    return accumulator.add(y).spectrum()
+
+
+def periodogram(y, sampling_interval=1.0, window="boxcar", detrend_type="constant", pad=True,
+                scaling="density"):
+    """Single-segment power spectrum of the whole profile."""
+    return welch(y, sampling_interval, segment_length=len(y), overlap=0.0, window=window,
+                 detrend_type=detrend_type, pad=pad, scaling=scaling)
+
+
+def detrend_plane(grid):
+    """Remove the least-squares plane from a 2D grid, ignoring NaN cells."""
+    ny, nx = grid.shape
+    yy = np.arange(ny, dtype=float)[:, None] - (ny - 1) / 2.0
+    xx = np.arange(nx, dtype=float)[None, :] - (nx - 1) / 2.0
+    valid = ~np.isnan(grid)
+    if not valid.any():
+        return np.zeros_like(grid)
+
+    # Normal equations for z = a + b*x + c*y over the valid cells
+    ones = valid.astype(float)
+    X = np.where(valid, xx, 0.0)
+    Y = np.where(valid, yy, 0.0)
+    Z = np.where(valid, grid, 0.0)
+    A = np.array([
+        [ones.sum(), X.sum(), Y.sum()],
+        [X.sum(), (X * X).sum(), (X * Y).sum()],
+        [Y.sum(), (X * Y).sum(), (Y * Y).sum()],
+    ])
+    b = np.array([Z.sum(), (X * Z).sum(), (Y * Z).sum()])
+    a0, bx, cy = np.linalg.lstsq(A, b, rcond=None)[0]
+    return grid - (a0 + bx * xx + cy * yy)
+
+
+def radial_rings(shape, dx=1.0, dy=1.0, bin_width=None):
+    """Ring index and weight of every ``rfft2`` coefficient of a ``shape`` transform.
+
+    Returns flat ``(rings, weights, n_rings, bin_width)``; rings at or
+    beyond ``n_rings`` lie past the Nyquist wavenumber and are dropped.
+    """
+    ky = np.fft.fftfreq(shape[0], dy)[:, None]
+    kx = np.fft.rfftfreq(shape[1], dx)[None, :]
+    k = np.hypot(kx, ky)
+
+    # Columns other than DC and Nyquist stand for two mirrored wavenumbers
+    weights = np.full(kx.shape, 2.0)
+    weights[0, 0] = 1.0
+    if shape[1] % 2 == 0:
+        weights[0, -1] = 1.0
+    weights = np.broadcast_to(weights, k.shape).ravel()
+
+    bin_width = bin_width or max(1.0 / (shape[1] * dx), 1.0 / (shape[0] * dy))
+    rings = np.rint(k / bin_width).astype(np.intp).ravel()
+    n_rings = int(min(1.0 / (2 * dx), 1.0 / (2 * dy)) / bin_width) + 1
+    return rings, weights, n_rings, bin_width
+
+
+def radial_spectrum(grid, dx=1.0, dy=None, window="hann", detrend_type="plane", pad=True, bin_width=None):
+    """Radially averaged power spectrum of a gridded field.
+
+    ``dx``/``dy`` are the cell sizes (in km for cycles/km output). NaN
+    cells are set to zero after detrending. Returns a :class:`Spectrum`
+    of mean power per radial wavenumber ring, so ``spectrum.to_frame()``
+    gives the ln(P) vs cycles/unit curve plotted by the site scripts.
+    """
+    grid = np.asarray(grid, dtype=float)
+    dy = dx if dy is None else dy
+    ny, nx = grid.shape
+
+    if detrend_type == "plane":
+        grid = detrend_plane(grid)
+    elif detrend_type == "constant":
+        grid = grid - np.nanmean(grid)
+    grid = np.nan_to_num(grid, nan=0.0)
+
+    if window not in (None, "boxcar"):
+        grid = grid * np.outer(get_window(window, ny), get_window(window, nx))
+
+    shape = (next_fast_len(ny), next_fast_len(nx, real=True)) if pad else (ny, nx)
+    spectra = np.fft.rfft2(grid, s=shape)
+    power = spectra.real ** 2 + spectra.imag ** 2
+
+    rings, weights, n_rings, bin_width = radial_rings(shape, dx, dy, bin_width)
+    keep = rings < n_rings
+    total = np.bincount(rings[keep], weights=(power.ravel() * weights)[keep], minlength=n_rings)
+    count = np.bincount(rings[keep], weights=weights[keep], minlength=n_rings)
+    with np.errstate(invalid="ignore"):
+        mean_power = total / count
+
+    filled = count > 0
+    return Spectrum(np.arange(n_rings)[filled] * bin_width, mean_power[filled])
@@ -0,0 +1,160 @@
+import threading
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.colors import Normalize
+from matplotlib.figure import Figure
+
+STATS = ["mean", "min", "max"]
+
+
+def _half_cell(axis):
+    return (axis[1] - axis[0]) / 2 if len(axis) > 1 else 0.5
+
+
+def block_reduce(level, factor=2):
+    """Decimate one pyramid level by ``factor`` in both directions, ignoring NaN.
+
+    ``level`` holds ``sum``, ``count``, ``min`` and ``max`` arrays; the
+    coarser level keeps the same fields so means stay exact all the way up.
+    """
+    ny, nx = level["count"].shape
+    pad = ((0, -ny % factor), (0, -nx % factor))
+    shape = ((ny + pad[0][1]) // factor, factor, (nx + pad[1][1]) // factor, factor)
+
+    def blocks(values, fill):
+        return np.pad(values, pad, constant_values=fill).reshape(shape)
+
+    return {
+        "sum": blocks(level["sum"], 0.0).sum(axis=(1, 3)),
+        "count": blocks(level["count"], 0).sum(axis=(1, 3)),
+        "min": np.fmin.reduce(blocks(level["min"], np.nan), axis=(1, 3)),
+        "max": np.fmax.reduce(blocks(level["max"], np.nan), axis=(1, 3)),
+    }
+
+
+class TilePyramid:
+    """Min/mean/max decimation levels of a grid for zoom-dependent rendering.
+
+    Level 0 is the full grid; each further level halves (by ``factor``)
+    both dimensions until the grid is smaller than ``min_size`` cells.
+    ``x_axis``/``y_axis`` are the cell-centre coordinates of level 0.
+    """
+
+    def __init__(self, Z, x_axis, y_axis, factor=2, min_size=256):
+        Z = np.asarray(Z, dtype=float)
+        valid = ~np.isnan(Z)
+        self.x_axis = np.asarray(x_axis, dtype=float)
+        self.y_axis = np.asarray(y_axis, dtype=float)
+        self.factor = factor
+        self.levels = [{
+            "sum": np.where(valid, Z, 0.0),
+            "count": valid.astype(np.int64),
+            "min": Z,
+            "max": Z,
+        }]
+        while max(self.levels[-1]["count"].shape) > min_size:
+            self.levels.append(block_reduce(self.levels[-1], factor))
+
+        self.vmin = float(np.nanmin(Z)) if valid.any() else 0.0
+        self.vmax = float(np.nanmax(Z)) if valid.any() else 1.0
+
+    @property
+    def extent(self):
+        """Cell edges of the whole grid, half a cell beyond the outer centres, for ``imshow``."""
+        half_x, half_y = _half_cell(self.x_axis), _half_cell(self.y_axis)
+        return [self.x_axis[0] - half_x, self.x_axis[-1] + half_x, self.y_axis[0] - half_y, self.y_axis[-1] + half_y]
+
+    def values(self, index, stat="mean"):
+        level = self.levels[index]
+        if stat == "mean":
+            with np.errstate(invalid="ignore", divide="ignore"):
+                return np.where(level["count"] > 0, level["sum"] / level["count"], np.nan)
+        return level[stat]
+
+    def level_for(self, columns, rows, width, height):
+        """Coarsest level that still has at least one cell per output pixel."""
+        for index in range(len(self.levels) - 1, 0, -1):
+            scale = self.factor ** index
+            if columns / scale >= width and rows / scale >= height:
+                return index
+        return 0
+
+    def view(self, x_range=None, y_range=None, width=800, height=500, stat="mean"):
+        """Cells of the current window at the resolution the output can show.
+
+        Returns ``(values, extent)`` ready for ``imshow``/``contourf``.
+        """
+        x_range = x_range or (self.x_axis[0], self.x_axis[-1])
+        y_range = y_range or (self.y_axis[0], self.y_axis[-1])
+        col0, col1 = np.searchsorted(self.x_axis, x_range[0]), np.searchsorted(self.x_axis, x_range[1], "right")
+        row0, row1 = np.searchsorted(self.y_axis, y_range[0]), np.searchsorted(self.y_axis, y_range[1], "right")
+        col1, row1 = max(col1, col0 + 1), max(row1, row0 + 1)
+
+        index = self.level_for(col1 - col0, row1 - row0, width, height)
+        scale = self.factor ** index
+        rows = slice(row0 // scale, -(-row1 // scale))
+        cols = slice(col0 // scale, -(-col1 // scale))
+
+        # Outer edges of the selected coarse cells in level-0 coordinates
+        last_col = min(cols.stop * scale, len(self.x_axis)) - 1
+        last_row = min(rows.stop * scale, len(self.y_axis)) - 1
+        half_x, half_y = _half_cell(self.x_axis), _half_cell(self.y_axis)
+        extent = [self.x_axis[cols.start * scale] - half_x, self.x_axis[last_col] + half_x,
+                  self.y_axis[rows.start * scale] - half_y, self.y_axis[last_row] + half_y]
+        return self.values(index, stat)[rows, cols], extent
+
+
+class MapRenderer:
+    """Renders a base map once and overlays markers by blitting onto it.
+
+    The base figure (map, colorbar, labels) is drawn a single time on an
+    Agg canvas; ``with_marker`` restores that bitmap and draws only the
+    marker artist, so moving a marker never redraws the map.
+    """
+
+    def __init__(self, values, extent, kind="Heatmap", cmap="viridis", vmin=None, vmax=None,
+                 title="", x_label="", y_label="", figsize=(8, 5), dpi=100):
+        self.figure = Figure(figsize=figsize, dpi=dpi)
+        self.canvas = FigureCanvasAgg(self.figure)
+        self.ax = self.figure.add_subplot()
+        norm = Normalize(vmin=np.nanmin(values) if vmin is None else vmin,
+                         vmax=np.nanmax(values) if vmax is None else vmax)
+
+        if kind == "Contour Map" and min(values.shape) > 1:
+            # ``extent`` is the cell edges; contours go through the cell centres
+            half_x = (extent[1] - extent[0]) / values.shape[1] / 2
+            half_y = (extent[3] - extent[2]) / values.shape[0] / 2
+            xs = np.linspace(extent[0] + half_x, extent[1] - half_x, values.shape[1])
+            ys = np.linspace(extent[2] + half_y, extent[3] - half_y, values.shape[0])
+            mappable = self.ax.contourf(xs, ys, values, levels=20, cmap=cmap, norm=norm)
+        else:
+            mappable = self.ax.imshow(values, aspect='auto', origin='lower', extent=extent, cmap=cmap, norm=norm)
+        self.figure.colorbar(mappable, ax=self.ax)
+
+        self.ax.set_xlim(extent[0], extent[1])
+        self.ax.set_ylim(extent[2], extent[3])
+        self.ax.set_title(title)
+        self.ax.set_xlabel(x_label)
+        self.ax.set_ylabel(y_label)
+        self.ax.grid(True)
+
+        self.marker, = self.ax.plot([], [], 'ko', markersize=6, label='Selected Point', animated=True)
+        self.canvas.draw()
+        self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+        # Renderers are shared between app sessions, and blitting mutates the canvas
+        self.lock = threading.Lock()
+
+    def image(self):
+        """The base map as an RGBA array."""
+        with self.lock:
+            self.canvas.restore_region(self.background)
+            return np.asarray(self.canvas.buffer_rgba()).copy()
+
+    def with_marker(self, x, y):
+        """The base map with a marker at ``(x, y)``, as an RGBA array."""
+        with self.lock:
+            self.canvas.restore_region(self.background)
+            self.marker.set_data([x], [y])
+            self.ax.draw_artist(self.marker)
+            return np.asarray(self.canvas.buffer_rgba()).copy()
@@ -0,0 +1,215 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy import fft as sp_fft
+from scipy.fft import next_fast_len
+
+from .depth import DEPTH_FACTORS, fit_segments
+from .gridfile import Grid
+from .spectrum import detrend, get_window, radial_rings
+
+# Tile cells (about 16 MB of float64) transformed in one tile_spectra call; bounds grid_depths' memory per worker
+_TILE_BATCH = 2**21
+
+
+def window_spectra(y, window_length, step=None, sampling_interval=1.0, taper="hann", detrend_type="linear", pad=True):
+    """Power spectra of every overlapping window along a profile.
+
+    The windows are strided views of ``y`` (``step`` samples apart, half a
+    window by default) and are transformed together in one ``rfft`` over
+    the last axis. Returns ``(starts, frequency, power)`` with one row of
+    ``power`` per window; the scaling matches ``welch`` with one segment.
+    """
+    y = np.asarray(y, dtype=float)
+    window_length = int(window_length)
+    step = max(int(step or window_length // 2), 1)
+    if len(y) < window_length:
+        raise ValueError(f"Need at least {window_length} samples for one window")
+
+    windows = np.lib.stride_tricks.sliding_window_view(y, window_length)[::step]
+    starts = np.arange(len(windows)) * step
+    weights = get_window(taper or "boxcar", window_length)
+    nfft = next_fast_len(window_length, real=True) if pad else window_length
+
+    spectra = sp_fft.rfft(detrend(windows, detrend_type) * weights, n=nfft, axis=-1, workers=1)
+    power = (spectra.real ** 2 + spectra.imag ** 2) * (sampling_interval / (weights ** 2).sum())
+    power[:, 1:(nfft + 1) // 2] *= 2
+    return starts, np.fft.rfftfreq(nfft, sampling_interval), power
+
+
+def tile_spectra(Z, tile_size, step=None, dx=1.0, dy=None, taper="hann", pad=True, bin_width=None, max_missing=0.5):
+    """Radially averaged power spectra of every overlapping tile of a grid.
+
+    All tiles come from one strided view, are plane-detrended and tapered
+    together and go through a single ``rfft2`` over the last two axes;
+    the radial average is one matrix product with the ring weights.
+    Tiles with more than ``max_missing`` NaN cells give NaN spectra.
+    Returns ``(row_starts, col_starts, frequency, power)`` with ``power``
+    shaped ``(tile rows, tile columns, rings)``.
+    """
+    Z = np.asarray(Z, dtype=float)
+    dy = dx if dy is None else dy
+    tile_size = int(tile_size)
+    step = max(int(step or tile_size // 2), 1)
+    if min(Z.shape) < tile_size:
+        raise ValueError(f"Grid of {Z.shape} is smaller than one {tile_size} x {tile_size} tile")
+
+    tiles = np.lib.stride_tricks.sliding_window_view(Z, (tile_size, tile_size))[::step, ::step]
+    row_starts = np.arange(tiles.shape[0]) * step
+    col_starts = np.arange(tiles.shape[1]) * step
+
+    # Gaps take the tile mean, then each tile loses its own least-squares plane
+    valid = ~np.isnan(tiles)
+    missing = 1.0 - valid.mean(axis=(-2, -1))
+    means = np.where(valid, tiles, 0.0).sum(axis=(-2, -1)) / np.maximum(valid.sum(axis=(-2, -1)), 1)
+    tiles = np.where(valid, tiles, means[..., None, None])
+    t = np.arange(tile_size, dtype=float) - (tile_size - 1) / 2.0
+    slope_x = (tiles @ t).sum(axis=-1) / (tile_size * (t @ t))
+    slope_y = (t @ tiles).sum(axis=-1) / (tile_size * (t @ t))
+    tiles = tiles - means[..., None, None] - slope_x[..., None, None] * t - slope_y[..., None, None] * t[:, None]
+
+    if taper not in (None, "boxcar"):
+        weights = get_window(taper, tile_size)
+        tiles = tiles * np.outer(weights, weights)
+
+    shape = (next_fast_len(tile_size), next_fast_len(tile_size, real=True)) if pad else (tile_size, tile_size)
+    spectra = sp_fft.rfft2(tiles, s=shape, axes=(-2, -1), workers=1)
+    power = (spectra.real ** 2 + spectra.imag ** 2).reshape(*tiles.shape[:2], -1)
+
+    rings, weights, n_rings, bin_width = radial_rings(shape, dx, dy, bin_width)
+    keep = rings < n_rings
+    ring_weights = np.zeros((len(rings), n_rings))
+    ring_weights[np.flatnonzero(keep), rings[keep]] = weights[keep]
+    count = ring_weights.sum(axis=0)
+    filled = count > 0
+
+    mean_power = (power @ ring_weights[:, filled]) / count[filled]
+    mean_power[missing > max_missing] = np.nan
+    return row_starts, col_starts, np.arange(n_rings)[filled] * bin_width, mean_power
+
+
+def default_band(frequency, power, n_segments=3, segment=0, min_points=3):
+    """Wavenumber range of one segment of the average spectrum, ``(k_start, k_end)``.
+
+    The ``segment``-th straight-line segment (0 is the deepest) of the mean
+    ln(P) curve sets the band every window is fitted over, so all windows
+    measure the same source ensemble.
+    """
+    mean_power = np.nanmean(power.reshape(-1, power.shape[-1]), axis=0)
+    keep = (frequency > 0) & (mean_power > 0)
+    fit = fit_segments(frequency[keep], np.log(mean_power[keep]), n_segments, min_points)
+    return float(fit["x_start"].iloc[segment]), float(fit["x_end"].iloc[segment])
+
+
+def band_fit(frequency, power, band, units="cycles"):
+    """Least-squares ln(P) line over ``band`` for every spectrum in ``power`` at once.
+
+    ``power`` may have any leading shape; the wavenumbers are shared, so
+    the fit is one centred dot product along the last axis. Returns a dict
+    of ``slope``, ``intercept``, ``r2`` and ``depth`` arrays of the leading shape.
+    """
+    in_band = (frequency >= band[0]) & (frequency <= band[1]) & (frequency > 0)
+    if in_band.sum() < 2:
+        raise ValueError(f"Band {band} holds fewer than two wavenumbers")
+
+    k = frequency[in_band]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ln_power = np.log(np.where(power[..., in_band] > 0, power[..., in_band], np.nan))
+        k_centred = k - k.mean()
+        ln_mean = ln_power.mean(axis=-1)
+        slope = (ln_power @ k_centred) / (k_centred @ k_centred)
+        intercept = ln_mean - slope * k.mean()
+        residual = ln_power - intercept[..., None] - slope[..., None] * k
+        total = ((ln_power - ln_mean[..., None]) ** 2).sum(axis=-1)
+        r2 = 1.0 - (residual ** 2).sum(axis=-1) / total
+    return {"slope": slope, "intercept": intercept, "r2": r2, "depth": -slope / DEPTH_FACTORS[units]}
+
+
+def profile_depths(y, window_length, step=None, sampling_interval=1.0, band=None, units="cycles",
+                   x=None, taper="hann", detrend_type="linear"):
+    """Depth estimate for every window along one profile.
+
+    ``band`` is the wavenumber range to fit (default: the deep segment of
+    the profile's average spectrum). ``x`` gives the along-line position of
+    each sample (default: sample index times ``sampling_interval``).
+    Returns one row per window with its centre, slope, intercept, r² and depth.
+    """
+    starts, frequency, power = window_spectra(y, window_length, step, sampling_interval, taper, detrend_type)
+    band = band or default_band(frequency, power)
+    centres = starts + (int(window_length) - 1) / 2.0
+    x = np.arange(len(y)) * sampling_interval if x is None else np.asarray(x, dtype=float)
+    return pd.DataFrame({"start": starts, "centre": np.interp(centres, np.arange(len(x)), x),
+                         **band_fit(frequency, power, band, units)})
+
+
+def line_depths(data, column, window_length, step=None, sampling_interval=1.0, band=None, units="cycles",
+                line_column="line", position_columns=("X", "Y"), workers=None, **options):
+    """Moving-window depths along every flight line, computed in parallel.
+
+    ``data`` is a frame with one row per sample, in line order (as from
+    ``ingest.read_table``). Every line uses the same ``band`` — by default
+    the deep segment of the survey-wide average spectrum — so depths are
+    comparable between lines. Window centres get the interpolated
+    ``position_columns`` coordinates, ready to grid into a depth map.
+    Without a ``line_column`` the whole table is one line (line NaN), as
+    are samples outside any flight line.
+    """
+    groups = data.groupby(line_column, sort=False, dropna=False) if line_column in data else [(np.nan, data)]
+    lines = [(line, group) for line, group in groups if group[column].notna().sum() >= window_length]
+    if not lines:
+        return pd.DataFrame()
+
+    def spectra(item):
+        values = item[1][column].dropna()
+        return window_spectra(values.to_numpy(), window_length, step, sampling_interval, **options)
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        results = list(pool.map(spectra, lines))
+    if band is None:
+        band = default_band(results[0][1], np.concatenate([power for _, _, power in results]))
+
+    frames = []
+    for (line, group), (starts, frequency, power) in zip(lines, results):
+        group = group[group[column].notna()]
+        centres = starts + (int(window_length) - 1) / 2.0
+        positions = {name: np.interp(centres, np.arange(len(group)), group[name].to_numpy(dtype=float))
+                     for name in position_columns if name in group}
+        frames.append(pd.DataFrame({line_column: line, "start": starts, **positions,
+                                    **band_fit(frequency, power, band, units)}))
+    return pd.concat(frames, ignore_index=True)
+
+
+def grid_depths(grid, tile_size=64, step=None, band=None, units="cycles", workers=None, **options):
+    """Depth-to-source map from moving tiles of a grid.
+
+    ``grid`` is a :class:`~spectral.gridfile.Grid` (wrap a bare array as
+    ``Grid(Z, 0, 0, cell_size)``). Rows of tiles are transformed in
+    parallel. Returns a ``Grid`` of depths with one node per tile centre.
+    """
+    if tile_size > min(grid.shape):
+        raise ValueError(f"Tile size {tile_size} is larger than the {grid.shape[1]} x {grid.shape[0]} grid")
+    step = max(int(step or tile_size // 2), 1)
+    n_rows = (grid.shape[0] - tile_size) // step + 1
+    n_cols = (grid.shape[1] - tile_size) // step + 1
+    # Enough tasks to spread over the workers, none holding more than _TILE_BATCH tile cells
+    batch_rows = max(_TILE_BATCH // (n_cols * tile_size * tile_size), 1)
+    rows_per_task = max(min(-(-n_rows // (workers or os.cpu_count() or 1)), batch_rows), 1)
+
+    # Each task takes a band of tile rows; its slice of the grid overlaps the next by one tile
+    def spectra(first_row):
+        last_row = min(first_row + rows_per_task, n_rows)
+        block = np.asarray(grid.values[first_row * step:(last_row - 1) * step + tile_size], dtype=float)
+        return tile_spectra(block, tile_size, step, grid.dx, grid.dy, **options)
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        results = list(pool.map(spectra, range(0, n_rows, rows_per_task)))
+    frequency = results[0][2]
+    power = np.concatenate([result[3] for result in results])
+    band = band or default_band(frequency, power)
+
+    depth = band_fit(frequency, power, band, units)["depth"]
+    centre = (tile_size - 1) / 2.0
+    return Grid(depth, grid.x0 + centre * grid.dx, grid.y0 + centre * grid.dy, step * grid.dx, step * grid.dy,
+                grid.crs, "depth")
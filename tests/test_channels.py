@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+from spectral.channels import evaluate, parse
+
+DATA = {"K": np.array([1.0, 2.0, 0.0]), "eTh": np.array([4.0, 6.0, 8.0])}
+
+
+def test_evaluate_ratio_blanks_zero_denominators():
+    np.testing.assert_allclose(evaluate("eTh / K", DATA), [4.0, 3.0, np.nan])
+    np.testing.assert_allclose(evaluate("-K * 2 + 1", DATA), [-1.0, -3.0, 1.0])
+
+
+@pytest.mark.parametrize("expression", [
+    "K.real",
+    "K.__class__",
+    "abs(K)",
+    "__import__('os')",
+    "K[0]",
+    "eTh[1:]",
+    "'K'",
+    "lambda: K",
+])
+def test_evaluate_rejects_anything_but_arithmetic(expression):
+    with pytest.raises((ValueError, SyntaxError)):
+        parse(expression)
+    with pytest.raises((ValueError, SyntaxError)):
+        evaluate(expression, DATA)
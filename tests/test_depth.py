@@ -0,0 +1,83 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from spectral.compare import SpectrumStack
+from spectral.depth import find_breakpoints, resample_fits
+
+
+def _spectrum(n, seed=1):
+    rng = np.random.default_rng(seed)
+    x = np.sort(rng.uniform(0.0, 1.0, n))
+    y = np.where(x < 0.3, 5 - 20 * x, np.where(x < 0.7, 0.5 - 5 * x, -3.0)) + rng.normal(0, 0.2, n)
+    return x, y
+
+
+def _sse(x, y):
+    slope, intercept = np.polyfit(x, y, 1)
+    return np.sum((y - slope * x - intercept) ** 2)
+
+
+@pytest.mark.parametrize("n, n_segments, min_points", [(9, 2, 3), (14, 3, 3), (16, 3, 4), (12, 1, 3)])
+def test_find_breakpoints_matches_brute_force(n, n_segments, min_points):
+    x, y = _spectrum(n)
+    best = None
+    for splits in itertools.combinations(range(1, n), n_segments - 1):
+        bounds = [0, *splits, n]
+        if min(np.diff(bounds)) < min_points:
+            continue
+        cost = sum(_sse(x[a:b], y[a:b]) for a, b in zip(bounds[:-1], bounds[1:]))
+        if best is None or cost < best[0]:
+            best = cost, bounds
+    assert find_breakpoints(x, y, n_segments, min_points) == best[1]
+    # Small blocks of segment ends give the same answer
+    assert find_breakpoints(x, y, n_segments, min_points, max_cells=n) == best[1]
+
+
+def test_find_breakpoints_needs_enough_points():
+    x, y = _spectrum(8)
+    with pytest.raises(ValueError):
+        find_breakpoints(x, y, n_segments=3, min_points=3)
+
+
+def test_jackknife_matches_leave_one_out_refits():
+    x, y = _spectrum(20)
+    offsets = [0, 8, 20]
+    group, slope, intercept = resample_fits(x, y, offsets, method="jackknife")
+    expected = []
+    for i, (start, stop) in enumerate(zip(offsets[:-1], offsets[1:])):
+        for left_out in range(start, stop):
+            keep = np.r_[start:left_out, left_out + 1:stop]
+            expected.append((i, *np.polyfit(x[keep], y[keep], 1)))
+    expected = np.array(expected)
+    np.testing.assert_array_equal(group, expected[:, 0])
+    np.testing.assert_allclose(slope, expected[:, 1], rtol=1e-9)
+    np.testing.assert_allclose(intercept, expected[:, 2], rtol=1e-9, atol=1e-12)
+
+
+def test_bootstrap_matches_refits_on_the_same_draws():
+    x, y = _spectrum(15)
+    n_resamples, seed = 50, 7
+    group, slope, intercept = resample_fits(x, y, method="bootstrap", n_resamples=n_resamples, seed=seed)
+    draws = np.random.default_rng(seed).integers(0, len(x), (n_resamples, len(x)))
+    expected = np.array([np.polyfit(x[d], y[d], 1) for d in draws])
+    np.testing.assert_array_equal(group, 0)
+    np.testing.assert_allclose(slope, expected[:, 0], rtol=1e-9)
+    np.testing.assert_allclose(intercept, expected[:, 1], rtol=1e-9, atol=1e-12)
+
+
+def test_unknown_resampling_method_is_rejected():
+    x, y = _spectrum(10)
+    with pytest.raises(ValueError):
+        resample_fits(x, y, method="permutation")
+
+
+def test_stack_intervals_bracket_the_fit():
+    x, y = _spectrum(30)
+    stack = SpectrumStack(["a", "b"], np.concatenate([x, x]), np.concatenate([y, 2 * y]), np.array([0, 30, 60]))
+    intervals = stack.fit_intervals(n_resamples=200)
+    assert list(intervals["site"]) == ["a", "b"]
+    assert (intervals["slope_low"] <= intervals["slope"]).all()
+    assert (intervals["slope"] <= intervals["slope_high"]).all()
+    np.testing.assert_allclose(intervals["slope"].iloc[1], 2 * intervals["slope"].iloc[0])
@@ -0,0 +1,50 @@
+import io
+
+import numpy as np
+import pytest
+
+from spectral.gridfile import Grid, grid_bytes, open_grid, read_grid, read_native, read_surfer, save_grid, write_grid
+
+
+def _grid(ny=5, nx=7):
+    values = np.arange(ny * nx, dtype=float).reshape(ny, nx) / 3.0
+    values[1, 2] = np.nan
+    return Grid(values, x0=500.0, y0=-20.0, dx=2.5, dy=1.25, crs="EPSG:32632", name="K")
+
+
+def _assert_same(read, grid, rtol=1e-6):
+    assert read.shape == grid.shape
+    np.testing.assert_allclose([read.x0, read.y0, read.dx, read.dy], [grid.x0, grid.y0, grid.dx, grid.dy])
+    np.testing.assert_allclose(np.asarray(read.values, dtype=float), grid.values, rtol=rtol, equal_nan=True)
+
+
+def test_native_round_trip(tmp_path):
+    grid = _grid()
+    path = tmp_path / "k.sgrd"
+    save_grid(path, grid)
+    mapped = open_grid(path)
+    _assert_same(mapped, grid)
+    assert (mapped.crs, mapped.name) == (grid.crs, grid.name)
+    _assert_same(read_native(io.BytesIO(grid_bytes(grid, "native"))), grid)
+
+
+@pytest.mark.parametrize("fmt", ["surfer", "surfer-binary", "esri"])
+def test_text_and_surfer_round_trip(tmp_path, fmt):
+    grid = _grid()
+    suffix = ".asc" if fmt == "esri" else ".grd"
+    path = tmp_path / f"k{suffix}"
+    write_grid(path, grid, fmt)
+    _assert_same(read_grid(path), grid)
+    _assert_same(read_grid(io.BytesIO(grid_bytes(grid, fmt)), "esri" if fmt == "esri" else "surfer"), grid)
+
+
+def test_wide_binary_surfer_falls_back_to_surfer7():
+    grid = _grid(ny=2, nx=40000)
+    data = grid_bytes(grid, "surfer-binary")
+    assert data[:4] == b"DSRB"
+    _assert_same(read_surfer(io.BytesIO(data)), grid, rtol=0)
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError):
+        grid_bytes(_grid(), "geotiff")
@@ -1,25 +1,185 @@
 import streamlit as st
-import matplotlib.pyplot as plt
-from matplotlib import rcParams
-rcParams['font.family'] = 'DejaVu Sans'  # Or try a system emoji font if available
-import pandas as pd
-import matplotlib.pyplot as plt
-from sklearn.linear_model import LinearRegression
-import numpy as np
-from scipy.interpolate import interp1d
+from spectral.cache import content_hash, read_excel_cached
+from spectral.instrument import cached, performance_panel, stage, start_run
+
+
+# Cached pipeline stages. Each is keyed by the upload's content hash plus the
+# parameters it depends on, so cosmetic widgets only redraw the figures.
+# Stages import their libraries when first run, so an unticked option never
+# loads sklearn or scipy.interpolate.
+@cached(st.cache_data(show_spinner=False))
+def load_workbook(file_hash, _upload):
+    return read_excel_cached(_upload)
+
+
+@cached(st.cache_data(show_spinner=False))
+def clean_columns(file_hash, x_column, y_column, _df):
+    from spectral.core import clean_spectrum
+
+    return clean_spectrum(_df, x_column, y_column)
+
+
+@cached(st.cache_data(show_spinner=False))
+def fit_regression(file_hash, x_column, y_column, _x, _y):
+    from sklearn.linear_model import LinearRegression
+
+    model = LinearRegression()
+    model.fit(_x, _y)
+    return model.coef_[0], model.intercept_, model.predict(_x)
+
+
+@cached(st.cache_data(show_spinner=False))
+def regression_intervals(file_hash, x_column, y_column, method, n_resamples, confidence, _x, _y):
+    from spectral.depth import fit_intervals
+
+    return fit_intervals(_x, _y, method=method, n_resamples=n_resamples, confidence=confidence)
+
+
+@cached(st.cache_data(show_spinner=False))
+def interpolate(file_hash, x_column, y_column, kind, _x, _y):
+    import numpy as np
+
+    from spectral.resample import resample
+
+    # 500 points across the data, after sorting and averaging repeated X values
+    axis = np.linspace(np.nanmin(_x), np.nanmax(_x), 500)
+    return resample(_x, _y, kind=kind, axis=axis)
+
+
+@cached(st.cache_data(show_spinner=False))
+def uniform_profile(file_hash, x_column, y_column, sampling_interval, _x, _y):
+    from spectral.resample import resample
+
+    return resample(_x, _y, sampling_interval)
+
+
+@cached(st.cache_data(show_spinner=False))
+def depth_segments(file_hash, x_column, y_column, n_segments, min_points, _x, _y):
+    from spectral.depth import fit_segments
+
+    return fit_segments(_x, _y, n_segments, min_points)
+
+
+@cached(st.cache_data(show_spinner=False))
+def depth_segment_intervals(file_hash, x_column, y_column, n_segments, min_points, method, n_resamples, confidence,
+                            _x, _y, _segments):
+    from spectral.depth import segment_intervals
+
+    return segment_intervals(_x, _y, _segments, method=method, n_resamples=n_resamples, confidence=confidence)
+
+
+@cached(st.cache_data(show_spinner=False))
+def frequency_spectrum(file_hash, x_column, y_column, sampling_interval, resampled, method, welch_settings, _y):
+    from spectral.core import fft_spectrum
+    from spectral.spectrum import welch
+
+    if method == "Welch Power Spectrum":
+        spectrum = welch(_y, sampling_interval, **dict(welch_settings))
+        return spectrum.frequency, spectrum.power
+    return fft_spectrum(_y, sampling_interval)
+
+
+@cached(st.cache_data(show_spinner=False))
+def moving_window_depths(file_hash, x_column, y_column, sampling_interval, resampled, window_length, step, _y):
+    from spectral.windowed import profile_depths
+
+    return profile_depths(_y, window_length, step, sampling_interval)
+
+
+@cached(st.cache_data(show_spinner=False))
+def load_sites(file_hashes, x_position, y_position, _uploads):
+    from spectral.compare import load_spectra
+
+    return load_spectra(_uploads, x_column=x_position, y_column=y_position)
+
+
+@cached(st.cache_data(show_spinner=False))
+def site_segment_depths(file_hashes, x_position, y_position, n_segments, min_points, _stack):
+    return _stack.segment_depths(n_segments, min_points)
+
+
+@cached(st.cache_data(show_spinner=False))
+def site_intervals(file_hashes, x_position, y_position, method, n_resamples, confidence, _stack):
+    return _stack.fit_intervals(method, n_resamples, confidence)
+
+
+def interval_settings():
+    """Resampling method, resample count and confidence level, if confidence intervals are switched on."""
+    if not st.checkbox("🎲 Confidence Intervals (Bootstrap / Jackknife)"):
+        return None
+    method = st.radio("🎲 Resampling Method", ["Bootstrap", "Jackknife"], horizontal=True).lower()
+    n_resamples = 2000
+    if method == "bootstrap":
+        n_resamples = int(st.number_input("🔁 Bootstrap Resamples", min_value=100, max_value=100000, value=2000,
+                                          step=500))
+    confidence = st.slider("📏 Confidence Level", min_value=0.5, max_value=0.99, value=0.95, step=0.01)
+    return method, n_resamples, confidence
 
 
 # App Configuration
 st.set_page_config(page_title="Spectral Analysis", layout="centered")
 st.title("📈 Spectral Analysis Program For Group 3")
 st.markdown("### 👨‍💻 Developed by **Incrisz**")
+perf_run = start_run("upgrade")
+
+# Compare mode: many workbooks overlaid on one chart, with one table row per site
+mode = st.radio("🗂️ Mode", ["Single File", "Compare Sites"], horizontal=True)
+if mode == "Compare Sites":
+    uploaded_files = st.file_uploader("📤 Upload site workbooks (.xlsx)", type="xlsx", accept_multiple_files=True)
+    if not uploaded_files:
+        st.info("Upload two or more Excel files to compare their spectra.")
+        st.stop()
+
+    from spectral.compare import overlay_chart
+
+    try:
+        x_position = st.number_input("🔢 X Column Position", min_value=0, value=0, step=1)
+        y_position = st.number_input("🔢 Y Column Position", min_value=0, value=1, step=1)
+        file_hashes = tuple(content_hash(f) for f in uploaded_files)
+        stack = load_sites(file_hashes, int(x_position), int(y_position), uploaded_files)
+        fits = stack.fits()
+
+        show_fits = st.checkbox("📐 Overlay Regression Lines", value=True)
+        st.subheader(f"📊 {len(stack)} Sites")
+        st.altair_chart(overlay_chart(stack, fits if show_fits else None,
+                                      x_label="X (CYC/K_unit) - 2D RADIALLY", y_label="Y (Ln_P) - SPECTRUM"),
+                        width="stretch")
+
+        table = fits
+        if st.checkbox("🧱 Add Spectral Segment Depths"):
+            n_segments = st.selectbox("🔢 Number of Segments", [2, 3], index=1)
+            min_points = st.number_input("📏 Minimum Points per Segment", min_value=2, value=5, step=1)
+            segments = site_segment_depths(file_hashes, int(x_position), int(y_position), n_segments,
+                                           int(min_points), stack)
+            table = table.merge(segments, on="site", how="left")
+        intervals = interval_settings()
+        if intervals:
+            bounds = site_intervals(file_hashes, int(x_position), int(y_position), *intervals, stack)
+            table = table.merge(bounds[["site", "slope_low", "slope_high", "depth_low", "depth_high"]], on="site",
+                                how="left")
+        st.subheader("📐 Slope and Depth by Site")
+        st.dataframe(table.style.format(precision=4), hide_index=True)
+    except Exception as e:
+        st.error(f"❌ An error occurred while comparing the files: {e}")
+    performance_panel(perf_run)
+    st.stop()
 
 # File Upload
 uploaded_file = st.file_uploader("📤 Upload your Excel file (.xlsx)", type="xlsx")
 
 if uploaded_file:
+    # The numeric and plotting stack loads with the first upload, not on the empty start page
+    import numpy as np
+    import pandas as pd
+    import matplotlib.pyplot as plt
+    from matplotlib import rcParams
+    rcParams['font.family'] = 'DejaVu Sans'  # Or try a system emoji font if available
+    from spectral.resample import infer_interval, is_uniform
+    from spectral.spectrum import WINDOWS
+
     try:
-        df = pd.read_excel(uploaded_file)
+        file_hash = content_hash(uploaded_file)
+        df = load_workbook(file_hash, uploaded_file)
 
         # Filter numeric columns only
         numeric_columns = df.select_dtypes(include=['number']).columns.tolist()
@@ -31,9 +191,7 @@ if uploaded_file:
             x_column = st.selectbox("🔢 Select X-axis column", numeric_columns)
             y_column = st.selectbox("🔢 Select Y-axis column", numeric_columns, index=1)
 
-            x = pd.to_numeric(df[x_column], errors='coerce')
-            y = pd.to_numeric(df[y_column], errors='coerce')
-            valid_data = df[(~x.isna()) & (~y.isna())]
+            valid_data = clean_columns(file_hash, x_column, y_column, df)
 
             x = valid_data[x_column].values.reshape(-1, 1)
             y = valid_data[y_column].values
@@ -53,6 +211,7 @@ if uploaded_file:
             line_color = st.color_picker("🎨 Pick a line color", "#0000FF")
             line_style = st.selectbox("📈 Select line style", ["-", "--", "-.", ":"])
             show_regression = st.checkbox("📐 Show Linear Regression Line")
+            intervals = interval_settings()
 
             # Plotting
             fig, ax = plt.subplots()
@@ -66,9 +225,7 @@ if uploaded_file:
                 x_flat = x.flatten()
 
                 try:
-                    f_interp = interp1d(x_flat, y, kind=interp_type)
-                    x_interp = np.linspace(x_flat.min(), x_flat.max(), 500)
-                    y_interp = f_interp(x_interp)
+                    x_interp, y_interp = interpolate(file_hash, x_column, y_column, interp_type, x_flat, y)
 
                     ax.plot(x_interp, y_interp, color='orange', linestyle=':', label=f'{interp_type.capitalize()} Interpolation')
                     ax.legend()
@@ -79,11 +236,7 @@ if uploaded_file:
 
             # Regression Line
             if show_regression:
-                model = LinearRegression()
-                model.fit(x, y)
-                y_pred = model.predict(x)
-                slope = model.coef_[0]
-                intercept = model.intercept_
+                slope, intercept, y_pred = fit_regression(file_hash, x_column, y_column, x, y)
 
                 ax.plot(x, y_pred, color='red', linestyle='--', label=f'Regression line\ny={slope:.4f}x+{intercept:.4f}')
                 ax.legend()
@@ -114,12 +267,43 @@ if uploaded_file:
                 st.write(f"**Slope (m):** `{slope:.4f}`")
                 st.write(f"**Intercept (b):** `{intercept:.4f}`")
 
+                if intervals:
+                    bounds = regression_intervals(file_hash, x_column, y_column, *intervals, x.flatten(), y).iloc[0]
+                    level = f"{intervals[2]:.0%}"
+                    st.write(f"**Slope {level} interval:** `[{bounds.slope_low:.4f}, {bounds.slope_high:.4f}]`")
+                    st.write(f"**Intercept {level} interval:** "
+                             f"`[{bounds.intercept_low:.4f}, {bounds.intercept_high:.4f}]`")
+                    st.write(f"**Depth {level} interval:** `[{bounds.depth_low:.4f}, {bounds.depth_high:.4f}]` "
+                             f"(depth = -slope / 4π)")
+
+            # Multi-segment depth estimation (depth = -slope / 4π for X in cycles per unit)
+            if st.checkbox("🧱 Estimate Source Depths (Spectral Segments)"):
+                n_segments = st.selectbox("🔢 Number of Segments", [2, 3], index=1)
+                min_points = st.number_input("📏 Minimum Points per Segment", min_value=2, value=5, step=1)
+
+                try:
+                    segments = depth_segments(file_hash, x_column, y_column, n_segments, int(min_points), x.flatten(), y)
+                    for segment in segments.itertuples():
+                        seg_x = np.array([segment.x_start, segment.x_end])
+                        ax.plot(seg_x, segment.slope * seg_x + segment.intercept, linewidth=2,
+                                label=f"{segment.segment.capitalize()}: h={segment.depth:.3f}")
+                    ax.legend()
+
+                    if intervals:
+                        segments = depth_segment_intervals(file_hash, x_column, y_column, n_segments,
+                                                           int(min_points), *intervals, x.flatten(), y, segments)
+                    st.subheader("🧱 Spectral Depth Estimates")
+                    st.dataframe(segments)
+                except ValueError as e:
+                    st.error(f"Depth estimation error: {e}")
+
             ax.set_title(plot_title)
             ax.set_xlabel(x_label)
             ax.set_ylabel(y_label)
             ax.grid(True)
             st.subheader("📊 Plot")
-            st.pyplot(fig)
+            with stage("st.pyplot fig"):
+                st.pyplot(fig)
 
             # Statistics
             st.subheader("📉 Summary Statistics")
@@ -130,29 +314,52 @@ if uploaded_file:
             # -------------------------------
             st.subheader("📡 Spectral Analysis (FFT)")
 
-            # Sampling interval input (time between data points)
-            sampling_interval = st.number_input("🕒 Sampling Interval (e.g., 1 for unit steps)", min_value=0.0001, value=1.0, step=0.1, format="%.4f")
+            # Irregular or unsorted X is resampled onto a uniform axis so the FFT spacing is real
+            x_flat = x.flatten()
+            resample_first = st.checkbox("📏 Resample onto a Uniform X Axis", value=not is_uniform(x_flat))
 
-            # FFT Calculation
-            N = len(y)
-            T = sampling_interval
-            yf = np.fft.fft(y)
-            xf = np.fft.fftfreq(N, T)[:N // 2]
+            # Sampling interval input (time between data points)
+            sampling_interval = st.number_input("🕒 Sampling Interval (e.g., 1 for unit steps)", min_value=0.0001,
+                                                value=max(infer_interval(x_flat), 0.0001) if resample_first else 1.0,
+                                                step=0.1, format="%.4f")
+            if resample_first:
+                x_uniform, y_spectrum = uniform_profile(file_hash, x_column, y_column, sampling_interval, x_flat, y)
+                st.caption(f"{len(x_flat)} samples resampled to {len(x_uniform)} at a spacing of {sampling_interval:.4f}")
+            else:
+                y_spectrum = y
+
+            # Spectrum method: the plain FFT magnitude, or a windowed Welch average
+            spectrum_method = st.selectbox("📐 Spectrum Method", ["FFT Magnitude", "Welch Power Spectrum"])
+            welch_settings = ()
+            if spectrum_method == "Welch Power Spectrum":
+                segment_length = st.number_input("📏 Segment Length (samples)", min_value=2, max_value=max(len(y_spectrum), 2),
+                                                 value=min(len(y_spectrum), 256), step=1)
+                overlap = st.slider("🔁 Segment Overlap", 0.0, 0.9, 0.5, step=0.05)
+                window = st.selectbox("🪟 Window", list(WINDOWS), index=list(WINDOWS).index("hann"))
+                detrend_type = st.selectbox("📉 Detrend", ["linear", "constant", "none"])
+                welch_settings = (("segment_length", int(segment_length)), ("overlap", overlap),
+                                  ("window", window), ("detrend_type", detrend_type))
+            value_label = "Power" if spectrum_method == "Welch Power Spectrum" else "Magnitude"
+
+            # Spectrum calculation (computed once and shared by the plot, table and wavelength view)
+            xf, magnitude = frequency_spectrum(file_hash, x_column, y_column, sampling_interval, resample_first,
+                                               spectrum_method, welch_settings, y_spectrum)
 
             # Frequency domain plot
             fig_fft, ax_fft = plt.subplots()
-            ax_fft.plot(xf, 2.0 / N * np.abs(yf[:N // 2]), color='green')
+            ax_fft.plot(xf, magnitude, color='green')
             ax_fft.set_title("🧠 Frequency Spectrum")
             ax_fft.set_xlabel("Frequency (Hz)")
-            ax_fft.set_ylabel("Magnitude")
+            ax_fft.set_ylabel(value_label)
             ax_fft.grid(True)
-            st.pyplot(fig_fft)
+            with stage("st.pyplot fig_fft"):
+                st.pyplot(fig_fft)
 
             # Optional: Frequency components table
             if st.checkbox("📄 Show Frequency Components Table"):
                 freq_data = pd.DataFrame({
                     "Frequency (Hz)": xf,
-                    "Magnitude": 2.0 / N * np.abs(yf[:N // 2])
+                    value_label: magnitude
                 })
                 st.dataframe(freq_data.head(20))
 
@@ -162,15 +369,41 @@ if uploaded_file:
                 safe_xf = np.where(xf == 0, np.nan, xf)
                 wavelength = 1 / safe_xf
                 fig_wave, ax_wave = plt.subplots()
-                ax_wave.plot(wavelength, 2.0 / N * np.abs(yf[:N // 2]), color='purple')
+                ax_wave.plot(wavelength, magnitude, color='purple')
                 ax_wave.set_title("🔬 Spectrum by Wavelength")
                 ax_wave.set_xlabel("Wavelength")
-                ax_wave.set_ylabel("Magnitude")
+                ax_wave.set_ylabel(value_label)
                 ax_wave.grid(True)
-                st.pyplot(fig_wave)
+                with stage("st.pyplot fig_wave"):
+                    st.pyplot(fig_wave)
+
+            # Optional: depth along the profile from a spectrum of every sliding window
+            if st.checkbox("🪟 Moving-Window Depth Profile"):
+                window_length = st.number_input("📏 Window Length (samples)", min_value=8,
+                                                max_value=max(len(y_spectrum), 8),
+                                                value=min(max(len(y_spectrum) // 4, 8), 512), step=1)
+                window_step = st.number_input("➡️ Window Step (samples)", min_value=1, max_value=int(window_length),
+                                              value=max(int(window_length) // 2, 1), step=1)
+                if len(y_spectrum) < window_length:
+                    st.warning(f"Need at least {int(window_length)} samples for one window.")
+                else:
+                    profile = moving_window_depths(file_hash, x_column, y_column, sampling_interval,
+                                                   resample_first, int(window_length), int(window_step), y_spectrum)
+                    fig_profile, ax_profile = plt.subplots()
+                    ax_profile.plot(profile["centre"], profile["depth"], marker='o', color='brown')
+                    ax_profile.invert_yaxis()
+                    ax_profile.set_title("Depth to Source Along Profile")
+                    ax_profile.set_xlabel("Distance")
+                    ax_profile.set_ylabel("Depth")
+                    ax_profile.grid(True)
+                    with stage("st.pyplot fig_profile"):
+                        st.pyplot(fig_profile)
+                    st.dataframe(profile.style.format(precision=4))
 
 
     except Exception as e:
         st.error(f"❌ An error occurred while processing the file: {e}")
 else:
     st.info("Please upload an Excel file to begin.")
+
+performance_panel(perf_run)
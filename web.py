@@ -1,6 +1,5 @@
 import streamlit as st
-import pandas as pd
-import matplotlib.pyplot as plt
+from spectral.cache import read_excel_cached
 
 # App Configuration
 st.set_page_config(page_title="Spectral Analysis", layout="centered")
@@ -11,8 +10,12 @@ st.markdown("### 👨‍💻 Developed by **Incrisz**")
 uploaded_file = st.file_uploader("📤 Upload your Excel file (.xlsx)", type="xlsx")
 
 if uploaded_file:
+    # pandas and matplotlib load with the first upload, not on the empty start page
+    import pandas as pd
+    import matplotlib.pyplot as plt
+
     try:
-        df = pd.read_excel(uploaded_file)
+        df = read_excel_cached(uploaded_file)
 
         # Clean the data
         x = pd.to_numeric(df.iloc[:, 0], errors='coerce')